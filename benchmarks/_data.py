@@ -0,0 +1,87 @@
+"""Synthetic rates the benchmarks are run over, imported by them as a sibling
+module, `python benchmarks/bench_*.py` puts this directory on the path."""
+
+import math
+from datetime import date, timedelta
+from typing import Callable, List, Sequence
+
+import polars as pl
+
+from currency_analyzer.core.database import RateRepository
+
+CURRENCIES = [f"C{i:02d}" for i in range(35)]
+START_DATE = date(2005, 1, 1)
+
+# rate of the n-th currency on its i-th day
+RateFunction = Callable[[int, int], float]
+
+
+def sawtooth(n: int, i: int) -> float:
+    return 1 + n / 100 + (i % 97) / 7919
+
+
+def wave(n: int, i: int) -> float:
+    """Rates of currencies oscillating at periods of their own, so their
+    returns are correlated to a different degree"""
+    return 1 + n / 100 + math.sin(i / (n + 3)) / 50
+
+
+def end_date_of(years: int, start_date: date = START_DATE) -> date:
+    """Last day of `years` years of 365 days"""
+    return start_date + timedelta(days=years * 365 - 1)
+
+
+def rate_frames(
+    years: int,
+    currencies: Sequence[str] = CURRENCIES,
+    start_date: date = START_DATE,
+    weekdays_only: bool = False,
+    rate: RateFunction = sawtooth,
+) -> List[pl.DataFrame]:
+    """Frames of rates of every currency over `years` years of 365 days, of
+    every day or, like the published ones, only of weekdays"""
+    dates = pl.date_range(start_date, end_date_of(years, start_date), "1d", eager=True)
+    if weekdays_only:
+        dates = dates.filter(dates.dt.weekday() <= 5)
+    return [
+        pl.DataFrame(
+            {
+                "currency_code": code,
+                "rate": [rate(n, i) for i in range(len(dates))],
+                "date": dates,
+                "source": "NBP",
+                "bid": None,
+                "ask": None,
+            },
+            schema_overrides={"bid": pl.Float64, "ask": pl.Float64},
+        )
+        for n, code in enumerate(currencies)
+    ]
+
+
+def populate(
+    repository: RateRepository,
+    years: int,
+    currencies: Sequence[str] = CURRENCIES,
+    start_date: date = START_DATE,
+    weekdays_only: bool = False,
+    rate: RateFunction = sawtooth,
+    coverage: bool = False,
+) -> date:
+    """Ingest the rates of `rate_frames` and return the last day of them.
+
+    With `coverage` the range is recorded as fetched from table A, so reports
+    of it do not call the client.
+    """
+    frames = rate_frames(years, currencies, start_date, weekdays_only, rate)
+    repository.ingest_rate_frames(frames)
+    end_date = end_date_of(years, start_date)
+    if coverage:
+        repository.record_coverage(
+            start_date,
+            end_date,
+            "NBP",
+            "A",
+            frames[0].get_column("date").to_list() if frames else [],
+        )
+    return end_date
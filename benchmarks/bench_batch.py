@@ -0,0 +1,118 @@
+"""Nightly set of reports (currencies x raw/changes x csv/json) exported one
+`analyzer export` at a time vs by a single `analyzer batch`, against the fake
+NBP server with latency, starting from an empty database.
+
+    poetry run python benchmarks/bench_batch.py --currencies 10 --latency-ms 40
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+from currency_analyzer.api.nbp import NBPClient
+from currency_analyzer.api.ratelimit import TokenBucket
+from currency_analyzer.cli.main import exporter_cls_from_params, strategy_from_params
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.devtools.fake_nbp import (
+    TABLE_A_CURRENCIES,
+    FakeNBPConfig,
+    FakeNBPServer,
+)
+from currency_analyzer.reporting.batch import ReportSpec, run_batch
+
+END_DATE = date(2024, 12, 4)
+
+
+def report_specs(directory: Path, currencies: int, days: int) -> List[ReportSpec]:
+    start_date = END_DATE - timedelta(days=days - 1)
+    return [
+        ReportSpec(
+            directory / f"{currency}_{export_type}.{format}",
+            start_date,
+            END_DATE,
+            export_type,
+            format,
+            currency,
+        )
+        for currency in TABLE_A_CURRENCIES[:currencies]
+        for export_type in ("raw", "changes")
+        for format in ("csv", "json")
+    ]
+
+
+def separate_exports(base_url: str, directory: Path, specs: List[ReportSpec]) -> None:
+    """Every report by its own repository, client and query, like separate
+    `analyzer export` invocations, each a process with its own rate limiter"""
+    for spec in specs:
+        with RateRepository(str(directory / "rates.db")) as repository, NBPClient(
+            base_url=base_url, rate_limiter=TokenBucket()
+        ) as client:
+            exporter = exporter_cls_from_params(spec.export_type, spec.format)(
+                repository, client
+            )
+            exporter.generate_report(
+                spec.start_date, spec.end_date, spec.output, spec.currency
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--currencies", type=int, default=10)
+    parser.add_argument("--days", type=int, default=279)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    config = FakeNBPConfig(latency_ms=args.latency_ms)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        separate_dir, batch_dir = Path(tmp_dir) / "separate", Path(tmp_dir) / "batch"
+        separate_dir.mkdir()
+        batch_dir.mkdir()
+
+        with FakeNBPServer(config) as server:
+            specs = report_specs(separate_dir, args.currencies, args.days)
+            started = time.perf_counter()
+            separate_exports(server.base_url, separate_dir, specs)
+            separate_time = time.perf_counter() - started
+            separate_requests = server.stats.requests
+
+        with FakeNBPServer(config) as server, RateRepository(
+            str(batch_dir / "rates.db")
+        ) as repository, NBPClient(
+            base_url=server.base_url, rate_limiter=TokenBucket()
+        ) as client:
+            specs = report_specs(batch_dir, args.currencies, args.days)
+            result = run_batch(
+                repository,
+                {"A": client},
+                specs,
+                lambda spec: strategy_from_params(spec.export_type, spec.engine),
+                args.workers,
+            )
+            batch_requests = server.stats.requests
+
+        assert not result.failed
+        for spec in specs:
+            separate_output = separate_dir / spec.output.name
+            assert spec.output.read_bytes() == separate_output.read_bytes()
+
+    print(
+        f"{len(specs)} reports of {args.days} days, "
+        f"{args.latency_ms:.0f}ms API latency"
+    )
+    print(
+        f"separate exports {separate_time * 1000:8.1f}ms, {separate_requests} requests"
+    )
+    print(
+        f"batch            {result.total_seconds * 1000:8.1f}ms, {batch_requests} "
+        f"requests (fetch {result.fetch_seconds * 1000:.1f}ms, "
+        f"queries {result.query_seconds * 1000:.1f}ms, "
+        f"writes {result.write_seconds * 1000:.1f}ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
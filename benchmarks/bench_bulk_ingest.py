@@ -0,0 +1,108 @@
+"""Backfill of years of daily rates through `insert_exchange_rates`, which
+takes a list of all rates, vs the batched `ingest_rates` and
+`ingest_rate_frames`, comparing throughput and peak memory of the Python heap.
+
+    poetry run python benchmarks/bench_bulk_ingest.py --years 20
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+
+import polars as pl
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.types import ExchangeRate
+
+CURRENCIES = [f"C{i:02d}" for i in range(35)]
+START_DATE = date(2005, 1, 1)
+
+
+def generate_rates(years: int) -> Iterator[ExchangeRate]:
+    for day in range(years * 365):
+        for n, code in enumerate(CURRENCIES):
+            yield ExchangeRate(
+                currency_code=code,
+                rate=1 + n / 100 + day / 7919,
+                date=START_DATE + timedelta(days=day),
+                source="NBP",
+            )
+
+
+def generate_frames(years: int) -> Iterator[pl.DataFrame]:
+    """Frame per year, like the parsed responses of the series endpoint"""
+    for year in range(years):
+        dates = pl.date_range(
+            START_DATE + timedelta(days=year * 365),
+            START_DATE + timedelta(days=year * 365 + 364),
+            "1d",
+            eager=True,
+        )
+        yield pl.DataFrame(
+            {
+                "currency_code": [code for _ in dates for code in CURRENCIES],
+                "rate": [
+                    1 + n / 100 + (year * 365 + day) / 7919
+                    for day in range(len(dates))
+                    for n in range(len(CURRENCIES))
+                ],
+                "date": [day for day in dates for _ in CURRENCIES],
+                "source": "NBP",
+                "bid": None,
+                "ask": None,
+            },
+            schema_overrides={"bid": pl.Float64, "ask": pl.Float64},
+        )
+
+
+def measure(
+    db_path: Path, load: Callable[[RateRepository], None], trace_memory: bool
+) -> float:
+    with RateRepository(str(db_path)) as repository:
+        if trace_memory:
+            tracemalloc.start()
+            load(repository)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+        started = time.perf_counter()
+        load(repository)
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rows = args.years * 365 * len(CURRENCIES)
+    loads = {
+        "insert_exchange_rates": lambda repository: repository.insert_exchange_rates(
+            list(generate_rates(args.years))
+        ),
+        "ingest_rates": lambda repository: repository.ingest_rates(
+            generate_rates(args.years), batch_size=args.batch_size
+        ),
+        "ingest_rate_frames": lambda repository: repository.ingest_rate_frames(
+            generate_frames(args.years), batch_size=args.batch_size
+        ),
+    }
+
+    print(f"{rows} rates over {args.years} years of {len(CURRENCIES)} currencies")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, load in loads.items():
+            seconds = measure(Path(tmp_dir) / f"{name}.db", load, False)
+            peak = measure(Path(tmp_dir) / f"{name}-traced.db", load, True)
+            print(
+                f"{name:22} {seconds:6.2f}s {rows / seconds:9.0f} rows/s, "
+                f"peak {peak / 2**20:7.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Changes report computed by the SQL of the SQLite repository vs the polars
+lazy pipeline of `LazyRateChangesDataStrategy`, over rates read from SQLite
+and scanned from Parquet files, for datasets and ranges of several sizes.
+
+    poetry run python benchmarks/bench_changes_engines.py --years 1 5 20 --repeat 3
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, List
+
+import polars as pl
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.parquet import ParquetRateRepository
+from currency_analyzer.core.storage import RateStore, rate_changes
+
+from _data import CURRENCIES, START_DATE, end_date_of, rate_frames
+
+
+def timed(run: Callable[[], pl.DataFrame], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"changes of all currencies ({len(CURRENCIES)}), best of {args.repeat}")
+    for years in args.years:
+        end_date = end_date_of(years)
+        ranges = {"whole dataset": START_DATE}
+        if years > 1:
+            ranges["last year"] = end_date - timedelta(days=364)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rates = pl.concat(rate_frames(years))
+            sqlite = RateRepository(str(Path(tmp_dir) / "rates.db"))
+            parquet = ParquetRateRepository(str(Path(tmp_dir) / "parquet"))
+            stores: List[RateStore] = [sqlite, parquet]
+            for store in stores:
+                store.insert_exchange_rates_frame(rates)
+
+            for name, start_date in ranges.items():
+                engines = {
+                    "sql": lambda: sqlite.get_exchange_rate_changes_frame(
+                        start_date, end_date, None, "NBP"
+                    ),
+                    "polars/sqlite": lambda: rate_changes(
+                        sqlite.scan_rates(start_date, end_date, None, "NBP"),
+                        start_date,
+                        end_date,
+                        "NBP",
+                    ),
+                    "polars/parquet": lambda: rate_changes(
+                        parquet.scan_rates(start_date, end_date, None, "NBP"),
+                        start_date,
+                        end_date,
+                        "NBP",
+                    ),
+                }
+                results = [run().sort("currency_code") for run in engines.values()]
+                assert all(result.equals(results[0]) for result in results)
+
+                timings = ", ".join(
+                    f"{engine} {timed(run, args.repeat) * 1000:7.1f}ms"
+                    for engine, run in engines.items()
+                )
+                print(f"{years:2} years, {name:13} {timings}")
+            sqlite.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Covariance and correlation of daily returns of all pairs of currencies
+computed pair by pair by the `statistics` module vs in a single pass by
+`return_correlations`, over gap-filled rates read from SQLite.
+
+    poetry run python benchmarks/bench_correlation.py --years 1 5 20
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import polars as pl
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.reporting.analysis import return_correlations
+
+from _data import CURRENCIES, START_DATE, populate, wave
+
+
+def pairwise_correlations(rates: pl.DataFrame) -> Dict[Tuple[str, str], float]:
+    """Returns of every currency by day, then each pair correlated alone"""
+    returns: Dict[str, Dict[date, float]] = {}
+    previous: Dict[str, float] = {}
+    for code, day, rate in rates.select("currency_code", "date", "rate").rows():
+        if rate is None:
+            continue
+        if code in previous:
+            returns.setdefault(code, {})[day] = (
+                (rate - previous[code]) / previous[code] * 100
+            )
+        previous[code] = rate
+
+    correlations = {}
+    for code in CURRENCIES:
+        for other in CURRENCIES:
+            days: List[date] = sorted(returns[code].keys() & returns[other].keys())
+            x = [returns[code][day] for day in days]
+            y = [returns[other][day] for day in days]
+            statistics.covariance(x, y)
+            correlations[(code, other)] = statistics.correlation(x, y)
+    return correlations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    args = parser.parse_args()
+
+    print(f"correlations of all pairs of {len(CURRENCIES)} currencies")
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as tmp_dir, RateRepository(
+            str(Path(tmp_dir) / "rates.db")
+        ) as repository:
+            end_date = populate(repository, years, weekdays_only=True, rate=wave)
+            rates = repository.get_exchange_rates_frame(
+                START_DATE, end_date, None, "NBP"
+            )
+
+        started = time.perf_counter()
+        expected = pairwise_correlations(rates)
+        pairwise_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        correlations = return_correlations(rates, START_DATE, end_date, "NBP")
+        single_pass_time = time.perf_counter() - started
+
+        assert correlations.height == len(expected)
+        for code, other, correlation in correlations.select(
+            "currency_code", "other_currency", "correlation"
+        ).rows():
+            assert abs(correlation - expected[(code, other)]) <= 5e-5
+
+        print(
+            f"{years:2} years, pairwise {pairwise_time * 1000:8.1f}ms, "
+            f"single pass {single_pass_time * 1000:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
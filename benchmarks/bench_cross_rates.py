@@ -0,0 +1,106 @@
+"""Cross rates of all pairs of currencies computed by Python loops over the
+rates of every day vs the day by day matrices of `CrossRatesDataStrategy`,
+both written to CSV, from rates stored in SQLite.
+
+    poetry run python benchmarks/bench_cross_rates.py --years 5
+"""
+
+import argparse
+import csv
+import tempfile
+import time
+from datetime import date
+from itertools import groupby
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import polars as pl
+
+from currency_analyzer.api.nbp import NBPClient
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.reporting.analysis import CrossRatesDataStrategy
+from currency_analyzer.reporting.export import CSVRateExporter
+
+from _data import CURRENCIES, START_DATE, populate
+
+
+def rows_cross_rates(
+    repository: RateRepository, start_date: date, end_date: date, output_path: Path
+) -> int:
+    """Cross rates of every day computed pair by pair, written row by row"""
+    rates = repository.get_exchange_rates(start_date, end_date, None, "NBP")
+    count = 0
+    with open(output_path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["date", "base_currency", "quote_currency", "rate", "source"])
+        for day, day_rates in groupby(
+            sorted(rates, key=lambda rate: rate.date), key=lambda rate: rate.date
+        ):
+            quotes = {
+                rate.currency_code: rate.rate
+                for rate in day_rates
+                if rate.rate is not None
+            }
+            if not quotes:
+                continue
+            quotes["PLN"] = 1.0
+            for base, base_rate in sorted(quotes.items()):
+                for quote, quote_rate in sorted(quotes.items()):
+                    if base != quote:
+                        writer.writerow(
+                            [day, base, quote, round(base_rate / quote_rate, 6), "NBP"]
+                        )
+                        count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--days-per-frame", type=int, default=31)
+    args = parser.parse_args()
+
+    client = MagicMock(spec=NBPClient)
+    client.source, client.table, client.has_bid_ask = "NBP", "A", False
+    client.quote_currency = "PLN"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with RateRepository(str(Path(tmp_dir) / "rates.db")) as repository:
+            # the rates are stored already, nothing is fetched
+            end_date = populate(
+                repository, args.years, weekdays_only=True, coverage=True
+            )
+
+            started = time.perf_counter()
+            count = rows_cross_rates(
+                repository, START_DATE, end_date, Path(tmp_dir) / "rows.csv"
+            )
+            rows_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            strategy = CrossRatesDataStrategy(days_per_frame=args.days_per_frame)
+            CSVRateExporter(repository, strategy, client).generate_report(
+                START_DATE, end_date, Path(tmp_dir) / "matrices.csv"
+            )
+            matrices_time = time.perf_counter() - started
+
+        matrices = pl.read_csv(Path(tmp_dir) / "matrices.csv")
+        assert matrices.height == count
+        rows = pl.read_csv(Path(tmp_dir) / "rows.csv")
+        assert matrices.drop("rate").equals(rows.drop("rate"))
+        # `round` of Python rounds ties to even, the strategy away from zero
+        difference = (matrices.get_column("rate") - rows.get_column("rate")).abs()
+        assert difference.max() <= 1.5e-6
+
+    print(
+        f"cross rates of {len(CURRENCIES) + 1} currencies over {args.years} years "
+        f"({count} rows)"
+    )
+    print(
+        f"rows {rows_time * 1000:8.1f}ms, matrices {matrices_time * 1000:8.1f}ms, "
+        f"speedup {rows_time / matrices_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
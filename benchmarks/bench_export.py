@@ -0,0 +1,112 @@
+"""Raw export of all currencies over a long range through rows of Python
+objects, the way reports were written before, vs frames end to end.
+
+    poetry run python benchmarks/bench_export.py --years 20
+"""
+
+import argparse
+import csv
+import json
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, List
+
+from currency_analyzer.api.client import ExchangeRateClient
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.types import ExchangeRate
+from currency_analyzer.reporting.analysis import RawRatesDataStrategy
+from currency_analyzer.reporting.export import CSVRateExporter, JSONRateExporter
+
+from _data import CURRENCIES, START_DATE, populate
+
+
+class StoredRatesClient(ExchangeRateClient):
+    """Client of a range which is already stored, so it is never called"""
+
+    def get_exchange_rates(
+        self, start_date: date, end_date: date
+    ) -> List[ExchangeRate]:
+        raise AssertionError("rates should be served from the database")
+
+    @property
+    def source(self) -> str:
+        return "NBP"
+
+    @property
+    def table(self) -> str:
+        return "A"
+
+
+def export_rows_csv(rows, output_path: Path) -> None:
+    with open(output_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def export_rows_json(rows, output_path: Path) -> None:
+    with open(output_path, "w") as jsonfile:
+        json.dump(rows, jsonfile, indent=2, ensure_ascii=False)
+
+
+def timed(run: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, RateRepository(
+        str(Path(tmp_dir) / "rates.db")
+    ) as repository:
+        end_date = populate(repository, args.years, coverage=True)
+        client = StoredRatesClient()
+        strategy = RawRatesDataStrategy()
+
+        def rows():
+            return strategy.prepare_data(repository, client, START_DATE, end_date)
+
+        output = Path(tmp_dir)
+        timings = {
+            ("csv", "rows"): timed(
+                lambda: export_rows_csv(rows(), output / "rows.csv")
+            ),
+            ("csv", "frame"): timed(
+                lambda: CSVRateExporter(repository, strategy, client).generate_report(
+                    START_DATE, end_date, output / "frame.csv"
+                )
+            ),
+            ("json", "rows"): timed(
+                lambda: export_rows_json(rows(), output / "rows.json")
+            ),
+            ("json", "frame"): timed(
+                lambda: JSONRateExporter(repository, strategy, client).generate_report(
+                    START_DATE, end_date, output / "frame.json"
+                )
+            ),
+        }
+        for format in ("csv", "json"):
+            assert (output / f"rows.{format}").read_bytes() == (
+                output / f"frame.{format}"
+            ).read_bytes()
+
+    print(
+        f"raw export of {len(CURRENCIES)} currencies over {args.years} years "
+        f"({args.years * 365 * len(CURRENCIES)} rows)"
+    )
+    for format in ("csv", "json"):
+        rows_time, frame_time = timings[format, "rows"], timings[format, "frame"]
+        print(
+            f"{format}: rows {rows_time * 1000:8.1f}ms, frame {frame_time * 1000:8.1f}ms, "
+            f"speedup {rows_time / frame_time:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Dataclass vs columnar parsing of an NBP tables payload into rows ready for insert.
+
+    poetry run python benchmarks/bench_nbp_parsing.py --years 5
+"""
+
+import argparse
+import json
+import time
+from datetime import date, timedelta
+
+import polars as pl
+
+from currency_analyzer.api.nbp import NBPTableResponse
+from currency_analyzer.core.types import rates_to_frame
+
+CURRENCIES = [f"C{i:02d}" for i in range(35)]
+
+
+def synthetic_payload(days: int) -> bytes:
+    start_date = date(2000, 1, 3)
+    return json.dumps(
+        [
+            {
+                "table": "A",
+                "no": f"{i:03d}/A/NBP",
+                "effectiveDate": (start_date + timedelta(days=i)).isoformat(),
+                "rates": [
+                    {"currency": code, "code": code, "mid": 1 + n / 100 + i / 7919}
+                    for n, code in enumerate(CURRENCIES)
+                ],
+            }
+            for i in range(days)
+        ]
+    ).encode()
+
+
+def dataclass_path(content: bytes) -> list:
+    """Parsing used before the columnar path: NBPRate -> ExchangeRate -> tuple"""
+    return [
+        rate.to_tuple()
+        for table in NBPTableResponse.from_json(data=json.loads(content))
+        for rate in table.to_exchange_rates()
+    ]
+
+
+def columnar_path(content: bytes) -> pl.DataFrame:
+    return NBPTableResponse.frame_from_json(content)
+
+
+def best_of(repeat: int, call, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    content = synthetic_payload(args.years * 252)
+    rows = dataclass_path(content)
+    frame = columnar_path(content)
+    expected = rates_to_frame(
+        rate
+        for table in NBPTableResponse.from_json(data=json.loads(content))
+        for rate in table.to_exchange_rates()
+    )
+    assert frame.equals(expected), "columnar parsing differs from dataclass parsing"
+
+    dataclass_time = best_of(args.repeat, dataclass_path, content)
+    columnar_time = best_of(args.repeat, columnar_path, content)
+    print(f"payload: {len(content) / 1e6:.1f} MB, {len(rows)} rates")
+    print(f"dataclass path: {dataclass_time * 1000:8.1f}ms")
+    print(f"columnar path:  {columnar_time * 1000:8.1f}ms")
+    print(f"speedup: {dataclass_time / columnar_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Per-request latency of module-level `requests.get` vs pooled `NBPClient` session.
+
+Runs against a local stand-in of the NBP tables endpoint. The stand-in delays
+every response by `--rtt-ms` and every new connection by one more round trip,
+which models the TCP handshake a non-pooled client pays on each request.
+
+    poetry run python benchmarks/bench_nbp_session.py --requests 300 --rtt-ms 5
+"""
+
+import argparse
+import gzip
+import json
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+import requests
+
+from currency_analyzer.api.nbp import NBPClient, NBPTableResponse
+
+CURRENCIES = [f"C{i:02d}" for i in range(35)]
+
+
+def synthetic_tables(start_date: date, days: int) -> bytes:
+    tables = [
+        {
+            "table": "A",
+            "no": f"{i:03d}/A/NBP/{start_date.year}",
+            "effectiveDate": (start_date + timedelta(days=i)).isoformat(),
+            "rates": [
+                {"currency": code, "code": code, "mid": 1.0 + n / 100 + i / 1000}
+                for n, code in enumerate(CURRENCIES)
+            ],
+        }
+        for i in range(days)
+    ]
+    return json.dumps(tables).encode()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = synthetic_tables(date(2024, 1, 1), 5)
+    gzipped_body = gzip.compress(body)
+    rtt = 0.0
+
+    def setup(self):
+        time.sleep(self.rtt)
+        super().setup()
+
+    def do_GET(self):
+        time.sleep(self.rtt)
+        body = self.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.gzipped_body
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def unpooled_request(url: str) -> list:
+    """Request path of the client before the pooled session was introduced"""
+    response = requests.get(url, params=dict(format="json"))
+    response.text  # the body used to be decoded for the debug log unconditionally
+    return [
+        rate
+        for table in NBPTableResponse.from_json(data=response.json())
+        for rate in table.to_exchange_rates()
+    ]
+
+
+def measure(name: str, call: Callable[[], object], count: int) -> List[float]:
+    call()  # warm-up
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    print(
+        f"{name:<28} mean={statistics.mean(latencies):7.3f}ms "
+        f"p50={latencies[len(latencies) // 2]:7.3f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95)]:7.3f}ms"
+    )
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    StandInHandler.rtt = args.rtt_ms / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api"
+    start_date, end_date = date(2024, 1, 1), date(2024, 1, 5)
+    url = f"{base_url}/exchangerates/tables/A/{start_date}/{end_date}/"
+
+    try:
+        baseline = measure(
+            "requests.get (no pooling)",
+            lambda: unpooled_request(url),
+            args.requests,
+        )
+        with NBPClient(base_url=base_url) as client:
+            pooled = measure(
+                "NBPClient pooled session",
+                lambda: client._make_request(start_date, end_date),
+                args.requests,
+            )
+    finally:
+        server.shutdown()
+
+    print(
+        "median latency reduction: "
+        f"{(1 - statistics.median(pooled) / statistics.median(baseline)) * 100:.1f}%"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Sequential vs concurrent ingestion of NBP tables A, B and C from a local
+stand-in of the NBP API with simulated latency.
+
+    poetry run python benchmarks/bench_nbp_tables.py --days 279 --latency-ms 80
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from currency_analyzer.api.nbp import NBP_TABLES, NBPClient
+from currency_analyzer.api.ratelimit import TokenBucket
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.devtools.fake_nbp import FakeNBPConfig, FakeNBPServer
+from currency_analyzer.reporting.analysis import (
+    fetch_missing_rates,
+    fetch_missing_rates_for_tables,
+)
+
+
+def ingest(
+    base_url: str, db_path: Path, start_date: date, end_date: date, concurrent: bool
+) -> float:
+    repository = RateRepository(str(db_path))
+    with NBPClient(
+        base_url=base_url, rate_limiter=TokenBucket(rate=1000, capacity=1000)
+    ) as client:
+        clients = [client.for_table(table) for table in NBP_TABLES]
+
+        started = time.perf_counter()
+        if concurrent:
+            fetch_missing_rates_for_tables(repository, clients, start_date, end_date)
+        else:
+            for table_client in clients:
+                fetch_missing_rates(repository, table_client, start_date, end_date)
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=279)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    end_date = date(2024, 12, 31)
+    start_date = end_date - timedelta(days=args.days)
+    with FakeNBPServer(
+        FakeNBPConfig(latency_ms=args.latency_ms)
+    ) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        timings = {}
+        for concurrent in (False, True):
+            timings[concurrent] = min(
+                ingest(
+                    server.base_url,
+                    Path(tmp_dir) / f"rates-{concurrent}-{i}.db",
+                    start_date,
+                    end_date,
+                    concurrent,
+                )
+                for i in range(args.repeat)
+            )
+
+        # single table for reference
+        with NBPClient(
+            base_url=server.base_url, rate_limiter=TokenBucket(rate=1000, capacity=1000)
+        ) as client:
+            repository = RateRepository(str(Path(tmp_dir) / "rates-single.db"))
+            started = time.perf_counter()
+            fetch_missing_rates(repository, client, start_date, end_date)
+            single_time = time.perf_counter() - started
+
+    print(f"tables A, B, C over {args.days} days, {args.latency_ms:g}ms latency")
+    print(f"single table:       {single_time * 1000:8.1f}ms")
+    print(f"tables in sequence: {timings[False] * 1000:8.1f}ms")
+    print(f"tables concurrently:{timings[True] * 1000:8.1f}ms")
+    print(f"speedup: {timings[False] / timings[True]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Changes report computed with window functions over the stored rates, like
+before, vs combined from the monthly rollups of `monthly_changes` and the
+`daily_changes` of the days at the edges of the range.
+
+    poetry run python benchmarks/bench_rate_changes.py --years 20 --repeat 5
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from currency_analyzer.core.database import RateRepository
+
+from _data import CURRENCIES, START_DATE, end_date_of, rate_frames
+
+
+class WindowFunctionsRepository(RateRepository):
+    """Computes changes of the range on every report"""
+
+    def _rate_changes_query(self, currency_code: Optional[str | int]) -> str:
+        currency_code_filter = (
+            "AND currency_code = :currency_code" if currency_code else ""
+        )
+        return f"""
+            WITH ranged_rates AS MATERIALIZED (
+                SELECT currency_code, source, day, rate
+                FROM rates
+                WHERE source = :source AND table_name = :table {currency_code_filter}
+                    AND day BETWEEN :start_day AND :end_day
+            ),
+            daily_changes AS (
+                SELECT
+                    currency_code,
+                    source,
+                    day,
+                    rate,
+                    ((rate - LAG(rate) OVER (PARTITION BY currency_code ORDER BY day))
+                    / LAG(rate) OVER (PARTITION BY currency_code ORDER BY day) * 100) as daily_change,
+                    FIRST_VALUE(rate) OVER (PARTITION BY currency_code ORDER BY day) as start_rate,
+                    LAST_VALUE(rate) OVER (
+                        PARTITION BY currency_code
+                        ORDER BY day
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                    ) as end_rate
+                FROM ranged_rates
+            )
+            SELECT
+                currency_code,
+                source,
+                MIN(rate) as min_rate,
+                MAX(rate) as max_rate,
+                ROUND(AVG(rate), 4) as avg_rate,
+                ROUND(((MAX(rate) - MIN(rate)) / MIN(rate) * 100), 2) as total_change_percent,
+                ROUND(AVG(daily_change), 2) as avg_daily_change,
+                MIN(start_rate) as start_rate,
+                MAX(end_rate) as end_rate,
+                ROUND(((MAX(end_rate) - MIN(start_rate)) / MIN(start_rate) * 100), 2) as start_to_end_change_percent
+            FROM daily_changes
+            GROUP BY currency_code
+            ORDER BY start_to_end_change_percent DESC;
+        """
+
+
+def report_time(
+    repository: RateRepository,
+    start_date: date,
+    end_date: date,
+    currency_code: Optional[str],
+    repeat: int,
+) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        repository.get_exchange_rate_changes_frame(
+            start_date, end_date, currency_code, "NBP"
+        )
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    end_date = end_date_of(args.years)
+    ranges = {
+        "all currencies, 1 year": (end_date - timedelta(days=364), end_date, None),
+        "all currencies, 10 years": (
+            end_date - timedelta(days=3649),
+            end_date,
+            None,
+        ),
+        f"all currencies, {args.years} years": (START_DATE, end_date, None),
+        f"C07, {args.years} years": (START_DATE, end_date, "C07"),
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir, RateRepository(
+        str(Path(tmp_dir) / "rates.db")
+    ) as repository:
+        ingest_time = repository.ingest_rate_frames(rate_frames(args.years)).seconds
+        window_functions = WindowFunctionsRepository(repository.db_path)
+
+        print(
+            f"{args.years} years of {len(CURRENCIES)} currencies "
+            f"ingested in {ingest_time:.2f}s"
+        )
+        for name, (start_date, end_date, currency_code) in ranges.items():
+            before = report_time(
+                window_functions, start_date, end_date, currency_code, args.repeat
+            )
+            after = report_time(
+                repository, start_date, end_date, currency_code, args.repeat
+            )
+            # ties of the ordering may come in any order
+            assert (
+                window_functions.get_exchange_rate_changes_frame(
+                    start_date, end_date, currency_code, "NBP"
+                )
+                .sort("currency_code")
+                .equals(
+                    repository.get_exchange_rate_changes_frame(
+                        start_date, end_date, currency_code, "NBP"
+                    ).sort("currency_code")
+                )
+            )
+            print(
+                f"{name:24} window functions {before * 1000:8.1f}ms, "
+                f"rollups {after * 1000:8.1f}ms, speedup {before / after:.1f}x"
+            )
+        window_functions.close()
+
+
+if __name__ == "__main__":
+    main()
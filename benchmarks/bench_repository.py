@@ -0,0 +1,95 @@
+"""Connection per query vs the long-lived tuned connection of `RateRepository`,
+measured on repeated generation of reports whose rates are already stored.
+
+    poetry run python benchmarks/bench_repository.py --reports 200
+"""
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, List
+
+from currency_analyzer.api.client import ExchangeRateClient
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.types import ExchangeRate
+from currency_analyzer.reporting.analysis import (
+    RateChangesDataStrategy,
+    RawRatesDataStrategy,
+)
+
+from _data import CURRENCIES, populate
+
+
+class ConnectionPerQueryRepository(RateRepository):
+    """Opens a connection with default settings for every query, like the
+    repository did before keeping its connection"""
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with sqlite3.connect(self.db_path) as conn:
+            yield conn
+        conn.close()
+
+
+class StoredRatesClient(ExchangeRateClient):
+    """Client of a range which is already stored, so it is never called"""
+
+    def get_exchange_rates(
+        self, start_date: date, end_date: date
+    ) -> List[ExchangeRate]:
+        raise AssertionError("rates should be served from the database")
+
+    @property
+    def source(self) -> str:
+        return "NBP"
+
+    @property
+    def table(self) -> str:
+        return "A"
+
+
+def generate_reports(
+    repository: RateRepository, reports: int, start_date: date
+) -> float:
+    client = StoredRatesClient()
+    strategies = [RawRatesDataStrategy(), RateChangesDataStrategy()]
+    started = time.perf_counter()
+    for i in range(reports):
+        report_start = start_date + timedelta(days=i % 300)
+        strategies[i % 2].prepare_data(
+            repository, client, report_start, report_start + timedelta(days=30), "C07"
+        )
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    start_date = date(2015, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "rates.db"
+        with RateRepository(str(db_path)) as repository:
+            populate(repository, args.years, start_date=start_date, coverage=True)
+
+        per_query = ConnectionPerQueryRepository(str(db_path))
+        per_query_time = generate_reports(per_query, args.reports, start_date)
+        with RateRepository(str(db_path)) as repository:
+            reused_time = generate_reports(repository, args.reports, start_date)
+
+    print(
+        f"{args.reports} reports over {args.years} years of {len(CURRENCIES)} currencies"
+    )
+    print(f"connection per query: {per_query_time / args.reports * 1000:8.2f}ms/report")
+    print(f"reused connection:    {reused_time / args.reports * 1000:8.2f}ms/report")
+    print(f"speedup: {per_query_time / reused_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Repeated reports of years of rates read from the database every time vs
+served from the result cache, in memory and on disk.
+
+    poetry run python benchmarks/bench_result_cache.py --years 20 --repeat 5
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.result_cache import ResultCache
+
+from _data import CURRENCIES, START_DATE, populate
+
+
+def report_time(
+    db_path: Path,
+    result_cache: Optional[ResultCache],
+    end_date: date,
+    export_type: str,
+    repeat: int,
+) -> float:
+    """Time of a repeated report, after the first one"""
+    with RateRepository(str(db_path), result_cache=result_cache) as repository:
+        read = (
+            repository.get_exchange_rates_frame
+            if export_type == "raw"
+            else repository.get_exchange_rate_changes_frame
+        )
+        expected = read(START_DATE, end_date, None, "NBP")
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            assert read(START_DATE, end_date, None, "NBP").equals(expected)
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "rates.db"
+        with RateRepository(str(db_path)) as repository:
+            end_date = populate(repository, args.years)
+
+        print(f"all currencies, {args.years} years of {len(CURRENCIES)} currencies")
+        for export_type in ("raw", "changes"):
+            uncached = report_time(db_path, None, end_date, export_type, args.repeat)
+            memory = report_time(
+                db_path, ResultCache(), end_date, export_type, args.repeat
+            )
+            disk_dir = Path(tmp_dir) / f"results-{export_type}"
+            report_time(db_path, ResultCache(disk_dir), end_date, export_type, 1)
+            # fresh cache of each report, so only its results on disk are hit
+            disk = min(
+                report_time(
+                    db_path,
+                    ResultCache(disk_dir, max_memory_bytes=0),
+                    end_date,
+                    export_type,
+                    1,
+                )
+                for _ in range(args.repeat)
+            )
+            print(
+                f"{export_type:8} database {uncached * 1000:8.1f}ms, "
+                f"memory {memory * 1000:7.2f}ms, disk {disk * 1000:7.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Rolling statistics of all currencies over 20 years computed by per-row
+Python loops over the windows vs the vectorized sliding windows of
+`RollingStatsDataStrategy`, from rates stored in SQLite.
+
+    poetry run python benchmarks/bench_rolling.py --years 20 --window 20
+"""
+
+import argparse
+import math
+import tempfile
+import time
+from datetime import date
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, List
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.reporting.analysis import rolling_statistics
+
+from _data import CURRENCIES, START_DATE, populate, wave
+
+
+def std(values: List[float]) -> float:
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+
+
+def rows_rolling_statistics(
+    repository: RateRepository, start_date: date, end_date: date, window: int
+) -> List[Dict]:
+    """Statistics of every window recomputed from its rates, row by row"""
+    rates = repository.get_exchange_rates(start_date, end_date, None, "NBP")
+    stats = []
+    for code, currency_rates in groupby(rates, key=lambda rate: rate.currency_code):
+        history = [rate for rate in currency_rates if rate.rate is not None]
+        for i, rate in enumerate(history):
+            row = {"currency_code": code, "date": rate.date, "rate": rate.rate}
+            if i + 1 >= window:
+                values = [rate.rate for rate in history[i + 1 - window : i + 1]]
+                row.update(
+                    moving_average=round(sum(values) / window, 4),
+                    moving_std=round(std(values), 4),
+                    moving_min=min(values),
+                    moving_max=max(values),
+                )
+            if i >= window:
+                changes = [
+                    (history[j].rate - history[j - 1].rate) / history[j - 1].rate * 100
+                    for j in range(i + 1 - window, i + 1)
+                ]
+                row["volatility"] = round(std(changes), 4)
+            stats.append(row)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--window", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, RateRepository(
+        str(Path(tmp_dir) / "rates.db")
+    ) as repository:
+        end_date = populate(repository, args.years, weekdays_only=True, rate=wave)
+
+        started = time.perf_counter()
+        rows = rows_rolling_statistics(repository, START_DATE, end_date, args.window)
+        rows_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        stats = rolling_statistics(
+            repository.scan_rates(START_DATE, end_date, None, "NBP"),
+            START_DATE,
+            end_date,
+            args.window,
+            "NBP",
+        )
+        vectorized_time = time.perf_counter() - started
+
+    assert stats.height == len(rows)
+    last = stats.row(-1, named=True)
+    assert last["moving_average"] == rows[-1]["moving_average"]
+    assert last["volatility"] == rows[-1]["volatility"]
+
+    print(
+        f"{args.window} rate windows of {len(CURRENCIES)} currencies over "
+        f"{args.years} years ({len(rows)} rates)"
+    )
+    print(
+        f"rows {rows_time * 1000:8.1f}ms, vectorized {vectorized_time * 1000:8.1f}ms, "
+        f"speedup {rows_time / vectorized_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Reads of years of rates from the SQLite repository vs the Parquet files
+partitioned by month, scanned lazily by polars.
+
+    poetry run python benchmarks/bench_storage.py --years 20 --repeat 3
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+
+import polars as pl
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.parquet import ParquetRateRepository
+
+CURRENCIES = [f"C{i:02d}" for i in range(35)]
+START_DATE = date(2005, 1, 1)
+
+
+def generate_frames(years: int) -> Iterator[pl.DataFrame]:
+    """Frame per year, like the parsed responses of the series endpoint"""
+    for year in range(years):
+        dates = pl.date_range(
+            START_DATE + timedelta(days=year * 365),
+            START_DATE + timedelta(days=year * 365 + 364),
+            "1d",
+            eager=True,
+        )
+        yield pl.DataFrame(
+            {
+                "currency_code": [code for _ in dates for code in CURRENCIES],
+                "rate": [
+                    1 + n / 100 + ((year * 365 + day) % 97) / 7919
+                    for day in range(len(dates))
+                    for n in range(len(CURRENCIES))
+                ],
+                "date": [day for day in dates for _ in CURRENCIES],
+                "source": "NBP",
+                "bid": None,
+                "ask": None,
+            },
+            schema_overrides={"bid": pl.Float64, "ask": pl.Float64},
+        )
+
+
+def timed(run: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    end_date = START_DATE + timedelta(days=args.years * 365 - 1)
+    year_start = end_date - timedelta(days=364)
+    reads = {
+        f"raw, all currencies, {args.years} years": lambda store: store.get_exchange_rates_frame(
+            START_DATE, end_date, None, "NBP"
+        ),
+        "raw, C07, 1 year": lambda store: store.get_exchange_rates_frame(
+            year_start, end_date, "C07", "NBP"
+        ),
+        f"changes, all currencies, {args.years} years": lambda store: store.get_exchange_rate_changes_frame(
+            START_DATE, end_date, None, "NBP"
+        ),
+        "changes, all currencies, 1 year": lambda store: store.get_exchange_rate_changes_frame(
+            year_start, end_date, None, "NBP"
+        ),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stores = {
+            "sqlite": RateRepository(str(Path(tmp_dir) / "rates.db")),
+            "parquet": ParquetRateRepository(str(Path(tmp_dir) / "parquet")),
+        }
+        for name, store in stores.items():
+            ingest_time = timed(
+                lambda: [
+                    store.insert_exchange_rates_frame(frame)
+                    for frame in generate_frames(args.years)
+                ],
+                1,
+            )
+            print(f"{name:8} ingested {args.years} years in {ingest_time:.2f}s")
+
+        sqlite, parquet = stores["sqlite"], stores["parquet"]
+        for name, read in reads.items():
+            # ties of the ordering of changes may come in any order
+            assert (
+                read(sqlite)
+                .sort("currency_code")
+                .equals(read(parquet).sort("currency_code"))
+            )
+            sqlite_time = timed(lambda: read(sqlite), args.repeat)
+            parquet_time = timed(lambda: read(parquet), args.repeat)
+            print(
+                f"{name:36} sqlite {sqlite_time * 1000:8.1f}ms, "
+                f"parquet {parquet_time * 1000:8.1f}ms, "
+                f"speedup {sqlite_time / parquet_time:.1f}x"
+            )
+
+        for store in stores.values():
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Peak memory of raw exports of all currencies over growing ranges, read and
+written as a whole frame vs streamed from a cursor in batches of rows by
+`StreamingRawRatesDataStrategy`, every export in a process of its own.
+
+    poetry run python benchmarks/bench_streaming.py --years 1 5 20 --format csv
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Optional, Tuple
+from unittest.mock import MagicMock
+
+from currency_analyzer.api.nbp import NBPClient
+from currency_analyzer.core.database import (
+    DEFAULT_READ_BATCH_SIZE,
+    RateRepository,
+    SQLiteSettings,
+)
+from currency_analyzer.reporting.analysis import (
+    RawRatesDataStrategy,
+    StreamingRawRatesDataStrategy,
+)
+from currency_analyzer.reporting.export import CSVRateExporter, JSONRateExporter
+
+from _data import CURRENCIES, populate
+
+# ranges of up to 40 years end before today
+START_DATE = date(1985, 1, 1)
+
+
+def peak_memory() -> float:
+    """Peak resident memory of the process in MB, unlike `ru_maxrss` not
+    including the memory of the parent the process was spawned from"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("Peak memory is reported only on Linux")
+
+
+def export(
+    db_path: str, end_date: date, output_path: Path, batch_size: Optional[int]
+) -> Tuple[float, float]:
+    """Time and peak resident memory in MB of the process exporting the range"""
+    client = MagicMock(spec=NBPClient)
+    client.source, client.table, client.has_bid_ask = "NBP", "A", False
+    strategy = (
+        StreamingRawRatesDataStrategy(batch_size)
+        if batch_size
+        else RawRatesDataStrategy()
+    )
+    exporter_cls = CSVRateExporter if output_path.suffix == ".csv" else JSONRateExporter
+
+    started = time.perf_counter()
+    # pages of the database mapped and cached by SQLite, up to 64MB by
+    # default, would count as resident memory of the export as well, growing
+    # with the range however it is read
+    settings = SQLiteSettings(mmap_size=0, cache_size=-2_000)
+    with RateRepository(db_path, settings) as repository:
+        exporter_cls(repository, strategy, client).generate_report(
+            START_DATE, end_date, output_path
+        )
+    seconds = time.perf_counter() - started
+    return seconds, peak_memory()
+
+
+def isolated_export(*args) -> Tuple[float, float]:
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(export, *args).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_READ_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(
+        f"raw {args.format} exports of {len(CURRENCIES)} currencies, "
+        f"streamed in batches of {args.batch_size} rows"
+    )
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = str(Path(tmp_dir) / "rates.db")
+            with RateRepository(db_path) as repository:
+                # the rates are stored already, nothing is fetched
+                end_date = populate(
+                    repository,
+                    years,
+                    start_date=START_DATE,
+                    weekdays_only=True,
+                    coverage=True,
+                )
+
+            whole_path = Path(tmp_dir) / f"whole.{args.format}"
+            streamed_path = Path(tmp_dir) / f"streamed.{args.format}"
+            whole_time, whole_peak = isolated_export(
+                db_path, end_date, whole_path, None
+            )
+            streamed_time, streamed_peak = isolated_export(
+                db_path, end_date, streamed_path, args.batch_size
+            )
+            assert streamed_path.read_bytes() == whole_path.read_bytes()
+            size = whole_path.stat().st_size / 1024 / 1024
+
+        print(
+            f"{years:2} years ({size:6.1f}MB), "
+            f"whole frame {whole_time * 1000:7.1f}ms peak {whole_peak:6.1f}MB, "
+            f"streamed {streamed_time * 1000:7.1f}ms peak {streamed_peak:6.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
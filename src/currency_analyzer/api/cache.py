@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from currency_analyzer.logger import get_logger
+
+logger = get_logger(__name__)
+
+# only final answers of the API are worth keeping
+CACHEABLE_STATUS_CODES = frozenset({200, 404})
+
+
+@dataclass
+class CacheEntry:
+    """Metadata of a cached response, the body is kept in a separate file"""
+
+    url: str
+    status_code: int
+    # None means the entry never expires
+    expires_at: Optional[float]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content: bytes = field(default=b"", repr=False)
+
+    def is_fresh(self) -> bool:
+        return self.expires_at is None or time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers revalidating the entry"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self) -> "CachedResponse":
+        return CachedResponse(self.status_code, self.content)
+
+
+@dataclass
+class CachedResponse:
+    """Minimal stand-in for an HTTP response object served from the cache"""
+
+    status_code: int
+    content: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """On-disk cache of API responses keyed by url, evicting least recently used
+    entries once the cache grows above `max_bytes`"""
+
+    def __init__(self, directory: Path | str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # sizes of cached entries by key and their total, read from the
+        # directory on the first store and kept up to date by this instance
+        self._sizes: Optional[Dict[str, int]] = None
+        self._total = 0
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            content = body_path.read_bytes()
+            # access time drives the LRU eviction
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+
+        return CacheEntry(**meta, content=content)
+
+    def store(
+        self,
+        url: str,
+        status_code: int,
+        content: bytes,
+        headers: Any,
+        ttl: Optional[float],
+    ) -> None:
+        """Store response, `ttl` of None keeps it until evicted"""
+        entry = CacheEntry(
+            url=url,
+            status_code=status_code,
+            expires_at=None if ttl is None else time.time() + ttl,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        meta_path, body_path = self._paths(url)
+        meta = self._dump_meta(entry)
+        # body goes first, so the metadata never points to a partial body
+        self._write_atomic(body_path, content)
+        self._write_atomic(meta_path, meta)
+        self._account(meta_path.stem, len(content) + len(meta))
+
+    def refresh(self, entry: CacheEntry, ttl: Optional[float]) -> None:
+        """Extend lifetime of an entry revalidated by the server"""
+        entry.expires_at = None if ttl is None else time.time() + ttl
+        meta_path, _ = self._paths(entry.url)
+        meta = self._dump_meta(entry)
+        self._write_atomic(meta_path, meta)
+        self._account(meta_path.stem, len(entry.content) + len(meta))
+
+    def _dump_meta(self, entry: CacheEntry) -> bytes:
+        meta = asdict(entry)
+        del meta["content"]
+        return json.dumps(meta).encode()
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def size(self) -> int:
+        """Total size of cached bodies and metadata in bytes"""
+        return sum(
+            path.stat().st_size
+            for pattern in ("*.json", "*.body")
+            for path in self.directory.glob(pattern)
+        )
+
+    def _account(self, key: str, size: int) -> None:
+        """Record the size of a written entry, evicting entries only once the
+        total grows above `max_bytes`"""
+        with self._lock:
+            if self._sizes is None:
+                self._scan()
+            else:
+                self._total += size - self._sizes.get(key, 0)
+                self._sizes[key] = size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> List[tuple[float, int, Path, Path]]:
+        """Read sizes of the cached entries from the directory, returning the
+        entries ordered by access time"""
+        entries: List[tuple[float, int, Path, Path]] = []
+        for meta_path in self.directory.glob("*.json"):
+            body_path = meta_path.with_suffix(".body")
+            try:
+                size = body_path.stat().st_size + meta_path.stat().st_size
+                accessed_at = meta_path.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((accessed_at, size, meta_path, body_path))
+
+        self._sizes = {meta_path.stem: size for _, size, meta_path, _ in entries}
+        self._total = sum(self._sizes.values())
+        return sorted(entries)
+
+    def _evict(self) -> None:
+        # entries might also have been written or removed by other processes,
+        # so the directory is read again
+        entries = self._scan()
+        for _, size, meta_path, body_path in entries:
+            if self._total <= self.max_bytes:
+                break
+            meta_path.unlink(missing_ok=True)
+            body_path.unlink(missing_ok=True)
+            del self._sizes[meta_path.stem]
+            self._total -= size
+            logger.debug("Evicted %s from response cache", meta_path.stem)
@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
 from datetime import date
-from typing import List
+from typing import List, Optional
 
-from currency_analyzer.core.types import ExchangeRate
+import polars as pl
+
+from currency_analyzer.core.types import ExchangeRate, rates_to_frame
 
 
 class ExchangeRateClient(ABC):
@@ -12,7 +14,115 @@ class ExchangeRateClient(ABC):
     ) -> List[ExchangeRate]:
         pass
 
+    def get_exchange_rates_frame(
+        self, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        """Exchange rates as a frame with `RATES_SCHEMA` columns.
+
+        Clients might override it with a path which skips per-rate objects.
+        """
+        return rates_to_frame(self.get_exchange_rates(start_date, end_date))
+
+    def get_currency_rates_frame(
+        self, currency_code: str, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        """Exchange rates of a single currency as a frame with `RATES_SCHEMA` columns.
+
+        Clients might override it with a request fetching only that currency.
+        """
+        return self.get_exchange_rates_frame(start_date, end_date).filter(
+            pl.col("currency_code") == currency_code
+        )
+
     @property
     @abstractmethod
     def source(self) -> str:
         pass
+
+    @property
+    @abstractmethod
+    def table(self) -> str:
+        """Identifier of the source table the rates are fetched from"""
+        pass
+
+    @property
+    def has_bid_ask(self) -> bool:
+        """Whether the table quotes buy and sell rates instead of average rates"""
+        return False
+
+    @property
+    def quote_currency(self) -> Optional[str]:
+        """Currency all rates of the source are quoted in, if there is one"""
+        return None
+
+    def for_table(self, table: str) -> "ExchangeRateClient":
+        """Client of another table of the source sharing resources with this
+        one, sources publishing a single table have only this client"""
+        if table != self.table:
+            raise ValueError(f"Unsupported {self.source} table: {table}")
+        return self
+
+    def close(self) -> None:
+        """Release resources held by the client"""
+        pass
+
+
+class AsyncExchangeRateClient(ABC):
+    """Asynchronous counterpart of `ExchangeRateClient`"""
+
+    @abstractmethod
+    async def get_exchange_rates(
+        self, start_date: date, end_date: date
+    ) -> List[ExchangeRate]:
+        pass
+
+    async def get_exchange_rates_frame(
+        self, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        """Exchange rates as a frame with `RATES_SCHEMA` columns.
+
+        Clients might override it with a path which skips per-rate objects.
+        """
+        return rates_to_frame(await self.get_exchange_rates(start_date, end_date))
+
+    async def get_currency_rates_frame(
+        self, currency_code: str, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        """Exchange rates of a single currency as a frame with `RATES_SCHEMA` columns.
+
+        Clients might override it with a request fetching only that currency.
+        """
+        frame = await self.get_exchange_rates_frame(start_date, end_date)
+        return frame.filter(pl.col("currency_code") == currency_code)
+
+    @property
+    @abstractmethod
+    def source(self) -> str:
+        pass
+
+    @property
+    @abstractmethod
+    def table(self) -> str:
+        """Identifier of the source table the rates are fetched from"""
+        pass
+
+    @property
+    def has_bid_ask(self) -> bool:
+        """Whether the table quotes buy and sell rates instead of average rates"""
+        return False
+
+    @property
+    def quote_currency(self) -> Optional[str]:
+        """Currency all rates of the source are quoted in, if there is one"""
+        return None
+
+    def for_table(self, table: str) -> "AsyncExchangeRateClient":
+        """Client of another table of the source sharing resources with this
+        one, sources publishing a single table have only this client"""
+        if table != self.table:
+            raise ValueError(f"Unsupported {self.source} table: {table}")
+        return self
+
+    async def aclose(self) -> None:
+        """Release resources held by the client"""
+        pass
@@ -1,83 +1,577 @@
+import asyncio
+import copy
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date, timedelta
 from decimal import Decimal
-from typing import Any, Dict, Final, List
+from typing import Any, Callable, Dict, Final, List, Optional, Tuple, TypeVar
+import httpx
+import polars as pl
 import requests
+from requests.adapters import HTTPAdapter
 
-from currency_analyzer.api.client import ExchangeRateClient
+from currency_analyzer.api.cache import (
+    CACHEABLE_STATUS_CODES,
+    CacheEntry,
+    ResponseCache,
+)
+from currency_analyzer.api.client import AsyncExchangeRateClient, ExchangeRateClient
+from currency_analyzer.api.ratelimit import (
+    RETRYABLE_STATUS_CODES,
+    RetryBudget,
+    RetryPolicy,
+    TokenBucket,
+    get_shared_bucket,
+    parse_retry_after,
+)
 from currency_analyzer.logger import get_logger
 
 from ..core.exceptions import (
     APIError,
     RateLimitError,
 )
-from ..core.types import ExchangeRate
+from ..core.types import RATES_SCHEMA, ExchangeRate
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+ClientT = TypeVar("ClientT", bound="_NBPClientBase")
+
+# A - average rates of major currencies, B - average rates of other currencies
+# published weekly, C - buy and sell rates
+NBP_TABLES = ("A", "B", "C")
+BID_ASK_TABLES = frozenset({"C"})
+
+
+class _NBPClientBase:
+    """Request building, retry decisions and response parsing shared by the
+    synchronous and asynchronous NBP clients"""
 
-class NBPClient(ExchangeRateClient):
     BASE_URL: str = "http://api.nbp.pl/api/"
+    # NBP api does not allow to fetch more than 93 days of tables at once.
+    MAX_DAYS_PER_REQUEST: int = 93
+    # series of a single currency can span up to 367 days
+    MAX_DAYS_PER_SERIES_REQUEST: int = 367
+    HEADERS: Dict[str, str] = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    }
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        max_retries: int = 20,
+        cache: Optional[ResponseCache] = None,
+        recent_ttl: float = 300.0,
+        table: str = "A",
+    ):
+        if table not in NBP_TABLES:
+            raise ValueError(f"Unsupported NBP table: {table}")
+        self._table = table
+        self.base_url = base_url or self.BASE_URL
+        self.rate_limiter = rate_limiter or get_shared_bucket()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.retry_budget = RetryBudget(max_retries)
+        self.cache = cache
+        self.recent_ttl = recent_ttl
 
     @property
     def source(self) -> str:
         return "NBP"
 
-    def _make_request(self, start_date: date, end_date: date) -> List[ExchangeRate]:
-        """Make single NBP API request for given date range"""
-        url = f"{self.BASE_URL}/exchangerates/tables/A/{start_date}/{end_date}/"
+    @property
+    def table(self) -> str:
+        return self._table
+
+    @property
+    def has_bid_ask(self) -> bool:
+        return self._table in BID_ASK_TABLES
+
+    @property
+    def quote_currency(self) -> str:
+        return "PLN"
+
+    def for_table(self: ClientT, table: str) -> ClientT:
+        """Client of another table sharing connections, rate limiter, retry budget
+        and cache with this one, so tables can be fetched concurrently.
+
+        Only the original client has to be closed.
+        """
+        if table not in NBP_TABLES:
+            raise ValueError(f"Unsupported NBP table: {table}")
+        client = copy.copy(self)
+        client._table = table
+        return client
+
+    def _tables_url(self, start_date: date, end_date: date) -> str:
+        return f"{self.base_url}/exchangerates/tables/{self.table}/{start_date}/{end_date}/"
+
+    def _series_url(self, currency_code: str, start_date: date, end_date: date) -> str:
+        return f"{self.base_url}/exchangerates/rates/{self.table}/{currency_code}/{start_date}/{end_date}/"
+
+    def _date_chunks(
+        self, start_date: date, end_date: date, max_days: Optional[int] = None
+    ) -> List[Tuple[date, date]]:
+        """Split date range into chunks accepted by a single NBP API request"""
+        max_days = max_days or self.MAX_DAYS_PER_REQUEST
+        chunks = []
+        current_start = start_date
+
+        while current_start <= end_date:
+            current_end = min(current_start + timedelta(days=max_days), end_date)
+            chunks.append((current_start, current_end))
+            current_start = current_end + timedelta(days=1)
+
+        return chunks
+
+    def _cache_ttl(self, end_date: date) -> Optional[float]:
+        """Tables of past days are final, while today's might still be published"""
+        return None if end_date < date.today() else self.recent_ttl
+
+    def _cache_lookup(self, url: str) -> Tuple[Optional[Any], Optional[CacheEntry]]:
+        """Return cached response if it is still fresh, otherwise the stale entry
+        which should be revalidated"""
+        if self.cache is None:
+            return None, None
+
+        entry = self.cache.get(url)
+        if entry is not None and entry.is_fresh():
+            logger.debug("Serving %s from response cache", url)
+            return entry.to_response(), entry
+        return None, entry
 
-        try:
+    def _cache_response(
+        self, url: str, end_date: date, entry: Optional[CacheEntry], response: Any
+    ) -> Any:
+        """Store final response in the cache, revalidated entry replaces 304"""
+        if self.cache is None:
+            return response
 
-            logger.debug("Making NBP API request: %s", url)
-            response = requests.get(url, params=dict(format="json"))
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(entry, self._cache_ttl(end_date))
+            return entry.to_response()
+        if response.status_code in CACHEABLE_STATUS_CODES:
+            self.cache.store(
+                url,
+                response.status_code,
+                response.content,
+                response.headers,
+                self._cache_ttl(end_date),
+            )
+        return response
+
+    def _should_retry(self, attempt: int, status_code: int) -> bool:
+        return (
+            status_code in RETRYABLE_STATUS_CODES
+            and attempt + 1 < self.retry_policy.max_attempts
+            and self.retry_budget.try_consume()
+        )
+
+    def _retry_delay(self, attempt: int, response: Any) -> Optional[float]:
+        """Feed the response outcome to the rate limiter.
+
+        Returns number of seconds to wait before retrying the request, or None
+        when the response is final.
+        """
+        # decoding the body is costly, do it only when it is going to be logged
+        if logger.isEnabledFor(logging.DEBUG):
             logger.debug("NBP API response: %s", response.text)
-            match response.status_code:
-                case 200:
-                    tables_data = NBPTableResponse.from_json(data=response.json())
-
-                    return [
-                        exchange_rate
-                        for table_data in tables_data
-                        for exchange_rate in table_data.to_exchange_rates()
-                    ]
-                case 429:
-                    raise RateLimitError()
-                case _:
-                    raise APIError(f"NBP API request failed: {response.text}")
-        except requests.RequestException as e:
-            raise APIError(f"NBP API request failed: {str(e)}")
+
+        if response.status_code not in RETRYABLE_STATUS_CODES:
+            self.rate_limiter.on_success()
+            return None
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        self.rate_limiter.on_throttle(retry_after)
+        if not self._should_retry(attempt, response.status_code):
+            return None
+
+        delay = self.retry_policy.backoff(attempt, retry_after)
+        logger.warning(
+            "NBP API responded with %s, retrying in %.2fs",
+            response.status_code,
+            delay,
+        )
+        return delay
+
+    def _has_data(self, response: Any) -> bool:
+        """Check the final response status, False means no data in the range"""
+        match response.status_code:
+            case 200:
+                return True
+            case 404:
+                # NBP responds with 404 when no table was published in the range
+                # (e.g. weekends and holidays)
+                return False
+            case 429:
+                raise RateLimitError(
+                    retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                )
+            case _:
+                raise APIError(
+                    f"NBP API request failed: {response.text}",
+                    status_code=response.status_code,
+                )
+
+    def _parse_response(self, response: Any) -> List[ExchangeRate]:
+        if not self._has_data(response):
+            return []
+
+        tables_data = NBPTableResponse.from_json(data=response.json())
+
+        return [
+            exchange_rate
+            for table_data in tables_data
+            for exchange_rate in table_data.to_exchange_rates()
+        ]
+
+    def _parse_response_frame(self, response: Any) -> pl.DataFrame:
+        if not self._has_data(response):
+            return pl.DataFrame(schema=RATES_SCHEMA)
+
+        return NBPTableResponse.frame_from_json(response.content)
+
+    def _parse_series_frame(self, response: Any) -> pl.DataFrame:
+        if not self._has_data(response):
+            return pl.DataFrame(schema=RATES_SCHEMA)
+
+        return NBPSeriesResponse.frame_from_json(response.content)
+
+
+class NBPClient(_NBPClientBase, ExchangeRateClient):
+    def __init__(
+        self,
+        max_workers: int = 4,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        base_url: Optional[str] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        max_retries: int = 20,
+        cache: Optional[ResponseCache] = None,
+        recent_ttl: float = 300.0,
+        table: str = "A",
+    ):
+        """
+        Args:
+            max_workers: maximum number of chunk requests running concurrently
+            connect_timeout: seconds to wait for establishing a connection
+            read_timeout: seconds to wait for the response data
+            base_url: NBP API base url, defaults to `BASE_URL`
+            rate_limiter: token bucket throttling requests, defaults to the one
+                shared by the whole process
+            retry_policy: backoff applied to throttled and failed requests
+            max_retries: number of retries allowed during the client lifetime
+            cache: on-disk cache of responses, disabled by default
+            recent_ttl: seconds for which responses including today are cached
+            table: NBP table the rates are fetched from, one of `NBP_TABLES`
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        super().__init__(
+            base_url, rate_limiter, retry_policy, max_retries, cache, recent_ttl, table
+        )
+        self.max_workers = max_workers
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """Create session keeping connections alive between requests"""
+        session = requests.Session()
+        # every concurrent chunk request holds one pooled connection
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.HEADERS)
+        return session
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.session.close()
+
+    def __enter__(self) -> "NBPClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _request(self, url: str, end_date: date) -> Any:
+        """Make single NBP API request for data up to `end_date`, retrying if needed"""
+        cached, entry = self._cache_lookup(url)
+        if cached is not None:
+            return cached
+        headers = entry.validators() if entry else {}
+
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                logger.debug("Making NBP API request: %s", url)
+                response = self.session.get(
+                    url,
+                    params=dict(format="json"),
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                raise APIError(f"NBP API request failed: {str(e)}")
+
+            delay = self._retry_delay(attempt, response)
+            if delay is None:
+                return self._cache_response(url, end_date, entry, response)
+            time.sleep(delay)
+            attempt += 1
+
+    def _make_request(self, start_date: date, end_date: date) -> List[ExchangeRate]:
+        url = self._tables_url(start_date, end_date)
+        return self._parse_response(self._request(url, end_date))
+
+    def _make_frame_request(self, start_date: date, end_date: date) -> pl.DataFrame:
+        url = self._tables_url(start_date, end_date)
+        return self._parse_response_frame(self._request(url, end_date))
+
+    def _make_series_request(
+        self, currency_code: str, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        url = self._series_url(currency_code, start_date, end_date)
+        return self._parse_series_frame(self._request(url, end_date))
+
+    def _map_chunks(
+        self,
+        make_request: Callable[[date, date], T],
+        start_date: date,
+        end_date: date,
+        max_days: Optional[int] = None,
+    ) -> List[T]:
+        """Run request for every chunk of the range, results are in date order"""
+        chunks = self._date_chunks(start_date, end_date, max_days)
+        if len(chunks) == 1 or self.max_workers == 1:
+            return [make_request(*chunk) for chunk in chunks]
+
+        # executor.map yields results in submission order, so the merged
+        # output stays sorted by date regardless of which chunk finishes first
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(chunks)),
+            thread_name_prefix="nbp-chunk",
+        ) as executor:
+            return list(executor.map(lambda chunk: make_request(*chunk), chunks))
 
     def get_exchange_rates(
         self, start_date: date, end_date: date
     ) -> List[ExchangeRate]:
-        # If period is within 93 days, make single request.
-        # NBP api does not allow to fetch more than 93 days at once.
-        if (end_date - start_date).days <= 93:
-            return self._make_request(start_date, end_date)
+        chunk_results = self._map_chunks(self._make_request, start_date, end_date)
 
-        # Split into 93-day chunks
-        all_rates = []
-        current_start = start_date
+        return [rate for chunk_rates in chunk_results for rate in chunk_rates]
 
-        while current_start <= end_date:
-            current_end = min(current_start + timedelta(days=93), end_date)
+    def get_exchange_rates_frame(
+        self, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        return pl.concat(
+            self._map_chunks(self._make_frame_request, start_date, end_date)
+        )
 
-            # Get rates for this chunk
-            chunk_rates = self._make_request(current_start, current_end)
-            all_rates.extend(chunk_rates)
+    def get_currency_rates_frame(
+        self, currency_code: str, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        """Fetch the currency series instead of whole tables"""
+        return pl.concat(
+            self._map_chunks(
+                lambda chunk_start, chunk_end: self._make_series_request(
+                    currency_code, chunk_start, chunk_end
+                ),
+                start_date,
+                end_date,
+                self.MAX_DAYS_PER_SERIES_REQUEST,
+            )
+        )
 
-            # Move to next chunk
-            current_start = current_end + timedelta(days=1)
 
-        return all_rates
+class AsyncNBPClient(_NBPClientBase, AsyncExchangeRateClient):
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        base_url: Optional[str] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        max_retries: int = 20,
+        cache: Optional[ResponseCache] = None,
+        recent_ttl: float = 300.0,
+        table: str = "A",
+    ):
+        """
+        Args:
+            max_concurrency: maximum number of requests in flight, shared by all
+                calls made through the client within an event loop
+            connect_timeout: seconds to wait for establishing a connection
+            read_timeout: seconds to wait for the response data
+            base_url: NBP API base url, defaults to `BASE_URL`
+            rate_limiter: token bucket throttling requests, defaults to the one
+                shared by the whole process
+            retry_policy: backoff applied to throttled and failed requests
+            max_retries: number of retries allowed during the client lifetime
+            cache: on-disk cache of responses, disabled by default
+            recent_ttl: seconds for which responses including today are cached
+            table: NBP table the rates are fetched from, one of `NBP_TABLES`
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        super().__init__(
+            base_url, rate_limiter, retry_policy, max_retries, cache, recent_ttl, table
+        )
+        self.max_concurrency = max_concurrency
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        # the semaphore and the connections are bound to the event loop they
+        # are used in, so the client keeps them for every loop it is used in,
+        # e.g. ones started by `asyncio.run` of the synchronous entry points
+        self._sessions: Dict[
+            asyncio.AbstractEventLoop, Tuple[asyncio.Semaphore, httpx.AsyncClient]
+        ] = {}
+        self._sessions_lock = threading.Lock()
+
+    def _session(self) -> Tuple[asyncio.Semaphore, httpx.AsyncClient]:
+        """Semaphore and connection pool of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            if loop not in self._sessions:
+                self._sessions[loop] = (
+                    asyncio.Semaphore(self.max_concurrency),
+                    httpx.AsyncClient(
+                        headers=self.HEADERS,
+                        timeout=self._timeout,
+                        limits=httpx.Limits(
+                            max_connections=self.max_concurrency,
+                            max_keepalive_connections=self.max_concurrency,
+                        ),
+                    ),
+                )
+            return self._sessions[loop]
+
+    async def aclose(self) -> None:
+        """Close pooled connections of the running event loop, the client can
+        still be used afterwards, opening new ones"""
+        with self._sessions_lock:
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session[1].aclose()
+
+    async def __aenter__(self) -> "AsyncNBPClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def _request(self, url: str, end_date: date) -> Any:
+        """Make single NBP API request for data up to `end_date`, retrying if needed"""
+        cached, entry = self._cache_lookup(url)
+        if cached is not None:
+            return cached
+        headers = entry.validators() if entry else {}
+
+        semaphore, http = self._session()
+        async with semaphore:
+            attempt = 0
+            while True:
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    logger.debug("Making NBP API request: %s", url)
+                    response = await http.get(
+                        url, params=dict(format="json"), headers=headers
+                    )
+                except httpx.HTTPError as e:
+                    raise APIError(f"NBP API request failed: {str(e)}")
+
+                delay = self._retry_delay(attempt, response)
+                if delay is None:
+                    return self._cache_response(url, end_date, entry, response)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _make_request(
+        self, start_date: date, end_date: date
+    ) -> List[ExchangeRate]:
+        url = self._tables_url(start_date, end_date)
+        return self._parse_response(await self._request(url, end_date))
+
+    async def _make_frame_request(
+        self, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        url = self._tables_url(start_date, end_date)
+        return self._parse_response_frame(await self._request(url, end_date))
+
+    async def _make_series_request(
+        self, currency_code: str, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        url = self._series_url(currency_code, start_date, end_date)
+        return self._parse_series_frame(await self._request(url, end_date))
+
+    async def get_exchange_rates(
+        self, start_date: date, end_date: date
+    ) -> List[ExchangeRate]:
+        chunk_results = await asyncio.gather(
+            *(
+                self._make_request(*chunk)
+                for chunk in self._date_chunks(start_date, end_date)
+            )
+        )
+
+        return [rate for chunk_rates in chunk_results for rate in chunk_rates]
+
+    async def get_exchange_rates_frame(
+        self, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        return pl.concat(
+            await asyncio.gather(
+                *(
+                    self._make_frame_request(*chunk)
+                    for chunk in self._date_chunks(start_date, end_date)
+                )
+            )
+        )
+
+    async def get_currency_rates_frame(
+        self, currency_code: str, start_date: date, end_date: date
+    ) -> pl.DataFrame:
+        """Fetch the currency series instead of whole tables"""
+        chunks = self._date_chunks(
+            start_date, end_date, self.MAX_DAYS_PER_SERIES_REQUEST
+        )
+        return pl.concat(
+            await asyncio.gather(
+                *(self._make_series_request(currency_code, *chunk) for chunk in chunks)
+            )
+        )
+
+
+# subset of the tables payload needed to build exchange rates, table C
+# quotes bid and ask instead of mid
+TABLES_JSON_SCHEMA = {
+    "effectiveDate": pl.Utf8,
+    "rates": pl.List(
+        pl.Struct(
+            {"code": pl.Utf8, "mid": pl.Float64, "bid": pl.Float64, "ask": pl.Float64}
+        )
+    ),
+}
 
 
 @dataclass(frozen=True)
 class NBPRate:
     currency: str
     code: str
-    mid: Decimal
+    mid: Optional[Decimal] = None
+    bid: Optional[Decimal] = None
+    ask: Optional[Decimal] = None
     source: Final[str] = "NBP"
 
 
@@ -99,6 +593,30 @@ class NBPTableResponse:
             for rate in self.rates
         ]
 
+    @staticmethod
+    def frame_from_json(content: bytes) -> pl.DataFrame:
+        """Parse raw tables payload straight into a frame with `RATES_SCHEMA` columns.
+
+        Equivalent to `from_json` followed by `to_exchange_rates`, but the payload
+        is decoded by polars without creating Python objects for every rate.
+        """
+        tables = pl.read_json(io.BytesIO(content), schema=TABLES_JSON_SCHEMA)
+        if tables.is_empty():
+            return pl.DataFrame(schema=RATES_SCHEMA)
+
+        return (
+            tables.explode("rates", empty_as_null=True)
+            .unnest("rates")
+            .select(
+                pl.col("code").alias("currency_code"),
+                pl.col("mid").alias("rate"),
+                pl.col("effectiveDate").str.to_date("%Y-%m-%d").alias("date"),
+                pl.lit(NBPRate.source).alias("source"),
+                "bid",
+                "ask",
+            )
+        )
+
     @classmethod
     def from_json(cls, data: List[Dict[str, Any]]) -> List["NBPTableResponse"]:
         return [
@@ -110,3 +628,43 @@ class NBPTableResponse:
             )
             for table in data
         ]
+
+
+# subset of the series payload needed to build exchange rates
+SERIES_JSON_SCHEMA = {
+    "code": pl.Utf8,
+    "rates": pl.List(
+        pl.Struct(
+            {
+                "effectiveDate": pl.Utf8,
+                "mid": pl.Float64,
+                "bid": pl.Float64,
+                "ask": pl.Float64,
+            }
+        )
+    ),
+}
+
+
+class NBPSeriesResponse:
+    """Rates of a single currency returned by the `exchangerates/rates` endpoint"""
+
+    @staticmethod
+    def frame_from_json(content: bytes) -> pl.DataFrame:
+        """Parse raw series payload into a frame with `RATES_SCHEMA` columns"""
+        series = pl.read_json(io.BytesIO(content), schema=SERIES_JSON_SCHEMA)
+        if series.is_empty():
+            return pl.DataFrame(schema=RATES_SCHEMA)
+
+        return (
+            series.explode("rates", empty_as_null=True)
+            .unnest("rates")
+            .select(
+                pl.col("code").alias("currency_code"),
+                pl.col("mid").alias("rate"),
+                pl.col("effectiveDate").str.to_date("%Y-%m-%d").alias("date"),
+                pl.lit(NBPRate.source).alias("source"),
+                "bid",
+                "ask",
+            )
+        )
@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from currency_analyzer.logger import get_logger
+
+logger = get_logger(__name__)
+
+# status codes after which the request is retried with backoff
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Thread-safe token bucket with an adaptive refill rate.
+
+    The refill rate grows additively after successful requests and is cut
+    multiplicatively when the server throttles, so throughput settles just below
+    the server limit.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        capacity: float = 10.0,
+        min_rate: float = 0.5,
+        increase_step: float = 0.1,
+        decrease_factor: float = 0.5,
+    ):
+        """
+        Args:
+            rate: initial and maximum number of requests per second
+            capacity: maximum number of requests allowed in a burst
+            min_rate: lower bound of the refill rate after backing off
+            increase_step: requests per second added after every success
+            decrease_factor: refill rate multiplier applied after throttling
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min(min_rate, rate)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """Reserve a token and return number of seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self) -> None:
+        """Block until a token is available"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Slow down after the server rejected a request.
+
+        When the server asked to retry after a given time, no tokens are handed
+        out until then.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            logger.debug("Request rate reduced to %.2f/s", self.rate)
+
+
+class RetryBudget:
+    """Thread-safe number of retries allowed during a single run"""
+
+    def __init__(self, max_retries: int = 20):
+        self.remaining = max_retries
+        self._lock = threading.Lock()
+
+    def try_consume(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retrying the given (0-based) attempt"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if retry_after is not None:
+            # never retry sooner than the server asked to
+            return retry_after + delay
+        return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse `Retry-After` header given either in seconds or as HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_shared_bucket: Optional[TokenBucket] = None
+_shared_bucket_lock = threading.Lock()
+
+
+def get_shared_bucket() -> TokenBucket:
+    """Token bucket shared by all clients of the process"""
+    global _shared_bucket
+    with _shared_bucket_lock:
+        if _shared_bucket is None:
+            _shared_bucket = TokenBucket()
+        return _shared_bucket
@@ -1,70 +1,268 @@
+import json
+import os
 from pathlib import Path
 import typer
+from typer.core import TyperGroup
 from datetime import date, datetime
 
-from typing import Annotated, Any, Callable, Optional
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple
 from enum import Enum
 
 
+from currency_analyzer.api.cache import ResponseCache
 from currency_analyzer.api.client import ExchangeRateClient
 from currency_analyzer.api.nbp import NBPClient
 from currency_analyzer.logger import get_logger
-from currency_analyzer.reporting.export import (
-    CSVRateExporter,
-    JSONRateExporter,
-    RateExporter,
+from currency_analyzer.reporting.batch import (
+    EXPORTERS,
+    BatchResult,
+    ReportSpec,
+    run_batch,
 )
+from currency_analyzer.reporting.export import RateExporter
 from currency_analyzer.reporting.analysis import (
+    DEFAULT_ROLLING_WINDOW,
+    CorrelationDataStrategy,
+    CrossRatesDataStrategy,
+    DataPreparationStrategy,
+    LazyRateChangesDataStrategy,
     RateChangesDataStrategy,
     RawRatesDataStrategy,
+    RollingStatsDataStrategy,
+    StreamingRawRatesDataStrategy,
 )
 
 from ..core.database import RateRepository
+from ..core.parquet import ParquetRateRepository
+from ..core.result_cache import ResultCache
+from ..core.storage import RateStore
 from ..core.exceptions import APIError, DatabaseError
 
 logger = get_logger(__name__)
 
-app = typer.Typer(name="currency-analyzer", add_completion=False)
+
+class DefaultExportGroup(TyperGroup):
+    """Commands of the analyzer, `export` runs when no command is given, so
+    `analyzer --start-date ...` keeps exporting reports"""
+
+    def parse_args(self, ctx: Any, args: List[str]) -> List[str]:
+        if not args or args[0] not in [*self.commands, "--help"]:
+            args = ["export", *args]
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(
+    name="currency-analyzer", add_completion=False, cls=DefaultExportGroup
+)
 
 
 def validate_dates(start_date: date, end_date: date) -> None:
     if end_date < start_date:
         raise ValueError("End date must be after start date")
 
-    if (end_date - start_date).days > 279:
-        raise ValueError("Date range cannot exceed 279 days")
-
     if end_date > date.today():
         raise ValueError("End date cannot be in the future")
 
 
-def exporter_cls_from_params(
-    export_type: str, format: str
-) -> Callable[[Any, Any], RateExporter]:
-    exporters = {
-        ("changes", "csv"): lambda r, c: CSVRateExporter(
-            r, RateChangesDataStrategy(), c
+def parse_pairs(pairs: Optional[str]) -> Optional[List[Tuple[str, str]]]:
+    """Currency pairs given as comma separated `BASE/QUOTE` codes"""
+    if not pairs:
+        return None
+
+    parsed = []
+    for pair in pairs.split(","):
+        codes = [code.strip().upper() for code in pair.split("/")]
+        if len(codes) != 2 or not all(codes):
+            raise ValueError(f"Invalid currency pair: {pair}, expected e.g. EUR/USD")
+        parsed.append((codes[0], codes[1]))
+    return parsed
+
+
+def strategy_from_params(
+    export_type: str,
+    engine: str = "sql",
+    window: Optional[int] = None,
+    pairs: Optional[List[Tuple[str, str]]] = None,
+    stream_batch_size: Optional[int] = None,
+) -> DataPreparationStrategy:
+    """Strategy of the report, `window` is the window of rolling statistics,
+    `DEFAULT_ROLLING_WINDOW` if not given, and of rolling correlations, which
+    are computed over the whole range without it. Raw rates are streamed
+    `stream_batch_size` rows at a time if given."""
+    if stream_batch_size is not None and export_type != "raw":
+        raise ValueError("Only raw exports can be streamed")
+    changes_strategy = {
+        "sql": RateChangesDataStrategy,
+        "polars": LazyRateChangesDataStrategy,
+    }.get(engine)
+    if not changes_strategy:
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    strategies: Dict[str, Callable[[], DataPreparationStrategy]] = {
+        "changes": changes_strategy,
+        "raw": lambda: (
+            StreamingRawRatesDataStrategy(stream_batch_size)
+            if stream_batch_size
+            else RawRatesDataStrategy()
         ),
-        ("changes", "json"): lambda r, c: JSONRateExporter(
-            r, RateChangesDataStrategy(), c
-        ),
-        ("raw", "csv"): lambda r, c: CSVRateExporter(r, RawRatesDataStrategy(), c),
-        ("raw", "json"): lambda r, c: JSONRateExporter(r, RawRatesDataStrategy(), c),
+        "rolling": lambda: RollingStatsDataStrategy(window or DEFAULT_ROLLING_WINDOW),
+        "cross": lambda: CrossRatesDataStrategy(pairs),
+        "correlation": lambda: CorrelationDataStrategy(window),
     }
+    strategy = strategies.get(export_type)
+    if not strategy:
+        raise ValueError(f"Unsupported export type: {export_type}")
+    return strategy()
+
 
-    exporter_class = exporters.get((export_type, format.lower()))
+def exporter_cls_from_params(
+    export_type: str,
+    format: str,
+    engine: str = "sql",
+    window: Optional[int] = None,
+    pairs: Optional[List[Tuple[str, str]]] = None,
+    stream_batch_size: Optional[int] = None,
+) -> Callable[[Any, Any], RateExporter]:
+    strategy = strategy_from_params(
+        export_type, engine, window, pairs, stream_batch_size
+    )
+    exporter_class = EXPORTERS.get(format.lower())
     if not exporter_class:
         raise ValueError(f"Unsupported format: {format}")
-    return exporter_class
+
+    return lambda r, c: exporter_class(r, strategy, c)
+
+
+# options of reports of batch manifests, like those of `analyzer export`
+MANIFEST_OPTIONS = frozenset(
+    {
+        "output",
+        "start_date",
+        "end_date",
+        "currency",
+        "format",
+        "export_type",
+        "window",
+        "engine",
+        "table",
+        "pairs",
+    }
+)
 
 
-def get_client(source: str) -> ExchangeRateClient:
+def load_manifest(path: Path) -> List[ReportSpec]:
+    """Reports of a JSON manifest, a `reports` list of objects with options of
+    `analyzer export`, and optional `defaults` of options of all reports"""
+    try:
+        document = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Invalid manifest {path}: {e}")
+
+    defaults = document.get("defaults", {})
+    specs = []
+    for i, report in enumerate(document.get("reports", [])):
+        options = {**defaults, **report}
+        unknown = sorted(set(options) - MANIFEST_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown options of report {i}: {', '.join(unknown)}")
+        try:
+            specs.append(_report_spec(options))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid report {i}: {e}")
+
+    if not specs:
+        raise ValueError(f"No reports in manifest {path}")
+    return specs
+
+
+def _report_spec(options: Dict[str, Any]) -> ReportSpec:
+    output = Path(options["output"])
+    start_date = date.fromisoformat(options["start_date"])
+    end_date = date.fromisoformat(options["end_date"])
+    validate_dates(start_date, end_date)
+
+    export_type = ExportType(options.get("export_type", ExportType.CHANGES))
+    table = RateTable(options.get("table", RateTable.A))
+    if export_type != ExportType.RAW and table == RateTable.C:
+        raise ValueError(
+            f"{export_type.value.capitalize()} export requires average rates "
+            "of table A or B"
+        )
+    window = options.get("window")
+    if window is not None and window < 2:
+        raise ValueError("Rolling window must span at least 2 rates")
+    pairs = options.get("pairs")
+    if isinstance(pairs, list):
+        pairs = ",".join(pairs)
+
+    return ReportSpec(
+        output=output,
+        start_date=start_date,
+        end_date=end_date,
+        export_type=export_type.value,
+        format=ExportFormat(options.get("format", output.suffix[1:])).value,
+        currency=options.get("currency"),
+        table=table.value,
+        engine=ChangesEngine(options.get("engine", ChangesEngine.SQL)).value,
+        window=window,
+        pairs=parse_pairs(pairs),
+    )
+
+
+def print_batch_result(result: BatchResult) -> None:
+    """Timings of every report and of the phases of the batch"""
+    for report in result.reports:
+        shared = f" (shared by {report.shared_by})" if report.shared_by > 1 else ""
+        status = f"failed: {report.error}" if report.error else "ok"
+        print(
+            f"{report.spec.output}: query {report.query_seconds * 1000:.1f}ms"
+            f"{shared}, write {report.write_seconds * 1000:.1f}ms, {status}"
+        )
+    print(
+        f"{len(result.reports)} reports, {len(result.failed)} failed: "
+        f"fetch {result.fetch_seconds * 1000:.1f}ms, "
+        f"queries {result.query_seconds * 1000:.1f}ms, "
+        f"writes {result.write_seconds * 1000:.1f}ms, "
+        f"total {result.total_seconds * 1000:.1f}ms"
+    )
+
+
+def get_client(
+    source: str,
+    concurrency: int = 4,
+    max_retries: int = 20,
+    cache: Optional[ResponseCache] = None,
+    api_url: Optional[str] = None,
+    table: str = "A",
+) -> ExchangeRateClient:
     if source == "nbp":
-        return NBPClient()
+        return NBPClient(
+            max_workers=concurrency,
+            max_retries=max_retries,
+            cache=cache,
+            base_url=api_url,
+            table=table,
+        )
     else:
         raise ValueError(f"Unsupported source: {source}")
 
 
+def get_repository(
+    storage: str,
+    db_path: str,
+    parquet_dir: Path,
+    result_cache: Optional[ResultCache] = None,
+) -> RateStore:
+    if storage == "sqlite":
+        return RateRepository(db_path, result_cache=result_cache)
+    elif storage == "parquet":
+        if result_cache is not None:
+            raise ValueError("Result cache requires sqlite storage")
+        return ParquetRateRepository(str(parquet_dir))
+    else:
+        raise ValueError(f"Unsupported storage: {storage}")
+
+
 class ExportFormat(str, Enum):
     CSV = "csv"
     JSON = "json"
@@ -73,12 +271,31 @@ class ExportFormat(str, Enum):
 class ExportType(str, Enum):
     CHANGES = "changes"
     RAW = "raw"
+    ROLLING = "rolling"
+    CROSS = "cross"
+    CORRELATION = "correlation"
+
+
+class ChangesEngine(str, Enum):
+    SQL = "sql"
+    POLARS = "polars"
+
+
+class StorageBackend(str, Enum):
+    SQLITE = "sqlite"
+    PARQUET = "parquet"
 
 
 class DataSource(str, Enum):
     NBP = "nbp"
 
 
+class RateTable(str, Enum):
+    A = "A"
+    B = "B"
+    C = "C"
+
+
 @app.command()
 def export(
     start_date: Annotated[datetime, typer.Option(help="Start date (YYYY-MM-DD)")],
@@ -97,35 +314,137 @@ def export(
             help="Currency code (e.g., USD). If not provided, exports all currencies"
         ),
     ] = None,
+    pairs: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Currency pairs of cross rates (e.g., EUR/USD,GBP/CHF). "
+            "If not provided, exports all pairs of --currency or of all currencies"
+        ),
+    ] = None,
     format: Annotated[
         ExportFormat, typer.Option(help="Export format (csv/json)")
     ] = ExportFormat.JSON,
     export_type: Annotated[
-        ExportType, typer.Option(help="Type of export (changes/raw)")
+        ExportType,
+        typer.Option(help="Type of export (changes/raw/rolling/cross/correlation)"),
     ] = ExportType.CHANGES,
+    window: Annotated[
+        Optional[int],
+        typer.Option(
+            min=2,
+            help="Number of published rates in windows of rolling statistics "
+            f"({DEFAULT_ROLLING_WINDOW} by default), computes rolling "
+            "correlations if given for correlation export",
+        ),
+    ] = None,
     db_path: Annotated[
         str, typer.Option(help="Path to the database file")
     ] = "rates.db",
+    engine: Annotated[
+        ChangesEngine,
+        typer.Option(
+            help="Engine computing changes: sql - queries of the storage, "
+            "polars - lazy pipeline over the stored rates"
+        ),
+    ] = ChangesEngine.SQL,
+    storage: Annotated[
+        StorageBackend,
+        typer.Option(
+            help="Storage of the rates: sqlite - database at --db-path, "
+            "parquet - files partitioned by month in --parquet-dir"
+        ),
+    ] = StorageBackend.SQLITE,
+    parquet_dir: Annotated[
+        Path, typer.Option(help="Root directory of the Parquet storage")
+    ] = Path("rates-parquet"),
     source: Annotated[DataSource, typer.Option(help="Data source")] = DataSource.NBP,
+    table: Annotated[
+        RateTable,
+        typer.Option(
+            help="Source table: A - average rates of major currencies, "
+            "B - average rates of other currencies, C - buy and sell rates"
+        ),
+    ] = RateTable.A,
+    concurrency: Annotated[
+        int, typer.Option(min=1, help="Maximum number of concurrent API requests")
+    ] = 4,
+    max_retries: Annotated[
+        int,
+        typer.Option(
+            min=0, help="Number of retries of throttled or failed API requests"
+        ),
+    ] = 20,
+    http_cache_dir: Annotated[
+        Optional[Path],
+        typer.Option(help="Directory of the on-disk API response cache"),
+    ] = None,
+    http_cache_size: Annotated[
+        int, typer.Option(min=1, help="Maximum size of the response cache in MB")
+    ] = 256,
+    api_url: Annotated[
+        Optional[str],
+        typer.Option(help="Base url of the source API, e.g. of a local stand-in"),
+    ] = None,
+    result_cache_dir: Annotated[
+        Optional[Path],
+        typer.Option(help="Directory of the on-disk cache of report queries"),
+    ] = None,
+    result_cache_size: Annotated[
+        int, typer.Option(min=1, help="Maximum size of the result cache in MB")
+    ] = 256,
+    stream_batch_size: Annotated[
+        Optional[int],
+        typer.Option(
+            min=1,
+            help="Stream raw rates from the storage to the output this many "
+            "rows at a time, keeping memory flat over long ranges",
+        ),
+    ] = None,
 ):
     """Export exchange rates report"""
     try:
         validate_dates(start_date.date(), end_date.date())
+        currency_pairs = parse_pairs(pairs)
+        if export_type != ExportType.RAW and table == RateTable.C:
+            raise ValueError(
+                f"{export_type.value.capitalize()} export requires average rates "
+                "of table A or B"
+            )
 
-        repo = RateRepository(db_path)
+        # select exporter based on export type and format
+        exporter_cls = exporter_cls_from_params(
+            export_type, format, engine, window, currency_pairs, stream_batch_size
+        )
 
-        client = get_client(source)
+        result_cache = (
+            ResultCache(
+                result_cache_dir, max_disk_bytes=result_cache_size * 1024 * 1024
+            )
+            if result_cache_dir
+            else None
+        )
+        repo = get_repository(storage, db_path, parquet_dir, result_cache)
 
-        # select exporter based on export type and format
-        exporter_cls = exporter_cls_from_params(export_type, format)
+        cache = (
+            ResponseCache(http_cache_dir, max_bytes=http_cache_size * 1024 * 1024)
+            if http_cache_dir
+            else None
+        )
+        client = get_client(
+            source, concurrency, max_retries, cache, api_url, table.value
+        )
 
         exporter = exporter_cls(repo, client)
-        filepath = exporter.generate_report(
-            start_date=start_date.date(),
-            end_date=end_date.date(),
-            currency_code=currency,
-            output_file=output,
-        )
+        try:
+            filepath = exporter.generate_report(
+                start_date=start_date.date(),
+                end_date=end_date.date(),
+                currency_code=currency,
+                output_file=output,
+            )
+        finally:
+            client.close()
+            repo.close()
 
         return filepath
 
@@ -134,6 +453,93 @@ def export(
         raise typer.Exit(code=1)
 
 
+@app.command()
+def batch(
+    manifest: Annotated[
+        Path, typer.Argument(help="JSON manifest of the reports to export")
+    ],
+    db_path: Annotated[
+        str, typer.Option(help="Path to the database file")
+    ] = "rates.db",
+    storage: Annotated[
+        StorageBackend,
+        typer.Option(
+            help="Storage of the rates: sqlite - database at --db-path, "
+            "parquet - files partitioned by month in --parquet-dir"
+        ),
+    ] = StorageBackend.SQLITE,
+    parquet_dir: Annotated[
+        Path, typer.Option(help="Root directory of the Parquet storage")
+    ] = Path("rates-parquet"),
+    source: Annotated[DataSource, typer.Option(help="Data source")] = DataSource.NBP,
+    workers: Annotated[
+        int,
+        typer.Option(min=1, help="Number of reports prepared and written at once"),
+    ] = min(8, os.cpu_count() or 1),
+    concurrency: Annotated[
+        int, typer.Option(min=1, help="Maximum number of concurrent API requests")
+    ] = 4,
+    max_retries: Annotated[
+        int,
+        typer.Option(
+            min=0, help="Number of retries of throttled or failed API requests"
+        ),
+    ] = 20,
+    http_cache_dir: Annotated[
+        Optional[Path],
+        typer.Option(help="Directory of the on-disk API response cache"),
+    ] = None,
+    http_cache_size: Annotated[
+        int, typer.Option(min=1, help="Maximum size of the response cache in MB")
+    ] = 256,
+    api_url: Annotated[
+        Optional[str],
+        typer.Option(help="Base url of the source API, e.g. of a local stand-in"),
+    ] = None,
+):
+    """Export reports of a manifest, fetching and querying rates they share once"""
+    try:
+        specs = load_manifest(manifest)
+        repo = get_repository(storage, db_path, parquet_dir)
+        cache = (
+            ResponseCache(http_cache_dir, max_bytes=http_cache_size * 1024 * 1024)
+            if http_cache_dir
+            else None
+        )
+        client = get_client(source, concurrency, max_retries, cache, api_url)
+        try:
+            # clients of other tables share connections and the rate limiter
+            clients = {
+                spec.table: (
+                    client
+                    if spec.table == client.table
+                    else client.for_table(spec.table)
+                )
+                for spec in specs
+            }
+            result = run_batch(
+                repo,
+                clients,
+                specs,
+                lambda spec: strategy_from_params(
+                    spec.export_type, spec.engine, spec.window, spec.pairs
+                ),
+                workers,
+            )
+        finally:
+            client.close()
+            repo.close()
+
+    except (ValueError, APIError, DatabaseError) as e:
+        print(f"Batch failed: {str(e)}")
+        raise typer.Exit(code=1)
+
+    print_batch_result(result)
+    if result.failed:
+        raise typer.Exit(code=1)
+    return result
+
+
 def app_with_logger():
     return app
 
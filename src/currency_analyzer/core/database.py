@@ -1,8 +1,28 @@
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from itertools import islice
 import polars as pl
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from currency_analyzer.core.exceptions import DatabaseError, MissingDataError
-from datetime import date
+from currency_analyzer.core.migrations import (
+    REFRESH_DAILY_CHANGES,
+    REFRESH_MONTHLY_CHANGES,
+    ProgressCallback,
+    migrate,
+)
+from currency_analyzer.core.result_cache import ResultCache
+from currency_analyzer.core.storage import (
+    RateStore,
+    coverage_days,
+    fill_missing_days,
+    fill_missing_days_batches,
+    missing_ranges,
+    round_changes,
+)
+from datetime import date, timedelta
 
 from currency_analyzer.core.types import ExchangeRate, ExchangeRateChange
 from currency_analyzer.logger import get_logger
@@ -10,98 +30,485 @@ from currency_analyzer.logger import get_logger
 
 logger = get_logger(__name__)
 
+EPOCH = date(1970, 1, 1)
+# rows committed together by the bulk ingestion, bounding the memory it uses
+# and the time other connections wait for the write lock
+DEFAULT_INGEST_BATCH_SIZE = 50_000
+# rows fetched from the cursor of streamed reads at a time, larger batches
+# are not faster but grow memory retained by the allocators
+DEFAULT_READ_BATCH_SIZE = 10_000
 
-class RateRepository:
-    def __init__(self, db_path: str):
+
+def day_number(day: date) -> int:
+    """Day as stored in the `rates` table"""
+    return (day - EPOCH).days
+
+
+def day_ranges(rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+    """First and last day of the rates of every currency among rows of the
+    `rates` table"""
+    ranges: Dict[Tuple[str, str, str], List[int]] = {}
+    for source, table, currency_code, day, *_ in rows:
+        bounds = ranges.setdefault((source, table, currency_code), [day, day])
+        if day < bounds[0]:
+            bounds[0] = day
+        elif day > bounds[1]:
+            bounds[1] = day
+    return [
+        {
+            "source": source,
+            "table_name": table,
+            "currency_code": currency_code,
+            "first_day": first_day,
+            "last_day": last_day,
+        }
+        for (source, table, currency_code), (first_day, last_day) in ranges.items()
+    ]
+
+
+@dataclass
+class IngestStats:
+    """Outcome of a bulk ingestion"""
+
+    rows: int = 0
+    # rows not stored yet, the others are ignored
+    inserted: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass(frozen=True)
+class SQLiteSettings:
+    """Pragmas applied to the connection of the repository"""
+
+    # readers do not block the writer and vice versa
+    journal_mode: str = "wal"
+    # in WAL mode a commit is durable after the next checkpoint
+    synchronous: str = "normal"
+    # negative values are in KiB
+    cache_size: int = -64_000
+    mmap_size: int = 256 * 1024 * 1024
+    temp_store: str = "memory"
+    # milliseconds to wait for a lock held by another process
+    busy_timeout: int = 5_000
+
+    def pragmas(self) -> List[str]:
+        return [f"PRAGMA {name} = {value}" for name, value in asdict(self).items()]
+
+
+class RateRepository(RateStore):
+    """Exchange rates stored in SQLite.
+
+    The repository keeps a single connection open for its lifetime, shared by
+    threads using it, so it should be closed, e.g. by using it as a context manager.
+
+    With `result_cache` reads of rates and changes are served from the cache
+    until rates are inserted, by this or any other repository of the database.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        settings: Optional[SQLiteSettings] = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
         self.db_path = db_path
+        self.settings = settings or SQLiteSettings()
+        self.result_cache = result_cache
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
 
         self.apply_migrations()
 
-    def apply_migrations(self) -> None:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in self.settings.pragmas():
+            conn.execute(pragma)
+        logger.debug("Opened %s database", self.db_path)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the repository, opened on first use, the lock of the
+        repository should be held while using it"""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Connection of the repository, changes made within the block are
+        committed together or rolled back on error"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                yield conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self) -> "RateRepository":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def apply_migrations(self, progress: Optional[ProgressCallback] = None) -> None:
+        """Bring the schema to the latest version, see `currency_analyzer.core.migrations`"""
+        with self._lock:
             try:
-                cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS rates (
-                        currency_code TEXT,
-                        rate REAL,
-                        date TEXT,
-                        source TEXT,
-                        PRIMARY KEY (currency_code, date, source)
-                    )
-                    """
+                version = migrate(self._connection(), progress=progress)
+                logger.debug(
+                    "Database %s is at schema version %s", self.db_path, version
                 )
-                logger.debug("Created `rates` table in {} database", self.db_path)
-
-                conn.commit()
             except sqlite3.Error as e:
                 logger.error(
-                    "Error while creating `rates` table in {} database: {}",
+                    "Error while migrating %s database: %s",
                     self.db_path,
                     e,
                 )
-                raise DatabaseError(f"Error while creating `rates` table: {e}")
+                raise DatabaseError(f"Error while migrating database: {e}")
+
+    def insert_exchange_rates(
+        self, rates: List["ExchangeRate"], table: str = "A"
+    ) -> None:
+        self._insert_rows(self._rate_rows(rates, table))
+
+    def insert_exchange_rates_frame(
+        self, rates: pl.DataFrame, table: str = "A"
+    ) -> None:
+        """Insert rates of the source table given as a frame with `RATES_SCHEMA` columns"""
+        self._insert_rows(self._frame_rows(rates, table))
+
+    def ingest_rates(
+        self,
+        rates: Iterable["ExchangeRate"],
+        table: str = "A",
+        batch_size: int = DEFAULT_INGEST_BATCH_SIZE,
+    ) -> IngestStats:
+        """Insert rates of any number, e.g. produced by a generator, committing
+        them in batches, so that only a single batch is held in memory"""
+        rows = self._rate_rows(rates, table)
+        batches = iter(lambda: list(islice(rows, batch_size)), [])
+        return self._ingest((len(batch), batch, day_ranges(batch)) for batch in batches)
+
+    def ingest_rate_frames(
+        self,
+        frames: Iterable[pl.DataFrame],
+        table: str = "A",
+        batch_size: int = DEFAULT_INGEST_BATCH_SIZE,
+    ) -> IngestStats:
+        """Insert frames with `RATES_SCHEMA` columns, committing them in batches
+        of at most `batch_size` rows"""
+        return self._ingest(
+            (
+                batch.height,
+                self._frame_rows(batch, table),
+                self._frame_day_ranges(batch, table),
+            )
+            for frame in frames
+            for batch in frame.iter_slices(batch_size)
+        )
+
+    def _ingest(
+        self, batches: Iterable[Tuple[int, Iterable[tuple], List[Dict[str, Any]]]]
+    ) -> IngestStats:
+        stats = IngestStats()
+        started = time.perf_counter()
+        for size, rows, ranges in batches:
+            stats.inserted += self._insert_rows(rows, ranges)
+            stats.rows += size
+        stats.seconds = time.perf_counter() - started
+
+        logger.info(
+            "Ingested %s rates (%s new) to %s database in %.2fs, %.0f rows/s",
+            stats.rows,
+            stats.inserted,
+            self.db_path,
+            stats.seconds,
+            stats.rows_per_second,
+        )
+        return stats
+
+    def _rate_rows(
+        self, rates: Iterable["ExchangeRate"], table: str
+    ) -> Iterator[tuple]:
+        return (
+            (
+                rate.source,
+                table,
+                rate.currency_code,
+                day_number(rate.date),
+                float(rate.rate) if rate.rate is not None else None,
+                None,
+                None,
+            )
+            for rate in rates
+        )
 
-    def insert_exchange_rates(self, rates: List["ExchangeRate"]) -> None:
-        with sqlite3.connect(self.db_path) as conn:
+    def _frame_rows(self, rates: pl.DataFrame, table: str) -> Iterator[tuple]:
+        return rates.select(
+            "source",
+            pl.lit(table),
+            "currency_code",
+            # physical representation of dates is the day number
+            pl.col("date").cast(pl.Int32),
+            "rate",
+            "bid",
+            "ask",
+        ).iter_rows()
+
+    def _frame_day_ranges(
+        self, rates: pl.DataFrame, table: str
+    ) -> List[Dict[str, Any]]:
+        """`day_ranges` of a frame with `RATES_SCHEMA` columns"""
+        return (
+            rates.group_by("source", "currency_code")
+            .agg(
+                first_day=pl.col("date").min().cast(pl.Int32),
+                last_day=pl.col("date").max().cast(pl.Int32),
+            )
+            .with_columns(table_name=pl.lit(table))
+            .to_dicts()
+        )
+
+    def _insert_rows(
+        self, rows: Iterable[tuple], ranges: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        """Insert rows in a single transaction, return the number of new rows.
+
+        Changes of rows of a bulk ingestion, given with their `day_ranges`, and
+        their monthly rollups are not maintained by triggers for every row, but
+        refreshed once per currency over the range of its days.
+        """
+        bulk = ranges is not None
+        with self._transaction() as conn:
             cursor = conn.cursor()
 
             try:
+                if bulk:
+                    conn.execute("UPDATE bulk_ingest SET active = 1")
                 cursor.executemany(
                     """
-                    INSERT OR IGNORE INTO rates VALUES (?, ?, ?, ?)
+                    INSERT OR IGNORE INTO rates
+                        (source, table_name, currency_code, day, rate, bid, ask)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
                     """,
-                    [rate.to_tuple() for rate in rates],
+                    rows,
                 )
+                if bulk:
+                    if cursor.rowcount > 0:
+                        conn.executemany(REFRESH_DAILY_CHANGES, ranges)
+                        conn.executemany(REFRESH_MONTHLY_CHANGES, ranges)
+                    conn.execute("UPDATE bulk_ingest SET active = 0")
+                if cursor.rowcount > 0:
+                    # invalidates cached results of all repositories of the database
+                    conn.execute("UPDATE data_version SET version = version + 1")
                 logger.debug(
-                    "Inserted {} rates to `rates` table in {} database",
-                    len(rates),
+                    "Inserted %s rates to `rates` table in %s database",
+                    cursor.rowcount,
                     self.db_path,
                 )
                 conn.commit()
+                return cursor.rowcount
             except sqlite3.Error as e:
                 logger.error(
-                    "Error while creating inserting rates to `rates` table in {} database: {}",
+                    "Error while creating inserting rates to `rates` table in %s database: %s",
                     self.db_path,
                     e,
                 )
                 raise DatabaseError(f"Error while inserting rates data: {e}")
 
-    def get_exchange_rates(
+    def record_coverage(
+        self,
+        start_date: date,
+        end_date: date,
+        source: str,
+        table: str,
+        published_dates: Iterable[date],
+        currency_code: Optional[str] = None,
+    ) -> None:
+        """Mark dates in range as fetched from the source, see `coverage_days`.
+
+        With `currency_code` the coverage applies only to rates of that currency.
+        """
+        rows = [
+            (source, table, currency_code or "", day.isoformat(), int(published))
+            for day, published in coverage_days(start_date, end_date, published_dates)
+        ]
+
+        with self._transaction() as conn:
+            try:
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?)
+                    """,
+                    rows,
+                )
+                logger.debug(
+                    "Recorded coverage of %s days for %s/%s in %s database",
+                    len(rows),
+                    source,
+                    table,
+                    self.db_path,
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(
+                    "Error while recording coverage in %s database: %s",
+                    self.db_path,
+                    e,
+                )
+                raise DatabaseError(f"Error while recording coverage: {e}")
+
+    def get_missing_ranges(
+        self,
+        start_date: date,
+        end_date: date,
+        source: str,
+        table: str,
+        currency_code: Optional[str] = None,
+    ) -> List[Tuple[date, date]]:
+        """Return contiguous sub-ranges of the date range that were not fetched yet.
+
+        With `currency_code` days fetched either for the whole table or for that
+        currency alone count as fetched.
+        """
+        with self._transaction() as conn:
+            try:
+                cursor = conn.execute(
+                    """
+                    SELECT DISTINCT date FROM coverage
+                    WHERE source = ? AND table_name = ? AND currency_code IN ('', ?)
+                        AND date BETWEEN ? AND ?
+                    """,
+                    (
+                        source,
+                        table,
+                        currency_code or "",
+                        start_date.isoformat(),
+                        end_date.isoformat(),
+                    ),
+                )
+                covered = {date.fromisoformat(row[0]) for row in cursor.fetchall()}
+            except sqlite3.Error as e:
+                logger.error(
+                    "Error while fetching coverage from %s database: %s",
+                    self.db_path,
+                    e,
+                )
+                raise DatabaseError(f"Error while fetching coverage: {e}")
+
+        return missing_ranges(start_date, end_date, covered)
+
+    def data_version(self) -> Tuple[str, int]:
+        """Identifier of the database and the number of inserts which stored
+        new rates in it"""
+        with self._transaction() as conn:
+            try:
+                return conn.execute(
+                    "SELECT database_id, version FROM data_version"
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(
+                    "Error while fetching data version from %s database: %s",
+                    self.db_path,
+                    e,
+                )
+                raise DatabaseError(f"Error while fetching data version: {e}")
+
+    def _cached(
+        self, query: str, read: Callable[[], pl.DataFrame], *parameters: Any
+    ) -> pl.DataFrame:
+        """Result of the read, served from the result cache while the stored
+        rates do not change"""
+        if self.result_cache is None:
+            return read()
+
+        with self._lock:
+            # the version is read before the rates, so a result including
+            # rates inserted meanwhile is never stored as one of a later version
+            key = [query, *self.data_version(), *parameters]
+            result = self.result_cache.get(key)
+            if result is not None:
+                logger.debug("Serving %s of %s from result cache", query, parameters)
+                return result
+
+            result = read()
+            self.result_cache.store(key, result)
+            return result
+
+    def get_exchange_rates_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str = "A",
+    ) -> pl.DataFrame:
+        """Rates with a row for every day of the range, with columns of
+        `ExchangeRate` fields"""
+        return self._cached(
+            "rates",
+            lambda: self._read_rates(
+                ["rate"], start_date, end_date, currency_code, source, table
+            ).select("currency_code", "rate", "date", "source"),
+            start_date,
+            end_date,
+            currency_code,
+            source,
+            table,
+        )
+
+    def get_exchange_rate_quotes_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+    ) -> pl.DataFrame:
+        """Buy and sell rates of a table quoting them, with columns of
+        `ExchangeRateQuote` fields"""
+        return self._cached(
+            "quotes",
+            lambda: self._read_rates(
+                ["bid", "ask"], start_date, end_date, currency_code, source, table
+            ).select("currency_code", "bid", "ask", "date", "source"),
+            start_date,
+            end_date,
+            currency_code,
+            source,
+            table,
+        )
+
+    def _read_rates(
         self,
+        columns: List[str],
         start_date: date,
         end_date: date,
         currency_code: Optional[str],
         source: str,
-    ) -> List["ExchangeRate"]:
-        with sqlite3.connect(self.db_path) as conn:
+        table: str,
+    ) -> pl.DataFrame:
+        """Read rate columns for every day of the range and every currency with
+        any rate in it, days without rates are filled with nulls"""
+        with self._transaction() as conn:
             try:
-                if currency_code:
-                    query_result = pl.read_database(
-                        query="SELECT currency_code, rate, date, source FROM rates WHERE currency_code = ? AND date BETWEEN ? AND ? AND source = ?",
-                        connection=conn,
-                        execute_options={
-                            "parameters": [
-                                currency_code,
-                                start_date.isoformat(),
-                                end_date.isoformat(),
-                                source,
-                            ]
-                        },
-                    )
-                else:
-                    query_result = pl.read_database(
-                        query="SELECT currency_code, rate, date, source FROM rates WHERE date BETWEEN ? AND ? AND source = ?",
-                        connection=conn,
-                        execute_options={
-                            "parameters": [
-                                start_date.isoformat(),
-                                end_date.isoformat(),
-                                source,
-                            ]
-                        },
-                    )
+                query_result = pl.read_database(
+                    query=self._rates_query(columns, currency_code),
+                    connection=conn,
+                    execute_options={
+                        "parameters": self._rates_query_parameters(
+                            start_date, end_date, currency_code, source, table
+                        )
+                    },
+                )
 
                 if query_result.is_empty():
                     logger.error(
@@ -112,135 +519,364 @@ class RateRepository:
                     )
 
                 df = query_result.with_columns(
-                    pl.col("date").str.strptime(pl.Date, format="%Y-%m-%d"),
-                )
+                    pl.col("day").cast(pl.Date).alias("date"),
+                ).drop("day")
 
-                # create a dataframe with all dates in the range
-                dates_df = pl.DataFrame(
-                    {"date": pl.date_range(start_date, end_date, "1d", eager=True)}
-                )
-                currencies = df.get_column("currency_code").unique()
-                complete_df = (
-                    dates_df.join(
-                        pl.DataFrame({"currency_code": currencies}), how="cross"
-                    )
-                    .join(df, on=["currency_code", "date"], how="left")
-                    .with_columns(pl.col("source").fill_null(source))
-                    .sort(["currency_code", "date"])
-                )
-
-                return [
-                    ExchangeRate(
-                        currency_code=row["currency_code"],
-                        rate=row.get("rate", None),
-                        date=row["date"].isoformat(),
-                        source=row["source"],
-                    )
-                    for row in complete_df.iter_rows(named=True)
-                ]
+                return fill_missing_days(df, start_date, end_date, source)
             except sqlite3.Error as e:
                 logger.error(
-                    "Error while fetching exchange_rates from `rates` table from {} database: {}",
+                    "Error while fetching exchange_rates from `rates` table from %s database: %s",
                     self.db_path,
                     e,
                 )
                 raise DatabaseError(f"Error while fetching exchange rates: {e}")
 
-    def get_exchange_rate_changes(
+    def iter_exchange_rates_frames(
         self,
         start_date: date,
         end_date: date,
-        currency_code: Optional[str | int],
+        currency_code: Optional[str],
         source: str,
-    ) -> List["ExchangeRateChange"]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            start_date_str = start_date.isoformat()
-            end_date_str = end_date.isoformat()
+        table: str = "A",
+        batch_size: Optional[int] = None,
+    ) -> Iterator[pl.DataFrame]:
+        """Rows of `get_exchange_rates_frame` as frames read from a cursor
+        `batch_size` rows at a time, so the range never is in memory at once"""
+        for rates in self._iter_rates(
+            ["rate"], start_date, end_date, currency_code, source, table, batch_size
+        ):
+            yield rates.select("currency_code", "rate", "date", "source")
 
-            # filter by currency code if provided
-            currency_code_filter = None
-            if currency_code is not None:
-                currency_code_filter = "currency_code = ?"
-            else:
-                currency_code_filter = "1 = ?"
-                currency_code = 1
+    def iter_exchange_rate_quotes_frames(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+        batch_size: Optional[int] = None,
+    ) -> Iterator[pl.DataFrame]:
+        """Rows of `get_exchange_rate_quotes_frame` as frames read from a
+        cursor `batch_size` rows at a time"""
+        for quotes in self._iter_rates(
+            ["bid", "ask"],
+            start_date,
+            end_date,
+            currency_code,
+            source,
+            table,
+            batch_size,
+        ):
+            yield quotes.select("currency_code", "bid", "ask", "date", "source")
 
-            try:
-                cursor.execute(
-                    f"""
-                    WITH daily_changes AS (
-                        SELECT
-                            currency_code,
-                            source,
-                            date,
-                            rate,
-                            -- get the previous day rate for the same currency and source
-                            LAG(rate) OVER (PARTITION BY currency_code ORDER BY date) as prev_rate,
-
-                            -- calculate the daily percentage change in rate with the following formula:
-                            -- daily_change = (rate_today - rate_yesterday) / rate_yesterday * 100
-                            ((rate - LAG(rate) OVER (PARTITION BY currency_code ORDER BY date))
-                            / LAG(rate) OVER (PARTITION BY currency_code ORDER BY date) * 100) as daily_change,
-
-                            -- get the first value of rate for the currency 
-                            FIRST_VALUE(rate) OVER (PARTITION BY currency_code ORDER BY date) as start_rate,
-
-                            -- get the last value of rate for the currency 
-                            LAST_VALUE(rate) OVER (
-                                PARTITION BY currency_code
-                                ORDER BY date
-                                ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
-                            ) as end_rate
-                        FROM rates
-                        WHERE {currency_code_filter} AND date between ? AND ? AND source = ?
-                    )
-                    SELECT
-                        currency_code,
-                        source,
-                        -- calculate the minimum rate in the date range
-                        MIN(rate) as min_rate,
+    def _iter_rates(
+        self,
+        columns: List[str],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+        batch_size: Optional[int],
+    ) -> Iterator[pl.DataFrame]:
+        """`_read_rates` in batches, filled with missing days as they come.
 
-                        -- calculate the maximum rate in the date range
-                        MAX(rate) as max_rate,
+        The rows are read by a connection of their own, so consumers writing
+        them out do not hold the lock of the repository, and in WAL mode see
+        a snapshot of the database unaffected by concurrent inserts. Results
+        are not cached.
+        """
+        schema = {
+            "currency_code": pl.Utf8,
+            **{column: pl.Float64 for column in columns},
+            "day": pl.Int32,
+            "source": pl.Utf8,
+        }
+        # ordered like the primary key, which is walked instead of sorting
+        # the range as the `rates_by_day` index would require
+        batches = self._fetch_batches(
+            self._rates_query(columns, currency_code) + " ORDER BY currency_code, day",
+            self._rates_query_parameters(
+                start_date, end_date, currency_code, source, table
+            ),
+            batch_size or DEFAULT_READ_BATCH_SIZE,
+        )
+        frames = (
+            pl.DataFrame(rows, schema=schema, orient="row")
+            .with_columns(pl.col("day").cast(pl.Date).alias("date"))
+            .drop("day")
+            for rows in batches
+        )
+        yield from fill_missing_days_batches(frames, start_date, end_date, source)
 
-                        -- calculate the average rate in the date range
-                        ROUND(AVG(rate), 4) as avg_rate,
+    def _fetch_batches(
+        self, query: str, parameters: Dict[str, Any], batch_size: int
+    ) -> Iterator[List[tuple]]:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(query, parameters)
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                logger.error("No data found for the specified date range or currency")
+                raise MissingDataError(
+                    "No data found for the specified date range or currency"
+                )
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(batch_size)
+        except sqlite3.Error as e:
+            logger.error(
+                "Error while streaming rates from %s database: %s", self.db_path, e
+            )
+            raise DatabaseError(f"Error while fetching exchange rates: {e}")
+        finally:
+            conn.close()
+
+    def scan_rates(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str = "A",
+    ) -> pl.LazyFrame:
+        """Stored average rates of the range, with `currency_code`, `rate` and
+        `date` columns. The range is read by SQLite up front, only the rest of
+        the pipeline runs lazily."""
+        with self._transaction() as conn:
+            try:
+                rates = pl.read_database(
+                    query=self._rates_query(["rate"], currency_code),
+                    connection=conn,
+                    execute_options={
+                        "parameters": self._rates_query_parameters(
+                            start_date, end_date, currency_code, source, table
+                        )
+                    },
+                    schema_overrides={
+                        "currency_code": pl.Utf8,
+                        "rate": pl.Float64,
+                        "day": pl.Int32,
+                    },
+                )
+            except sqlite3.Error as e:
+                logger.error(
+                    "Error while scanning rates from %s database: %s",
+                    self.db_path,
+                    e,
+                )
+                raise DatabaseError(f"Error while fetching exchange rates: {e}")
 
-                        -- calculate the total percentage change in rate
-                        ROUND(((MAX(rate) - MIN(rate)) / MIN(rate) * 100), 2) as total_change_percent,
+        return rates.lazy().select(
+            "currency_code", "rate", pl.col("day").cast(pl.Date).alias("date")
+        )
 
-                        -- calculate the average daily percentage change
-                        ROUND(AVG(daily_change), 2) as avg_daily_change,
+    def _rates_query(self, columns: List[str], currency_code: Optional[str]) -> str:
+        """Query of rate columns in a date range, served by the primary key for
+        a single currency and by the `rates_by_day` index for all currencies"""
+        currency_code_filter = (
+            "AND currency_code = :currency_code" if currency_code else ""
+        )
+        return (
+            f"SELECT currency_code, {', '.join(columns)}, day, source FROM rates "
+            f"WHERE source = :source AND table_name = :table {currency_code_filter} "
+            "AND day BETWEEN :start_day AND :end_day"
+        )
 
-                        -- get start_rate
-                        MIN(start_rate) as start_rate,
+    def _rates_query_parameters(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str,
+    ) -> Dict[str, Any]:
+        return {
+            "source": source,
+            "table": table,
+            "currency_code": currency_code,
+            "start_day": day_number(start_date),
+            "end_day": day_number(end_date),
+        }
 
-                        -- get end_rate
-                        MAX(end_rate) as end_rate,
+    def get_exchange_rate_changes_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str = "A",
+    ) -> pl.DataFrame:
+        """Changes of rates in the range, with columns of `ExchangeRateChange` fields"""
+        return self._cached(
+            "changes",
+            lambda: self._read_rate_changes(
+                start_date, end_date, currency_code, source, table
+            ),
+            start_date,
+            end_date,
+            currency_code,
+            source,
+            table,
+        )
 
-                        -- calculate the percentage change from start to end rate
-                        ROUND(((MAX(end_rate) - MIN(start_rate)) / MIN(start_rate) * 100), 2) as start_to_end_change_percent
-                    FROM daily_changes
-                    GROUP BY currency_code
-                    ORDER BY start_to_end_change_percent DESC;
-                    """,
-                    (currency_code, start_date_str, end_date_str, source),
+    def _read_rate_changes(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str,
+    ) -> pl.DataFrame:
+        with self._transaction() as conn:
+            try:
+                changes = pl.read_database(
+                    query=self._rate_changes_query(currency_code),
+                    connection=conn,
+                    execute_options={
+                        "parameters": self._rate_changes_query_parameters(
+                            start_date, end_date, currency_code, source, table
+                        )
+                    },
                 )
-
-                return [
-                    ExchangeRateChange(
-                        **dict(row),
-                        start_date=start_date,
-                        end_date=end_date,
-                    )
-                    for row in cursor.fetchall()
-                ]
             except sqlite3.Error as e:
                 logger.error(
-                    "Error while fetching exchange_rate_changes from `rates` table from {} database: {}",
+                    "Error while fetching exchange_rate_changes from `rates` table from %s database: %s",
                     self.db_path,
                     e,
                 )
                 raise DatabaseError(f"Error while fetching exchange rate changes: {e}")
+
+        # rounded and ordered like the changes of the polars pipeline
+        return (
+            round_changes(changes.lazy())
+            .with_columns(start_date=pl.lit(start_date), end_date=pl.lit(end_date))
+            .collect()
+            .select(field.name for field in fields(ExchangeRateChange))
+        )
+
+    def _rate_changes_query_parameters(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str,
+    ) -> Dict[str, Any]:
+        """Parameters of the range, split into full months, aggregated in
+        `monthly_changes`, and days before and after them"""
+        months_start = (
+            start_date
+            if start_date.day == 1
+            else (start_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+        )
+        months_end = (end_date + timedelta(days=1)).replace(day=1) - timedelta(days=1)
+
+        parameters = self._rates_query_parameters(
+            start_date, end_date, currency_code, source, table
+        )
+        parameters["months_start"] = day_number(months_start)
+        parameters["months_end"] = day_number(months_end)
+        if months_start <= months_end:
+            parameters["head_end_day"] = day_number(months_start) - 1
+            parameters["tail_start_day"] = day_number(months_end) + 1
+        else:
+            # no full month, all days are read from `daily_changes`
+            parameters["head_end_day"] = parameters["end_day"]
+            parameters["tail_start_day"] = parameters["end_day"] + 1
+        return parameters
+
+    def _rate_changes_query(self, currency_code: Optional[str | int]) -> str:
+        # filter by currency code if provided
+        currency_code_filter = (
+            "AND currency_code = :currency_code" if currency_code else ""
+        )
+
+        # full months of the range are read from their rollups and only days
+        # at the edges of the range from daily changes, first and last rates
+        # are looked up by key. Segments are read first, through the indexes
+        # serving them, otherwise the planner prefers to walk the keys of all
+        # months and days in currency order to avoid sorting for the grouping
+        return f"""
+            WITH segments AS MATERIALIZED (
+                SELECT
+                    source, table_name, currency_code, min_rate, max_rate, sum_rate,
+                    rates, first_day, last_day, sum_change, changes
+                FROM monthly_changes
+                WHERE source = :source AND table_name = :table {currency_code_filter}
+                    AND month BETWEEN :months_start AND :months_end
+                UNION ALL
+                SELECT
+                    source, table_name, currency_code, rate, rate, COALESCE(rate, 0),
+                    rate IS NOT NULL, day, day, COALESCE(daily_change, 0),
+                    daily_change IS NOT NULL
+                FROM daily_changes
+                WHERE source = :source AND table_name = :table {currency_code_filter}
+                    AND day BETWEEN :start_day AND :head_end_day
+                UNION ALL
+                SELECT
+                    source, table_name, currency_code, rate, rate, COALESCE(rate, 0),
+                    rate IS NOT NULL, day, day, COALESCE(daily_change, 0),
+                    daily_change IS NOT NULL
+                FROM daily_changes
+                WHERE source = :source AND table_name = :table {currency_code_filter}
+                    AND day BETWEEN :tail_start_day AND :end_day
+            ),
+            changes AS (
+                SELECT
+                    source,
+                    table_name,
+                    currency_code,
+                    MIN(min_rate) as min_rate,
+                    MAX(max_rate) as max_rate,
+                    SUM(sum_rate) / SUM(rates) as avg_rate,
+                    SUM(sum_change) as sum_change,
+                    SUM(changes) as changes,
+                    MIN(first_day) as start_day,
+                    MAX(last_day) as end_day
+                FROM segments
+                GROUP BY currency_code
+            )
+            SELECT
+                changes.currency_code,
+                changes.source,
+                -- the minimum rate in the date range
+                min_rate,
+
+                -- the maximum rate in the date range
+                max_rate,
+
+                -- the average rate in the date range
+                avg_rate,
+
+                -- the total percentage change in rate
+                (max_rate - min_rate) / min_rate * 100 as total_change_percent,
+
+                -- the average daily percentage change, where
+                -- daily_change = (rate_today - rate_yesterday) / rate_yesterday * 100
+                -- the change on the first day of the currency in the range is
+                -- left out if it is relative to a day before the range
+                CASE
+                    WHEN start_rates.prev_day < :start_day
+                        AND start_rates.daily_change IS NOT NULL
+                    THEN (sum_change - start_rates.daily_change) / (changes - 1)
+                    ELSE sum_change / changes
+                END as avg_daily_change,
+
+                start_rates.rate as start_rate,
+                end_rates.rate as end_rate,
+
+                -- the percentage change from start to end rate
+                (end_rates.rate - start_rates.rate) / start_rates.rate * 100 as start_to_end_change_percent
+            FROM changes
+            JOIN daily_changes AS start_rates
+                ON start_rates.source = changes.source
+                AND start_rates.table_name = changes.table_name
+                AND start_rates.currency_code = changes.currency_code
+                AND start_rates.day = changes.start_day
+            JOIN daily_changes AS end_rates
+                ON end_rates.source = changes.source
+                AND end_rates.table_name = changes.table_name
+                AND end_rates.currency_code = changes.currency_code
+                AND end_rates.day = changes.end_day;
+        """
@@ -18,7 +18,12 @@ class APIError(CurrencyAnalyzerError):
 class RateLimitError(APIError):
     """Raised when NBP API rate limit is exceeded"""
 
-    def __init__(self, message: str = "NBP API rate limit exceeded"):
+    def __init__(
+        self,
+        message: str = "NBP API rate limit exceeded",
+        retry_after: Optional[float] = None,
+    ):
+        self.retry_after = retry_after
         super().__init__(message, status_code=429)
 
 
@@ -0,0 +1,589 @@
+"""Versioned schema migrations of the rates database.
+
+The schema version is stored in `PRAGMA user_version`, so opening a database
+which is already current reads a single pragma and runs no DDL at all.
+
+Migrations rewriting a table copy its rows into a new table in batches of
+rowids, each committed on its own, so that other connections are locked out
+only for the duration of a batch. The copied position is stored in the
+`migration_progress` table within the same transaction as the batch, which
+lets an interrupted rewrite continue where it stopped. Migrations are
+idempotent, as one interrupted before its version was recorded runs again.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from currency_analyzer.logger import get_logger
+
+logger = get_logger(__name__)
+
+# `day` is the number of days since 1970-01-01, the physical representation of
+# polars dates, which is more compact and cheaper to compare than ISO strings.
+# The key serves reads of a single currency, while reads of all currencies in
+# a date range go through the covering `rates_by_day` index. `rate` is the
+# average rate, tables quoting buy and sell rates fill `bid` and `ask` instead.
+CREATE_RATES_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        source TEXT NOT NULL,
+        table_name TEXT NOT NULL DEFAULT 'A',
+        currency_code TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        rate REAL,
+        bid REAL,
+        ask REAL,
+        PRIMARY KEY (source, table_name, currency_code, day)
+    ) WITHOUT ROWID
+"""
+CREATE_RATES_BY_DAY_INDEX = """
+    CREATE INDEX IF NOT EXISTS rates_by_day
+    ON {table} (source, table_name, day, rate, bid, ask)
+"""
+# tracks which days of a source table were already fetched, including days on
+# which the source did not publish any rates. Empty `currency_code` means that
+# the whole table was fetched, otherwise only rates of the given currency were.
+CREATE_COVERAGE_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        source TEXT,
+        table_name TEXT,
+        currency_code TEXT NOT NULL DEFAULT '',
+        date TEXT,
+        published INTEGER,
+        PRIMARY KEY (source, table_name, currency_code, date)
+    )
+"""
+# change of every stored rate relative to the previous stored day of the
+# currency, so reports of changes aggregate it instead of computing window
+# functions over the range. `prev_day` tells whether the previous day belongs
+# to the reported range.
+CREATE_DAILY_CHANGES_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        source TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        currency_code TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        rate REAL,
+        prev_day INTEGER,
+        daily_change REAL,
+        PRIMARY KEY (source, table_name, currency_code, day)
+    ) WITHOUT ROWID
+"""
+CREATE_DAILY_CHANGES_BY_DAY_INDEX = """
+    CREATE INDEX IF NOT EXISTS daily_changes_by_day
+    ON {table} (source, table_name, day, currency_code, rate, prev_day, daily_change)
+"""
+# single row telling whether a bulk ingestion is in progress, set only within
+# its transactions, which refresh changes of the ingested ranges once per batch
+# instead of the triggers doing so for every row
+CREATE_BULK_INGEST_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (active INTEGER NOT NULL)
+"""
+INSERT_BULK_INGEST = """
+    INSERT INTO {table} (active) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM {table})
+"""
+# fires only for rows actually inserted, not those ignored as already stored.
+# A rate inserted before stored days, e.g. when a gap is backfilled, becomes
+# the previous day of the next stored day.
+CREATE_DAILY_CHANGES_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS rates_daily_changes AFTER INSERT ON rates
+    WHEN NOT (SELECT active FROM bulk_ingest)
+    BEGIN
+        INSERT INTO daily_changes
+            (source, table_name, currency_code, day, rate, prev_day, daily_change)
+        SELECT
+            NEW.source,
+            NEW.table_name,
+            NEW.currency_code,
+            NEW.day,
+            NEW.rate,
+            prev.day,
+            (NEW.rate - prev.rate) / prev.rate * 100
+        FROM (SELECT 1) LEFT JOIN (
+            SELECT day, rate FROM rates
+            WHERE source = NEW.source AND table_name = NEW.table_name
+                AND currency_code = NEW.currency_code AND day < NEW.day
+            ORDER BY day DESC
+            LIMIT 1
+        ) AS prev;
+
+        UPDATE daily_changes
+        SET prev_day = NEW.day, daily_change = (rate - NEW.rate) / NEW.rate * 100
+        WHERE source = NEW.source AND table_name = NEW.table_name
+            AND currency_code = NEW.currency_code
+            AND day = (
+                SELECT MIN(day) FROM rates
+                WHERE source = NEW.source AND table_name = NEW.table_name
+                    AND currency_code = NEW.currency_code AND day > NEW.day
+            );
+    END
+"""
+FILL_DAILY_CHANGES = """
+    INSERT OR IGNORE INTO daily_changes
+        (source, table_name, currency_code, day, rate, prev_day, daily_change)
+    SELECT
+        source,
+        table_name,
+        currency_code,
+        day,
+        rate,
+        LAG(day) OVER by_day,
+        (rate - LAG(rate) OVER by_day) / LAG(rate) OVER by_day * 100
+    FROM rates
+    WHERE source = ? AND table_name = ? AND currency_code = ?
+    WINDOW by_day AS (ORDER BY day)
+"""
+# currency of an ingested batch, given as named parameters along with the
+# first and the last day of its rates in the batch
+BATCH_CURRENCY = (
+    "source = :source AND table_name = :table_name AND currency_code = :currency_code"
+)
+# first stored day after the batch, whose change is relative to a day of it
+DAY_AFTER_BATCH = f"""COALESCE(
+    (SELECT MIN(day) FROM rates WHERE {BATCH_CURRENCY} AND day > :last_day),
+    :last_day
+)"""
+# changes from the last stored day before the batch to the first one after it,
+# which are all the changes the rates of the batch can add or alter. Only the
+# changed ones are written.
+REFRESH_DAILY_CHANGES = f"""
+    INSERT INTO daily_changes
+        (source, table_name, currency_code, day, rate, prev_day, daily_change)
+    SELECT * FROM (
+        SELECT
+            source,
+            table_name,
+            currency_code,
+            day,
+            rate,
+            LAG(day) OVER by_day,
+            (rate - LAG(rate) OVER by_day) / LAG(rate) OVER by_day * 100
+        FROM rates
+        WHERE {BATCH_CURRENCY}
+            AND day >= COALESCE(
+                (SELECT MAX(day) FROM rates WHERE {BATCH_CURRENCY} AND day < :first_day),
+                :first_day
+            )
+            AND day <= {DAY_AFTER_BATCH}
+        WINDOW by_day AS (ORDER BY day)
+    )
+    WHERE day >= :first_day
+    ON CONFLICT (source, table_name, currency_code, day) DO UPDATE SET
+        prev_day = excluded.prev_day,
+        daily_change = excluded.daily_change
+    WHERE prev_day IS NOT excluded.prev_day
+        OR daily_change IS NOT excluded.daily_change
+"""
+# first day of the month of a day number
+MONTH_OF_DAY = "{day} - CAST(strftime('%d', {day} * 86400, 'unixepoch') AS INTEGER) + 1"
+# aggregates of `daily_changes` per month, keyed by the first day of the
+# month, so reports of long ranges combine months instead of reading every
+# day. Sums are totals of non-null values, counted separately for averages.
+CREATE_MONTHLY_CHANGES_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        source TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        currency_code TEXT NOT NULL,
+        month INTEGER NOT NULL,
+        min_rate REAL,
+        max_rate REAL,
+        sum_rate REAL NOT NULL,
+        rates INTEGER NOT NULL,
+        first_day INTEGER NOT NULL,
+        last_day INTEGER NOT NULL,
+        sum_change REAL NOT NULL,
+        changes INTEGER NOT NULL,
+        PRIMARY KEY (source, table_name, currency_code, month)
+    ) WITHOUT ROWID
+"""
+CREATE_MONTHLY_CHANGES_BY_MONTH_INDEX = """
+    CREATE INDEX IF NOT EXISTS monthly_changes_by_month
+    ON {table} (
+        source, table_name, month, currency_code, min_rate, max_rate, sum_rate,
+        rates, first_day, last_day, sum_change, changes
+    )
+"""
+# stored rates are never updated, so months only ever take in new days, while
+# the change of a stored day is updated when the day before it is backfilled.
+# Bulk ingestions refresh the months of their batches instead.
+CREATE_MONTHLY_CHANGES_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS daily_changes_monthly_insert
+    AFTER INSERT ON daily_changes
+    WHEN NOT (SELECT active FROM bulk_ingest)
+    BEGIN
+        INSERT INTO monthly_changes VALUES (
+            NEW.source,
+            NEW.table_name,
+            NEW.currency_code,
+            {MONTH_OF_DAY.format(day="NEW.day")},
+            NEW.rate,
+            NEW.rate,
+            COALESCE(NEW.rate, 0),
+            NEW.rate IS NOT NULL,
+            NEW.day,
+            NEW.day,
+            COALESCE(NEW.daily_change, 0),
+            NEW.daily_change IS NOT NULL
+        )
+        ON CONFLICT (source, table_name, currency_code, month) DO UPDATE SET
+            min_rate = COALESCE(MIN(min_rate, excluded.min_rate), min_rate, excluded.min_rate),
+            max_rate = COALESCE(MAX(max_rate, excluded.max_rate), max_rate, excluded.max_rate),
+            sum_rate = sum_rate + excluded.sum_rate,
+            rates = rates + excluded.rates,
+            first_day = MIN(first_day, excluded.first_day),
+            last_day = MAX(last_day, excluded.last_day),
+            sum_change = sum_change + excluded.sum_change,
+            changes = changes + excluded.changes;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS daily_changes_monthly_update
+    AFTER UPDATE OF daily_change ON daily_changes
+    WHEN NOT (SELECT active FROM bulk_ingest)
+    BEGIN
+        UPDATE monthly_changes
+        SET
+            sum_change = sum_change - COALESCE(OLD.daily_change, 0)
+                + COALESCE(NEW.daily_change, 0),
+            changes = changes - (OLD.daily_change IS NOT NULL)
+                + (NEW.daily_change IS NOT NULL)
+        WHERE source = NEW.source AND table_name = NEW.table_name
+            AND currency_code = NEW.currency_code
+            AND month = {MONTH_OF_DAY.format(day="NEW.day")};
+    END
+    """,
+]
+MONTHLY_CHANGES_OF_DAYS = f"""
+    SELECT
+        source,
+        table_name,
+        currency_code,
+        {MONTH_OF_DAY.format(day="day")} AS month,
+        MIN(rate),
+        MAX(rate),
+        TOTAL(rate),
+        COUNT(rate),
+        MIN(day),
+        MAX(day),
+        TOTAL(daily_change),
+        COUNT(daily_change)
+    FROM daily_changes
+"""
+FILL_MONTHLY_CHANGES = f"""
+    INSERT OR REPLACE INTO monthly_changes
+    {MONTHLY_CHANGES_OF_DAYS}
+    WHERE source = ? AND table_name = ? AND currency_code = ?
+    GROUP BY month
+"""
+# months of the changes refreshed by `REFRESH_DAILY_CHANGES`, up to the month
+# of the first stored day after the batch, which is read in full, days of the
+# following month are left out by the bound of the month
+REFRESH_MONTHLY_CHANGES = f"""
+    INSERT OR REPLACE INTO monthly_changes
+    {MONTHLY_CHANGES_OF_DAYS}
+    WHERE {BATCH_CURRENCY}
+        AND day >= {MONTH_OF_DAY.format(day=":first_day")}
+        AND day <= {DAY_AFTER_BATCH} + 31
+    GROUP BY month
+    HAVING month <= {MONTH_OF_DAY.format(day=DAY_AFTER_BATCH)}
+"""
+# single row counting changes of the stored rates, which results cached by
+# the repository are keyed by. The random id tells databases apart, e.g. one
+# deleted and created again, whose versions start from 0 again.
+CREATE_DATA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        database_id TEXT NOT NULL,
+        version INTEGER NOT NULL
+    )
+"""
+INSERT_DATA_VERSION = """
+    INSERT INTO {table} (database_id, version)
+    SELECT lower(hex(randomblob(16))), 0
+    WHERE NOT EXISTS (SELECT 1 FROM {table})
+"""
+CREATE_MIGRATION_PROGRESS_TABLE = """
+    CREATE TABLE IF NOT EXISTS migration_progress (
+        version INTEGER PRIMARY KEY,
+        last_rowid INTEGER NOT NULL
+    )
+"""
+
+DEFAULT_BATCH_SIZE = 50_000
+
+
+@dataclass(frozen=True)
+class MigrationProgress:
+    """Progress of a migration, in rowids of a rewritten table or in
+    currencies of a filled table"""
+
+    version: int
+    description: str
+    copied: int
+    total: int
+
+
+ProgressCallback = Callable[[MigrationProgress], None]
+
+
+def log_progress(progress: MigrationProgress) -> None:
+    logger.info(
+        "Migrating to version %s (%s): %s/%s rows",
+        progress.version,
+        progress.description,
+        progress.copied,
+        progress.total,
+    )
+
+
+class MigrationContext:
+    """Connection and settings a migration runs with"""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        version: int,
+        description: str,
+        batch_size: int,
+        progress: ProgressCallback,
+    ):
+        self.conn = conn
+        self.version = version
+        self.description = description
+        self.batch_size = batch_size
+        self.progress = progress
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction, taking the lock up front so that a busy database
+        fails (or waits for `busy_timeout`) before any work is done"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def table_columns(self, table: str) -> Set[str]:
+        """Columns of the table, empty if it does not exist"""
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+
+    def create(self, table: str, schema: List[str]) -> None:
+        with self.transaction() as conn:
+            for statement in schema:
+                conn.execute(statement.format(table=table))
+
+    def rebuild_table(
+        self, table: str, schema: List[str], columns: Dict[str, str]
+    ) -> None:
+        """Replace the table by one created by `schema` statements, whose
+        `{table}` placeholder is filled with the table name.
+
+        `columns` maps columns of the new table to expressions over columns of
+        the old one. Indexes in `schema` are built while the rows are copied,
+        instead of in a single long transaction at the end.
+        """
+        new_table = f"{table}_v{self.version}"
+        with self.transaction() as conn:
+            for statement in schema:
+                conn.execute(statement.format(table=new_table))
+            conn.execute(CREATE_MIGRATION_PROGRESS_TABLE)
+            conn.execute(
+                "INSERT OR IGNORE INTO migration_progress VALUES (?, 0)",
+                (self.version,),
+            )
+            (last_rowid,) = conn.execute(
+                "SELECT last_rowid FROM migration_progress WHERE version = ?",
+                (self.version,),
+            ).fetchone()
+            (total,) = conn.execute(
+                f"SELECT COALESCE(MAX(rowid), 0) FROM {table}"
+            ).fetchone()
+
+        copy_rows = (
+            f"INSERT OR IGNORE INTO {new_table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(columns.values())} FROM {table} WHERE rowid > ?"
+        )
+        if last_rowid:
+            logger.info(
+                "Resuming migration to version %s after row %s",
+                self.version,
+                last_rowid,
+            )
+        while last_rowid < total:
+            batch_end = min(last_rowid + self.batch_size, total)
+            with self.transaction() as conn:
+                conn.execute(f"{copy_rows} AND rowid <= ?", (last_rowid, batch_end))
+                conn.execute(
+                    "UPDATE migration_progress SET last_rowid = ? WHERE version = ?",
+                    (batch_end, self.version),
+                )
+            last_rowid = batch_end
+            self.progress(
+                MigrationProgress(self.version, self.description, last_rowid, total)
+            )
+
+        with self.transaction() as conn:
+            # rows written by other connections since the copy started
+            conn.execute(copy_rows, (last_rowid,))
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+            conn.execute(
+                "DELETE FROM migration_progress WHERE version = ?", (self.version,)
+            )
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[MigrationContext], None]
+
+
+def _coverage_per_currency(context: MigrationContext) -> None:
+    columns = context.table_columns("coverage")
+    if not columns:
+        context.create("coverage", [CREATE_COVERAGE_TABLE])
+    elif "currency_code" not in columns:
+        context.rebuild_table(
+            "coverage",
+            [CREATE_COVERAGE_TABLE],
+            {
+                column: column
+                for column in ("source", "table_name", "date", "published")
+            },
+        )
+
+
+def _rates_by_day_number(context: MigrationContext) -> None:
+    schema = [CREATE_RATES_TABLE, CREATE_RATES_BY_DAY_INDEX]
+    columns = context.table_columns("rates")
+    if not columns or "day" in columns:
+        context.create("rates", schema)
+        return
+
+    # tables created before rates of other tables were stored hold only rates
+    # of table A
+    has_tables = "table_name" in columns
+    context.rebuild_table(
+        "rates",
+        schema,
+        {
+            "source": "source",
+            "table_name": "table_name" if has_tables else "'A'",
+            "currency_code": "currency_code",
+            "day": "CAST(julianday(date) - julianday('1970-01-01') AS INTEGER)",
+            "rate": "rate",
+            "bid": "bid" if has_tables else "NULL",
+            "ask": "ask" if has_tables else "NULL",
+        },
+    )
+
+
+def _materialize_daily_changes(context: MigrationContext) -> None:
+    # the trigger maintains changes of rates inserted from now on, so the
+    # currencies can be filled one transaction at a time
+    context.create("bulk_ingest", [CREATE_BULK_INGEST_TABLE, INSERT_BULK_INGEST])
+    context.create(
+        "daily_changes",
+        [
+            CREATE_DAILY_CHANGES_TABLE,
+            CREATE_DAILY_CHANGES_BY_DAY_INDEX,
+            CREATE_DAILY_CHANGES_TRIGGER,
+        ],
+    )
+    currencies = context.conn.execute(
+        "SELECT DISTINCT source, table_name, currency_code FROM rates"
+    ).fetchall()
+    for filled, currency in enumerate(currencies, start=1):
+        with context.transaction() as conn:
+            conn.execute(FILL_DAILY_CHANGES, currency)
+        context.progress(
+            MigrationProgress(
+                context.version, context.description, filled, len(currencies)
+            )
+        )
+
+
+def _roll_up_monthly_changes(context: MigrationContext) -> None:
+    context.create(
+        "monthly_changes",
+        [
+            CREATE_MONTHLY_CHANGES_TABLE,
+            CREATE_MONTHLY_CHANGES_BY_MONTH_INDEX,
+            *CREATE_MONTHLY_CHANGES_TRIGGERS,
+        ],
+    )
+    currencies = context.conn.execute(
+        "SELECT DISTINCT source, table_name, currency_code FROM daily_changes"
+    ).fetchall()
+    for filled, currency in enumerate(currencies, start=1):
+        with context.transaction() as conn:
+            conn.execute(FILL_MONTHLY_CHANGES, currency)
+        context.progress(
+            MigrationProgress(
+                context.version, context.description, filled, len(currencies)
+            )
+        )
+
+
+def _count_data_versions(context: MigrationContext) -> None:
+    context.create("data_version", [CREATE_DATA_VERSION_TABLE, INSERT_DATA_VERSION])
+
+
+# databases created before the schema was versioned have version 0 and go
+# through all migrations, which detect the layout they find
+MIGRATIONS = [
+    Migration(1, "coverage tracked per currency", _coverage_per_currency),
+    Migration(2, "rates keyed by day numbers", _rates_by_day_number),
+    Migration(3, "materialized daily changes", _materialize_daily_changes),
+    Migration(4, "monthly rollups of daily changes", _roll_up_monthly_changes),
+    Migration(5, "data version of stored rates", _count_data_versions),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    return version
+
+
+def migrate(
+    conn: sqlite3.Connection,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Apply pending migrations and return the schema version of the database"""
+    version = schema_version(conn)
+    if version >= LATEST_VERSION:
+        if version > LATEST_VERSION:
+            logger.warning(
+                "Database schema version %s is newer than %s", version, LATEST_VERSION
+            )
+        return version
+
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        # new databases go through all migrations as well, progress of those
+        # copying rows is logged by `log_progress`
+        logger.debug(
+            "Migrating database to version %s: %s",
+            migration.version,
+            migration.description,
+        )
+        context = MigrationContext(
+            conn,
+            migration.version,
+            migration.description,
+            batch_size,
+            progress or log_progress,
+        )
+        migration.apply(context)
+        with context.transaction():
+            conn.execute(f"PRAGMA user_version = {migration.version}")
+        version = migration.version
+
+    return version
@@ -0,0 +1,374 @@
+import os
+import threading
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import polars as pl
+
+from currency_analyzer.core.exceptions import DatabaseError, MissingDataError
+from currency_analyzer.core.storage import (
+    RateStore,
+    coverage_days,
+    fill_missing_days,
+    missing_ranges,
+    rate_changes,
+)
+from currency_analyzer.logger import get_logger
+
+logger = get_logger(__name__)
+
+# columns of the files of a partition, source, year and month are encoded in
+# the path of the partition
+RATES_PARTITION_SCHEMA = {
+    "table_name": pl.Utf8,
+    "currency_code": pl.Utf8,
+    "date": pl.Date,
+    "rate": pl.Float64,
+    "bid": pl.Float64,
+    "ask": pl.Float64,
+}
+COVERAGE_PARTITION_SCHEMA = {
+    "table_name": pl.Utf8,
+    "currency_code": pl.Utf8,
+    "date": pl.Date,
+    "published": pl.Boolean,
+}
+RATES_KEY = ["table_name", "currency_code", "date"]
+COVERAGE_KEY = RATES_KEY
+# files appended to a partition before they are compacted into one
+DEFAULT_COMPACT_AFTER = 8
+
+
+def _months(start_date: date, end_date: date) -> Iterable[Tuple[int, int]]:
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield year, month
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+
+
+class ParquetRateRepository(RateStore):
+    """Exchange rates stored as Parquet files, partitioned by source, year and month.
+
+    Rates are kept in `rates/source=<source>/year=<year>/month=<month>` directories
+    under the root and read through lazy scans of the partitions of the range,
+    which push the filters and the selected columns down to the Parquet reader.
+    Every insert appends a file to the partitions it touches, partitions are
+    compacted to a single file once they have `compact_after` files.
+    """
+
+    def __init__(self, root: str, compact_after: int = DEFAULT_COMPACT_AFTER):
+        self.root = Path(root)
+        self.compact_after = compact_after
+        # held while files are listed and read, so that compaction does not
+        # remove them meanwhile, other processes should not write to the root
+        self._lock = threading.RLock()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "ParquetRateRepository":
+        return self
+
+    def _rates_partition(self, source: str, year: int, month: int) -> Path:
+        return (
+            self.root
+            / "rates"
+            / f"source={source}"
+            / f"year={year}"
+            / f"month={month:02d}"
+        )
+
+    def _coverage_partition(self, source: str) -> Path:
+        return self.root / "coverage" / f"source={source}"
+
+    def _files(self, partition: Path) -> List[Path]:
+        # named by the time they were written, so sorted oldest first
+        return sorted(partition.glob("*.parquet"))
+
+    def _write(self, partition: Path, frame: pl.DataFrame) -> None:
+        """Write the frame as a new file of the partition, which appears whole
+        or not at all"""
+        partition.mkdir(parents=True, exist_ok=True)
+        name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+        temporary = partition / f".{name}.tmp"
+        frame.write_parquet(temporary, statistics=True)
+        os.replace(temporary, partition / name)
+
+    def _compact(self, partition: Path, key: List[str]) -> None:
+        """Merge the files of the partition, keeping the latest row of a key"""
+        files = self._files(partition)
+        if len(files) < 2:
+            return
+        merged = (
+            pl.concat([pl.read_parquet(file) for file in files])
+            .unique(subset=key, keep="last", maintain_order=True)
+            .sort(key)
+        )
+        self._write(partition, merged)
+        for file in files:
+            file.unlink()
+        logger.debug("Compacted %s files of %s partition", len(files), partition)
+
+    def compact(self) -> None:
+        """Merge the files of every partition into one"""
+        with self._lock:
+            for partition in self.root.glob("rates/*/*/*"):
+                self._compact(partition, RATES_KEY)
+            for partition in self.root.glob("coverage/*"):
+                self._compact(partition, COVERAGE_KEY)
+
+    def _append(self, partition: Path, frame: pl.DataFrame, key: List[str]) -> None:
+        self._write(partition, frame)
+        if len(self._files(partition)) >= self.compact_after:
+            self._compact(partition, key)
+
+    def insert_exchange_rates_frame(
+        self, rates: pl.DataFrame, table: str = "A"
+    ) -> None:
+        """Insert rates of the source table given as a frame with `RATES_SCHEMA` columns"""
+        partitioned = rates.select(
+            "source",
+            pl.col("date").dt.year().alias("year"),
+            pl.col("date").dt.month().alias("month"),
+            pl.lit(table).alias("table_name"),
+            *(
+                pl.col(name).cast(dtype)
+                for name, dtype in RATES_PARTITION_SCHEMA.items()
+                if name != "table_name"
+            ),
+        ).partition_by(["source", "year", "month"], as_dict=True)
+
+        with self._lock:
+            try:
+                inserted = 0
+                for (source, year, month), partition_rates in partitioned.items():
+                    partition = self._rates_partition(source, year, month)
+                    files = self._files(partition)
+                    new_rates = (
+                        partition_rates.select(RATES_PARTITION_SCHEMA.keys())
+                        .unique(subset=RATES_KEY, keep="first", maintain_order=True)
+                        .sort(RATES_KEY)
+                    )
+                    if files:
+                        # rates already stored are ignored, like by the SQLite backend
+                        new_rates = new_rates.join(
+                            pl.scan_parquet(files).select(RATES_KEY).collect(),
+                            on=RATES_KEY,
+                            how="anti",
+                            maintain_order="left",
+                        )
+                    if new_rates.is_empty():
+                        continue
+                    self._append(partition, new_rates, RATES_KEY)
+                    inserted += new_rates.height
+                logger.debug("Inserted %s rates to %s", inserted, self.root)
+            except (OSError, pl.exceptions.PolarsError) as e:
+                logger.error("Error while inserting rates to %s: %s", self.root, e)
+                raise DatabaseError(f"Error while inserting rates data: {e}")
+
+    def record_coverage(
+        self,
+        start_date: date,
+        end_date: date,
+        source: str,
+        table: str,
+        published_dates: Iterable[date],
+        currency_code: Optional[str] = None,
+    ) -> None:
+        """Mark dates in range as fetched from the source, see `coverage_days`.
+
+        With `currency_code` the coverage applies only to rates of that currency.
+        """
+        days = coverage_days(start_date, end_date, published_dates)
+        if not days:
+            return
+        coverage = pl.DataFrame(
+            {
+                "table_name": table,
+                "currency_code": currency_code or "",
+                "date": [day for day, _ in days],
+                "published": [published for _, published in days],
+            },
+            schema=COVERAGE_PARTITION_SCHEMA,
+        )
+        with self._lock:
+            try:
+                self._append(self._coverage_partition(source), coverage, COVERAGE_KEY)
+            except (OSError, pl.exceptions.PolarsError) as e:
+                logger.error("Error while recording coverage in %s: %s", self.root, e)
+                raise DatabaseError(f"Error while recording coverage: {e}")
+
+    def get_missing_ranges(
+        self,
+        start_date: date,
+        end_date: date,
+        source: str,
+        table: str,
+        currency_code: Optional[str] = None,
+    ) -> List[Tuple[date, date]]:
+        """Return contiguous sub-ranges of the date range that were not fetched yet.
+
+        With `currency_code` days fetched either for the whole table or for that
+        currency alone count as fetched.
+        """
+        with self._lock:
+            files = self._files(self._coverage_partition(source))
+            if not files:
+                return missing_ranges(start_date, end_date, set())
+
+            try:
+                covered = (
+                    pl.scan_parquet(files)
+                    .filter(
+                        pl.col("table_name") == table,
+                        pl.col("currency_code").is_in(["", currency_code or ""]),
+                        pl.col("date").is_between(start_date, end_date),
+                    )
+                    .select("date")
+                    .collect()
+                    .get_column("date")
+                )
+            except (OSError, pl.exceptions.PolarsError) as e:
+                logger.error("Error while fetching coverage from %s: %s", self.root, e)
+                raise DatabaseError(f"Error while fetching coverage: {e}")
+
+        return missing_ranges(start_date, end_date, set(covered))
+
+    def _rate_files(self, start_date: date, end_date: date, source: str) -> List[Path]:
+        """Files of the partitions of the months of the range"""
+        return [
+            file
+            for year, month in _months(start_date, end_date)
+            for file in self._files(self._rates_partition(source, year, month))
+        ]
+
+    def _scan_rates(
+        self,
+        columns: List[str],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str,
+    ) -> Optional[pl.LazyFrame]:
+        """Lazy scan of rate columns in the range, reading only the partitions
+        of its months, or None if none of them is stored"""
+        files = self._rate_files(start_date, end_date, source)
+        if not files:
+            return None
+
+        filters = [
+            pl.col("table_name") == table,
+            pl.col("date").is_between(start_date, end_date),
+        ]
+        if currency_code:
+            filters.append(pl.col("currency_code") == currency_code)
+        return (
+            pl.scan_parquet(files)
+            .filter(*filters)
+            .select("currency_code", *columns, "date")
+        )
+
+    def _read_rates(
+        self,
+        columns: List[str],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+    ) -> pl.DataFrame:
+        """Read rate columns for every day of the range and every currency with
+        any rate in it, days without rates are filled with nulls"""
+        try:
+            with self._lock:
+                scan = self._scan_rates(
+                    columns, start_date, end_date, currency_code, source, table
+                )
+                rates = (
+                    scan.with_columns(source=pl.lit(source)).collect()
+                    if scan is not None
+                    else None
+                )
+        except (OSError, pl.exceptions.PolarsError) as e:
+            logger.error("Error while fetching rates from %s: %s", self.root, e)
+            raise DatabaseError(f"Error while fetching exchange rates: {e}")
+
+        if rates is None or rates.is_empty():
+            logger.error("No data found for the specified date range or currency")
+            raise MissingDataError(
+                "No data found for the specified date range or currency"
+            )
+
+        return fill_missing_days(rates, start_date, end_date, source)
+
+    def get_exchange_rates_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str = "A",
+    ) -> pl.DataFrame:
+        """Rates with a row for every day of the range, with columns of
+        `ExchangeRate` fields"""
+        return self._read_rates(
+            ["rate"], start_date, end_date, currency_code, source, table
+        ).select("currency_code", "rate", "date", "source")
+
+    def get_exchange_rate_quotes_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+    ) -> pl.DataFrame:
+        """Buy and sell rates of a table quoting them, with columns of
+        `ExchangeRateQuote` fields"""
+        return self._read_rates(
+            ["bid", "ask"], start_date, end_date, currency_code, source, table
+        ).select("currency_code", "bid", "ask", "date", "source")
+
+    def scan_rates(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str = "A",
+    ) -> pl.LazyFrame:
+        """Stored average rates of the range, with `currency_code`, `rate` and
+        `date` columns, scanning the Parquet files of its months"""
+        scan = self._scan_rates(
+            ["rate"], start_date, end_date, currency_code, source, table
+        )
+        if scan is None:
+            return pl.LazyFrame(
+                schema={"currency_code": pl.Utf8, "rate": pl.Float64, "date": pl.Date}
+            )
+        return scan
+
+    def get_exchange_rate_changes_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str = "A",
+    ) -> pl.DataFrame:
+        """Changes of rates in the range, with columns of `ExchangeRateChange` fields"""
+        try:
+            with self._lock:
+                scan = self.scan_rates(
+                    start_date, end_date, currency_code, source, table
+                )
+                return rate_changes(scan, start_date, end_date, source)
+        except (OSError, pl.exceptions.PolarsError) as e:
+            logger.error(
+                "Error while fetching exchange rate changes from %s: %s", self.root, e
+            )
+            raise DatabaseError(f"Error while fetching exchange rate changes: {e}")
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import polars as pl
+
+from currency_analyzer.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ResultCache:
+    """Cache of query results, kept in memory and optionally on disk.
+
+    Results are keyed by the query and its parameters, which should include the
+    version of the data they were read from, so results of older data are never
+    served and just age out. Least recently used results are evicted once those
+    in memory grow above `max_memory_bytes` and those on disk above
+    `max_disk_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path | str] = None,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, pl.DataFrame] = OrderedDict()
+        self._memory_bytes = 0
+        # sizes of results on disk by key and their total, read from the
+        # directory on the first store and kept up to date by this instance
+        self._disk_sizes: Optional[Dict[str, int]] = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    def _key(self, key: Sequence[Any]) -> str:
+        return hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / f"{key}.arrow"
+
+    def get(self, key: Sequence[Any]) -> Optional[pl.DataFrame]:
+        digest = self._key(key)
+        with self._lock:
+            frame = self._memory.get(digest)
+            if frame is not None:
+                self._memory.move_to_end(digest)
+                return frame
+
+        if self.directory is None:
+            return None
+        path = self._path(digest)
+        try:
+            frame = pl.read_ipc(path, memory_map=False)
+            # access time drives the LRU eviction
+            os.utime(path)
+        except (OSError, pl.exceptions.PolarsError):
+            return None
+
+        self._remember(digest, frame)
+        return frame
+
+    def store(self, key: Sequence[Any], frame: pl.DataFrame) -> None:
+        digest = self._key(key)
+        self._remember(digest, frame)
+
+        if self.directory is None:
+            return
+        path = self._path(digest)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            frame.write_ipc(tmp_path)
+            size = tmp_path.stat().st_size
+            os.replace(tmp_path, path)
+        except (OSError, pl.exceptions.PolarsError) as e:
+            # the result is still served from memory
+            logger.warning("Could not store result in %s: %s", self.directory, e)
+            return
+        self._account_disk(digest, size)
+
+    def _remember(self, digest: str, frame: pl.DataFrame) -> None:
+        size = frame.estimated_size()
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(digest, None)
+            if previous is not None:
+                self._memory_bytes -= previous.estimated_size()
+            self._memory[digest] = frame
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.estimated_size()
+
+    def clear(self) -> None:
+        """Forget all results, in memory and on disk"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.directory is not None:
+                for path in self.directory.glob("*.arrow"):
+                    path.unlink(missing_ok=True)
+                self._disk_sizes = {}
+                self._disk_bytes = 0
+
+    def size(self) -> int:
+        """Total size of the results on disk in bytes"""
+        if self.directory is None:
+            return 0
+        return sum(path.stat().st_size for path in self.directory.glob("*.arrow"))
+
+    def _account_disk(self, digest: str, size: int) -> None:
+        """Record the size of a stored result, evicting results from disk only
+        once the total grows above `max_disk_bytes`"""
+        with self._lock:
+            if self._disk_sizes is None:
+                self._scan_disk()
+            else:
+                self._disk_bytes += size - self._disk_sizes.get(digest, 0)
+                self._disk_sizes[digest] = size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self) -> List[tuple[float, int, Path]]:
+        """Read sizes of the results on disk from the directory, returning the
+        results ordered by access time"""
+        assert self.directory is not None
+        entries: List[tuple[float, int, Path]] = []
+        for path in self.directory.glob("*.arrow"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        self._disk_sizes = {path.stem: size for _, size, path in entries}
+        self._disk_bytes = sum(self._disk_sizes.values())
+        return sorted(entries)
+
+    def _evict_disk(self) -> None:
+        # results might also have been stored or removed by other processes,
+        # so the directory is read again
+        entries = self._scan_disk()
+        for _, size, path in entries:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            del self._disk_sizes[path.stem]
+            self._disk_bytes -= size
+            logger.debug("Evicted %s from result cache", path.stem)
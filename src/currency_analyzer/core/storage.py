@@ -0,0 +1,387 @@
+from dataclasses import fields
+from datetime import date, timedelta
+from typing import Any, Iterable, Iterator, List, Optional, Protocol, Set, Tuple
+
+import polars as pl
+
+from currency_analyzer.core.types import (
+    ExchangeRate,
+    ExchangeRateChange,
+    ExchangeRateQuote,
+    rates_to_frame,
+)
+
+
+class RateStore(Protocol):
+    """Protocol of exchange rate storage backends.
+
+    Backends implement the frame methods, rows of the dataclasses are built
+    from the frames by default.
+    """
+
+    def insert_exchange_rates_frame(
+        self, rates: pl.DataFrame, table: str = "A"
+    ) -> None:
+        """Insert rates of the source table given as a frame with `RATES_SCHEMA`
+        columns, rates which are already stored are ignored"""
+        ...
+
+    def record_coverage(
+        self,
+        start_date: date,
+        end_date: date,
+        source: str,
+        table: str,
+        published_dates: Iterable[date],
+        currency_code: Optional[str] = None,
+    ) -> None: ...
+
+    def get_missing_ranges(
+        self,
+        start_date: date,
+        end_date: date,
+        source: str,
+        table: str,
+        currency_code: Optional[str] = None,
+    ) -> List[Tuple[date, date]]: ...
+
+    def get_exchange_rates_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str = "A",
+    ) -> pl.DataFrame: ...
+
+    def get_exchange_rate_quotes_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+    ) -> pl.DataFrame: ...
+
+    def get_exchange_rate_changes_frame(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str = "A",
+    ) -> pl.DataFrame: ...
+
+    def scan_rates(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str = "A",
+    ) -> pl.LazyFrame:
+        """Stored average rates of the range, with `currency_code`, `rate` and
+        `date` columns, as a lazy frame for polars pipelines"""
+        ...
+
+    def iter_exchange_rates_frames(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str = "A",
+        batch_size: Optional[int] = None,
+    ) -> Iterator[pl.DataFrame]:
+        """Rows of `get_exchange_rates_frame` as frames of about `batch_size`
+        rows, backends reading them incrementally override it, others yield
+        the whole frame"""
+        yield self.get_exchange_rates_frame(
+            start_date, end_date, currency_code, source, table
+        )
+
+    def iter_exchange_rate_quotes_frames(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+        batch_size: Optional[int] = None,
+    ) -> Iterator[pl.DataFrame]:
+        """Rows of `get_exchange_rate_quotes_frame` as frames of about
+        `batch_size` rows"""
+        yield self.get_exchange_rate_quotes_frame(
+            start_date, end_date, currency_code, source, table
+        )
+
+    def close(self) -> None: ...
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def insert_exchange_rates(
+        self, rates: List[ExchangeRate], table: str = "A"
+    ) -> None:
+        self.insert_exchange_rates_frame(rates_to_frame(rates), table)
+
+    def get_exchange_rates(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str = "A",
+    ) -> List[ExchangeRate]:
+        frame = self.get_exchange_rates_frame(
+            start_date, end_date, currency_code, source, table
+        )
+
+        return [
+            ExchangeRate(
+                currency_code=row["currency_code"],
+                rate=row["rate"],
+                date=row["date"].isoformat(),
+                source=row["source"],
+            )
+            for row in frame.iter_rows(named=True)
+        ]
+
+    def get_exchange_rate_quotes(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+        source: str,
+        table: str,
+    ) -> List[ExchangeRateQuote]:
+        """Buy and sell rates of a table quoting them"""
+        frame = self.get_exchange_rate_quotes_frame(
+            start_date, end_date, currency_code, source, table
+        )
+
+        return [
+            ExchangeRateQuote(
+                currency_code=row["currency_code"],
+                bid=row["bid"],
+                ask=row["ask"],
+                date=row["date"].isoformat(),
+                source=row["source"],
+            )
+            for row in frame.iter_rows(named=True)
+        ]
+
+    def get_exchange_rate_changes(
+        self,
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str | int],
+        source: str,
+        table: str = "A",
+    ) -> List[ExchangeRateChange]:
+        frame = self.get_exchange_rate_changes_frame(
+            start_date, end_date, currency_code, source, table
+        )
+
+        return [ExchangeRateChange(**row) for row in frame.iter_rows(named=True)]
+
+
+def coverage_days(
+    start_date: date, end_date: date, published_dates: Iterable[date]
+) -> List[Tuple[date, bool]]:
+    """Days of the range to record as fetched, with whether rates were published.
+
+    Dates without published rates are recorded as non-publication days, unless
+    they are not older than today, as the source might still publish them.
+    """
+    published = set(published_dates)
+    today = date.today()
+    days = []
+    current = start_date
+    while current <= end_date:
+        if current in published:
+            days.append((current, True))
+        elif current < today:
+            days.append((current, False))
+        current += timedelta(days=1)
+    return days
+
+
+def missing_ranges(
+    start_date: date, end_date: date, covered: Set[date]
+) -> List[Tuple[date, date]]:
+    """Contiguous sub-ranges of the range without covered days"""
+    missing: List[Tuple[date, date]] = []
+    range_start: Optional[date] = None
+    current = start_date
+    while current <= end_date:
+        if current not in covered and range_start is None:
+            range_start = current
+        elif current in covered and range_start is not None:
+            missing.append((range_start, current - timedelta(days=1)))
+            range_start = None
+        current += timedelta(days=1)
+
+    if range_start is not None:
+        missing.append((range_start, end_date))
+
+    return missing
+
+
+def fill_missing_days(
+    rates: pl.DataFrame, start_date: date, end_date: date, source: str
+) -> pl.DataFrame:
+    """Rows for every day of the range and every currency of the stored rates,
+    days without rates are filled with nulls"""
+    dates_df = pl.DataFrame(
+        {"date": pl.date_range(start_date, end_date, "1d", eager=True)}
+    )
+    currencies = rates.get_column("currency_code").unique()
+    return (
+        dates_df.join(pl.DataFrame({"currency_code": currencies}), how="cross")
+        .join(rates, on=["currency_code", "date"], how="left")
+        .with_columns(pl.col("source").fill_null(source))
+        .sort(["currency_code", "date"])
+    )
+
+
+def fill_missing_days_batches(
+    batches: Iterable[pl.DataFrame], start_date: date, end_date: date, source: str
+) -> Iterator[pl.DataFrame]:
+    """`fill_missing_days` of rates read in batches sorted by currency and date,
+    e.g. from a cursor, filling a batch at a time. Days of the last currency
+    of a batch are filled up to its last rate, the following batches fill the
+    rest of them."""
+    # currency of the previous batches and the day it is filled up to
+    previous: Optional[Tuple[str, date]] = None
+    empty: Optional[pl.DataFrame] = None
+    for rates in batches:
+        if rates.is_empty():
+            continue
+        empty = rates.clear()
+        codes = rates.get_column("currency_code").unique(maintain_order=True)
+        starts = [start_date] * len(codes)
+        ends = [end_date] * len(codes)
+        ends[-1] = rates.get_column("date")[-1]
+        if previous is not None and previous[0] == codes[0]:
+            starts[0] = previous[1] + timedelta(days=1)
+        elif previous is not None:
+            codes = pl.concat([pl.Series([previous[0]]), codes])
+            starts.insert(0, previous[1] + timedelta(days=1))
+            ends.insert(0, end_date)
+        previous = (codes[-1], ends[-1])
+        yield _fill_days(rates, codes, starts, ends, source)
+
+    if previous is not None and previous[1] < end_date:
+        yield _fill_days(
+            empty,
+            pl.Series([previous[0]]),
+            [previous[1] + timedelta(days=1)],
+            [end_date],
+            source,
+        )
+
+
+def _fill_days(
+    rates: pl.DataFrame,
+    codes: pl.Series,
+    starts: List[date],
+    ends: List[date],
+    source: str,
+) -> pl.DataFrame:
+    """Rates for every day between the start and the end of each currency"""
+    days = (
+        pl.DataFrame(
+            {"currency_code": codes, "start": starts, "end": ends},
+            schema={"currency_code": pl.Utf8, "start": pl.Date, "end": pl.Date},
+        )
+        .filter(pl.col("start") <= pl.col("end"))
+        .select("currency_code", date=pl.date_ranges("start", "end"))
+        .explode("date", empty_as_null=True)
+    )
+    return days.join(
+        rates, on=["currency_code", "date"], how="left", maintain_order="left"
+    ).with_columns(pl.col("source").fill_null(source))
+
+
+def rate_changes(
+    rates: pl.LazyFrame, start_date: date, end_date: date, source: str
+) -> pl.DataFrame:
+    """Changes of rates in the range, like the SQL of `RateRepository`, with
+    columns of `ExchangeRateChange` fields.
+
+    `rates` are the rates of the range, e.g. from `RateStore.scan_rates`, the
+    pipeline runs lazily, so polars pushes its filters and projections down
+    to the scan and runs the aggregations on all cores.
+    """
+    rate = pl.col("rate")
+    start_rate, end_rate = pl.col("start_rate"), pl.col("end_rate")
+    min_rate, max_rate = pl.col("min_rate"), pl.col("max_rate")
+    return (
+        rates.sort("currency_code", "date")
+        .with_columns(
+            # relative to the previous day of the currency in the range
+            daily_change=((rate - rate.shift(1)) / rate.shift(1) * 100).over(
+                "currency_code"
+            )
+        )
+        .group_by("currency_code")
+        .agg(
+            min_rate=rate.min(),
+            max_rate=rate.max(),
+            avg_rate=rate.mean(),
+            avg_daily_change=pl.col("daily_change").mean(),
+            start_rate=rate.sort_by("date").first(),
+            end_rate=rate.sort_by("date").last(),
+        )
+        .select(
+            "currency_code",
+            source=pl.lit(source),
+            start_date=pl.lit(start_date),
+            end_date=pl.lit(end_date),
+            min_rate=min_rate,
+            max_rate=max_rate,
+            avg_rate="avg_rate",
+            total_change_percent=(max_rate - min_rate) / min_rate * 100,
+            avg_daily_change="avg_daily_change",
+            start_rate=start_rate,
+            end_rate=end_rate,
+            start_to_end_change_percent=(end_rate - start_rate) / start_rate * 100,
+        )
+        .pipe(round_changes)
+        .collect()
+        .select(field.name for field in fields(ExchangeRateChange))
+    )
+
+
+def round_changes(changes: pl.LazyFrame) -> pl.LazyFrame:
+    """Round statistics of rate changes half away from zero and order them by
+    the change from start to end rate, ties by currency.
+
+    Both the SQL of `RateRepository` and `rate_changes` round through it, so
+    they agree on values at half of the last decimal. Averages are rounded
+    to 10 decimals first, as sums of the same rates added in another order,
+    e.g. by monthly rollups maintained as rates are inserted, differ in their
+    last bits.
+    """
+
+    def rounded(name: str, decimals: int, mean: bool = False) -> pl.Expr:
+        # columns without any value are read from SQLite as nulls of no type
+        value = pl.col(name).cast(pl.Float64)
+        if mean:
+            value = value.round(10)
+        return value.round(decimals, mode="half_away_from_zero")
+
+    return changes.with_columns(
+        avg_rate=rounded("avg_rate", 4, mean=True),
+        total_change_percent=rounded("total_change_percent", 2),
+        avg_daily_change=rounded("avg_daily_change", 2, mean=True),
+        start_to_end_change_percent=rounded("start_to_end_change_percent", 2),
+    ).sort(
+        ["start_to_end_change_percent", "currency_code"],
+        descending=[True, False],
+        nulls_last=True,
+    )
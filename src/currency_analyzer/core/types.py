@@ -1,7 +1,20 @@
 from dataclasses import dataclass
 from decimal import Decimal
 from datetime import date
-from typing import Optional
+from typing import Iterable, Optional
+
+import polars as pl
+
+# columnar layout of exchange rates, column for every `ExchangeRate` field
+# followed by buy and sell rates, filled only by tables quoting them
+RATES_SCHEMA = {
+    "currency_code": pl.Utf8,
+    "rate": pl.Float64,
+    "date": pl.Date,
+    "source": pl.Utf8,
+    "bid": pl.Float64,
+    "ask": pl.Float64,
+}
 
 
 @dataclass
@@ -22,6 +35,37 @@ class ExchangeRate:
         )
 
 
+def rates_to_frame(rates: Iterable[ExchangeRate]) -> pl.DataFrame:
+    """Convert exchange rates to a frame with `RATES_SCHEMA` columns"""
+    return pl.DataFrame(
+        [
+            (
+                rate.currency_code,
+                float(rate.rate) if rate.rate is not None else None,
+                rate.date,
+                rate.source,
+                None,
+                None,
+            )
+            for rate in rates
+        ],
+        schema=RATES_SCHEMA,
+        orient="row",
+    )
+
+
+@dataclass
+class ExchangeRateQuote:
+    """Buy and sell rates of a currency, published by some sources instead of
+    the average rate"""
+
+    currency_code: str
+    bid: Optional[Decimal]
+    ask: Optional[Decimal]
+    date: date
+    source: str
+
+
 @dataclass
 class ExchangeRateChange:
     """Representation of exchange rate change"""
@@ -0,0 +1,357 @@
+"""Local stand-in of the NBP API for benchmarking and testing clients offline.
+
+    python -m currency_analyzer.devtools.fake_nbp --port 8000 --latency-ms 40 \
+        --error-rate-429 0.05
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from currency_analyzer.logger import get_logger
+
+logger = get_logger(__name__)
+
+TABLE_A_CURRENCIES = [
+    "THB", "USD", "AUD", "HKD", "CAD", "NZD", "SGD", "EUR", "HUF", "CHF", "GBP",
+    "UAH", "JPY", "CZK", "DKK", "ISK", "NOK", "SEK", "RON", "BGN", "TRY", "ILS",
+    "CLP", "PHP", "MXN", "ZAR", "BRL", "MYR", "IDR", "INR", "KRW", "CNY", "XDR",
+]  # fmt: skip
+TABLE_B_CURRENCIES = [
+    "AFN", "MGA", "PAB", "ETB", "VES", "BOB", "CRC", "SVC", "NIO", "GMD", "MKD",
+    "DZD", "BHD", "IQD", "JOD", "KWD", "LYD", "RSD", "TND", "MAD", "AED", "STN",
+]  # fmt: skip
+TABLE_C_CURRENCIES = [
+    "USD", "AUD", "CAD", "EUR", "HUF", "CHF", "GBP", "JPY", "CZK", "DKK", "NOK",
+    "SEK", "XDR",
+]  # fmt: skip
+
+TABLES_PATH = re.compile(
+    r"^/api/+exchangerates/tables/(?P<table>[ABC])/"
+    r"(?P<start>\d{4}-\d{2}-\d{2})/(?P<end>\d{4}-\d{2}-\d{2})/?$"
+)
+SERIES_PATH = re.compile(
+    r"^/api/+exchangerates/rates/(?P<table>[ABC])/(?P<code>[A-Za-z]{3})/"
+    r"(?P<start>\d{4}-\d{2}-\d{2})/(?P<end>\d{4}-\d{2}-\d{2})/?$"
+)
+
+
+@dataclass
+class FakeNBPConfig:
+    """Behaviour of the fake server"""
+
+    # mean and spread of the delay added to every response
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    # probabilities of answering with an error instead of data
+    error_rate_429: float = 0.0
+    error_rate_5xx: float = 0.0
+    # Retry-After sent with 429 responses, in seconds
+    retry_after: Optional[float] = 0.0
+    max_days_per_request: int = 93
+    max_days_per_series_request: int = 367
+    currencies: List[str] = field(default_factory=lambda: list(TABLE_A_CURRENCIES))
+    table_b_currencies: List[str] = field(
+        default_factory=lambda: list(TABLE_B_CURRENCIES)
+    )
+    table_c_currencies: List[str] = field(
+        default_factory=lambda: list(TABLE_C_CURRENCIES)
+    )
+    seed: int = 0
+    # file with NBP tables payload served instead of synthetic data
+    recorded_tables: Optional[Path] = None
+
+
+@dataclass
+class FakeNBPStats:
+    """Counters of requests handled by the fake server"""
+
+    requests: int = 0
+    status_codes: Counter = field(default_factory=Counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, status_code: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.status_codes[status_code] += 1
+
+
+class FakeNBPData:
+    """Tables served by the fake server, either synthetic or recorded"""
+
+    def __init__(self, config: FakeNBPConfig):
+        self.config = config
+        self.recorded: Optional[Dict[Tuple[str, date], Dict[str, Any]]] = None
+        if config.recorded_tables is not None:
+            payload = json.loads(Path(config.recorded_tables).read_text())
+            self.recorded = {
+                (table["table"], date.fromisoformat(table["effectiveDate"])): table
+                for table in payload
+            }
+        # synthetic tables are generated once, so the server does not compete
+        # with the measured client for CPU
+        self._generated: Dict[Tuple[str, date], Optional[Dict[str, Any]]] = {}
+
+    def mid(self, code: str, day: date) -> float:
+        """Deterministic random walk-like rate of the currency on the given day"""
+        index = sum(map(ord, code))
+        base = 0.5 + (index * 7919 % 500) / 100
+        noise = random.Random(f"{self.config.seed}-{code}-{day}").uniform(-0.01, 0.01)
+        trend = 0.05 * math.sin(day.toordinal() / 45 + index)
+        return round(base * (1 + trend + noise), 4)
+
+    def table(self, table: str, day: date) -> Optional[Dict[str, Any]]:
+        if self.recorded is not None:
+            return self.recorded.get((table, day))
+
+        if (table, day) not in self._generated:
+            self._generated[(table, day)] = self._generate_table(table, day)
+        return self._generated[(table, day)]
+
+    def _generate_table(self, table: str, day: date) -> Optional[Dict[str, Any]]:
+        # NBP does not publish tables on weekends, table B only on Wednesdays
+        if day.weekday() >= 5 or (table == "B" and day.weekday() != 2):
+            return None
+
+        table_data: Dict[str, Any] = {
+            "table": table,
+            "no": f"{day.timetuple().tm_yday:03d}/{table}/NBP/{day.year}",
+            "effectiveDate": day.isoformat(),
+        }
+        if table == "C":
+            # buy and sell rates are quoted around the average rate
+            table_data["tradingDate"] = (
+                day - timedelta(days=3 if day.weekday() == 0 else 1)
+            ).isoformat()
+            table_data["rates"] = [
+                {
+                    "currency": code.lower(),
+                    "code": code,
+                    "bid": round(self.mid(code, day) * 0.99, 4),
+                    "ask": round(self.mid(code, day) * 1.01, 4),
+                }
+                for code in self.config.table_c_currencies
+            ]
+        else:
+            currencies = (
+                self.config.table_b_currencies
+                if table == "B"
+                else self.config.currencies
+            )
+            table_data["rates"] = [
+                {"currency": code.lower(), "code": code, "mid": self.mid(code, day)}
+                for code in currencies
+            ]
+        return table_data
+
+    def tables(self, table: str, start_date: date, end_date: date) -> List[Dict]:
+        days = (end_date - start_date).days + 1
+        tables = (
+            self.table(table, start_date + timedelta(days=i)) for i in range(days)
+        )
+        return [table_data for table_data in tables if table_data is not None]
+
+    def series(
+        self, table: str, code: str, start_date: date, end_date: date
+    ) -> Optional[Dict[str, Any]]:
+        """Rates of a single currency, None if it has none in the range"""
+        rates = [
+            {
+                "no": table_data["no"],
+                "effectiveDate": table_data["effectiveDate"],
+                **rate,
+            }
+            for table_data in self.tables(table, start_date, end_date)
+            for rate in table_data["rates"]
+            if rate["code"] == code
+        ]
+        if not rates:
+            return None
+        return {
+            "table": table,
+            "currency": rates[0]["currency"],
+            "code": code,
+            "rates": [
+                {
+                    key: rate[key]
+                    for key in ("no", "effectiveDate", "mid", "bid", "ask")
+                    if key in rate
+                }
+                for rate in rates
+            ],
+        }
+
+
+class FakeNBPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    # set on a per-server subclass by `FakeNBPServer`
+    config: FakeNBPConfig
+    data: FakeNBPData
+    stats: FakeNBPStats
+    rng: random.Random
+
+    def do_GET(self):
+        latency = self.config.latency_ms + self.rng.uniform(
+            -self.config.latency_jitter_ms, self.config.latency_jitter_ms
+        )
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+        roll = self.rng.random()
+        if roll < self.config.error_rate_429:
+            headers = {}
+            if self.config.retry_after is not None:
+                headers["Retry-After"] = f"{self.config.retry_after:g}"
+            return self._send(429, b"429 Too Many Requests", headers)
+        if roll < self.config.error_rate_429 + self.config.error_rate_5xx:
+            return self._send(503, b"503 Service Unavailable")
+
+        path = self.path.split("?", 1)[0]
+        if match := TABLES_PATH.match(path):
+            max_days = self.config.max_days_per_request
+        elif match := SERIES_PATH.match(path):
+            max_days = self.config.max_days_per_series_request
+        else:
+            return self._send(400, b"400 BadRequest - Niepoprawny zakres dat")
+
+        start_date = date.fromisoformat(match["start"])
+        end_date = date.fromisoformat(match["end"])
+        if end_date < start_date or (end_date - start_date).days > max_days:
+            return self._send(400, b"400 BadRequest - Przekroczony limit")
+
+        if "code" in match.groupdict():
+            payload = self.data.series(
+                match["table"], match["code"].upper(), start_date, end_date
+            )
+        else:
+            payload = self.data.tables(match["table"], start_date, end_date)
+        if not payload:
+            return self._send(404, b"404 NotFound - Not Found - Brak danych")
+
+        body = json.dumps(payload).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", {"ETag": etag})
+        self._send(200, body, {"ETag": etag, "Content-Type": "application/json"})
+
+    def _send(
+        self, status_code: int, body: bytes, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        if status_code == 200 and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            headers = {**(headers or {}), "Content-Encoding": "gzip"}
+
+        # recorded before responding, so the client never sees stale counters
+        self.stats.record(status_code)
+        self.send_response(status_code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class FakeNBPServer:
+    """Threaded fake NBP server running in the background
+
+    >>> with FakeNBPServer(FakeNBPConfig(latency_ms=20)) as server:
+    ...     client = NBPClient(base_url=server.base_url)
+    """
+
+    def __init__(
+        self,
+        config: Optional[FakeNBPConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.config = config or FakeNBPConfig()
+        self.stats = FakeNBPStats()
+        handler = type(
+            "ConfiguredFakeNBPHandler",
+            (FakeNBPHandler,),
+            {
+                "config": self.config,
+                "data": FakeNBPData(self.config),
+                "stats": self.stats,
+                "rng": random.Random(self.config.seed),
+            },
+        )
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> "FakeNBPServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeNBPServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    parser.add_argument("--recorded-tables", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeNBPConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate_429=args.error_rate_429,
+        error_rate_5xx=args.error_rate_5xx,
+        retry_after=args.retry_after,
+        recorded_tables=args.recorded_tables,
+        seed=args.seed,
+    )
+    server = FakeNBPServer(config, args.host, args.port)
+    print(f"Fake NBP API listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
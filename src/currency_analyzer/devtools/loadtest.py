@@ -0,0 +1,181 @@
+"""Drive the `analyzer export` pipeline against the fake NBP server.
+
+Every export fetches its window into a fresh database (unless --shared-db is
+given), so the numbers reflect the client and ingestion path end to end.
+
+    python -m currency_analyzer.devtools.loadtest --exports 40 --concurrency 8 \
+        --latency-ms 40 --error-rate-429 0.02
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Counter, List, Optional
+
+from currency_analyzer.api.nbp import NBPClient
+from currency_analyzer.api.ratelimit import TokenBucket
+from currency_analyzer.cli.main import exporter_cls_from_params
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.devtools.fake_nbp import FakeNBPConfig, FakeNBPServer
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+@dataclass
+class LoadTestResult:
+    duration: float = 0.0
+    request_latencies: List[float] = field(default_factory=list)
+    export_times: List[float] = field(default_factory=list)
+    failures: List[str] = field(default_factory=list)
+    status_codes: Counter = field(default_factory=Counter)
+
+    @property
+    def requests_per_second(self) -> float:
+        return len(self.request_latencies) / self.duration if self.duration else 0.0
+
+    def report(self) -> str:
+        def ms(values: List[float], pct: float) -> str:
+            return f"{percentile(values, pct) * 1000:8.1f}ms"
+
+        return "\n".join(
+            [
+                f"exports:        {len(self.export_times)} ok, "
+                f"{len(self.failures)} failed in {self.duration:.2f}s",
+                f"requests:       {len(self.request_latencies)} "
+                f"({self.requests_per_second:.1f} req/s), "
+                f"server statuses: {dict(sorted(self.status_codes.items()))}",
+                f"request p50/p95/p99: {ms(self.request_latencies, 50)} "
+                f"{ms(self.request_latencies, 95)} {ms(self.request_latencies, 99)}",
+                f"export  p50/p95/max: {ms(self.export_times, 50)} "
+                f"{ms(self.export_times, 95)} {ms(self.export_times, 100)}",
+            ]
+        )
+
+
+def run_load_test(
+    exports: int = 20,
+    concurrency: int = 4,
+    client_concurrency: int = 4,
+    start_date: date = date(2024, 3, 1),
+    end_date: date = date(2024, 12, 4),
+    export_type: str = "raw",
+    format: str = "json",
+    shared_db: bool = False,
+    rate_limit: Optional[float] = None,
+    server_config: Optional[FakeNBPConfig] = None,
+    workdir: Optional[Path] = None,
+) -> LoadTestResult:
+    result = LoadTestResult()
+    lock = threading.Lock()
+    # the bucket is shared by all exports, like the default one within a process
+    rate_limiter = (
+        TokenBucket(rate=rate_limit, capacity=rate_limit) if rate_limit else None
+    )
+
+    def record_latency(response, *args, **kwargs):
+        with lock:
+            result.request_latencies.append(response.elapsed.total_seconds())
+
+    def run_export(index: int, base_url: str, directory: Path) -> float:
+        db_name = "rates.db" if shared_db else f"rates-{index}.db"
+        with RateRepository(str(directory / db_name)) as repository, NBPClient(
+            max_workers=client_concurrency,
+            base_url=base_url,
+            rate_limiter=rate_limiter,
+        ) as client:
+            client.session.hooks["response"].append(record_latency)
+            exporter = exporter_cls_from_params(export_type, format)(repository, client)
+
+            started = time.perf_counter()
+            exporter.generate_report(
+                start_date=start_date,
+                end_date=end_date,
+                output_file=directory / f"report-{index}.{format}",
+            )
+            return time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp_dir, FakeNBPServer(
+        server_config
+    ) as server:
+        directory = Path(tmp_dir)
+        if shared_db:
+            # create the schema once instead of racing on it from every worker
+            RateRepository(str(directory / "rates.db")).close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(run_export, index, server.base_url, directory)
+                for index in range(exports)
+            ]
+            for future in as_completed(futures):
+                try:
+                    result.export_times.append(future.result())
+                except Exception as e:
+                    result.failures.append(str(e))
+        result.duration = time.perf_counter() - started
+        result.status_codes = server.stats.status_codes
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--exports", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--client-concurrency", type=int, default=4)
+    parser.add_argument("--days", type=int, default=279)
+    parser.add_argument("--end-date", type=date.fromisoformat, default="2024-12-04")
+    parser.add_argument("--export-type", choices=["raw", "changes"], default="raw")
+    parser.add_argument("--format", choices=["csv", "json"], default="json")
+    parser.add_argument("--shared-db", action="store_true")
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="Requests per second of the client token bucket, the client default if not set",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    args = parser.parse_args()
+
+    result = run_load_test(
+        exports=args.exports,
+        concurrency=args.concurrency,
+        client_concurrency=args.client_concurrency,
+        start_date=args.end_date - timedelta(days=args.days),
+        end_date=args.end_date,
+        export_type=args.export_type,
+        format=args.format,
+        shared_db=args.shared_db,
+        rate_limit=args.rate_limit,
+        server_config=FakeNBPConfig(
+            latency_ms=args.latency_ms,
+            latency_jitter_ms=args.latency_jitter_ms,
+            error_rate_429=args.error_rate_429,
+            error_rate_5xx=args.error_rate_5xx,
+            retry_after=args.retry_after,
+        ),
+    )
+    print(result.report())
+    for failure in result.failures[:5]:
+        print(f"failure: {failure}")
+
+
+if __name__ == "__main__":
+    main()
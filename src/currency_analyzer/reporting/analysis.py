@@ -1,71 +1,1091 @@
-from dataclasses import asdict
-from datetime import date
-from typing import Any, Dict, List, Optional, Protocol
-
-from currency_analyzer.api.client import ExchangeRateClient
-from currency_analyzer.core.database import (
-    ExchangeRate,
-    ExchangeRateChange,
-    RateRepository,
+import asyncio
+from abc import abstractmethod
+from datetime import date, timedelta
+from typing import (
+    Any,
+    Coroutine,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
 )
 
+import polars as pl
+
+from currency_analyzer.api.client import AsyncExchangeRateClient, ExchangeRateClient
+from currency_analyzer.core.storage import RateStore, rate_changes
+
+T = TypeVar("T")
+
+# published rates in the windows of rolling statistics, about a month
+DEFAULT_ROLLING_WINDOW = 20
+
+# statistics of pairs of currencies computed by `return_correlations`
+CORRELATIONS_SCHEMA = {
+    "currency_code": pl.Utf8,
+    "other_currency": pl.Utf8,
+    "observations": pl.UInt32,
+    "covariance": pl.Float64,
+    "correlation": pl.Float64,
+}
+
+
+def _store_rates(
+    repository: RateStore,
+    client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+    start_date: date,
+    end_date: date,
+    api_rates: pl.DataFrame,
+    currency_code: Optional[str] = None,
+) -> None:
+    repository.insert_exchange_rates_frame(api_rates, client.table)
+    repository.record_coverage(
+        start_date,
+        end_date,
+        client.source,
+        client.table,
+        api_rates.get_column("date").unique().to_list(),
+        **_currency_scope(currency_code),
+    )
+
+
+def _currency_scope(currency_code: Optional[str]) -> Dict[str, str]:
+    """Coverage arguments limiting it to a single currency, if one is given"""
+    return {"currency_code": currency_code} if currency_code else {}
+
+
+def _fetch_frame(
+    client: ExchangeRateClient,
+    start_date: date,
+    end_date: date,
+    currency_code: Optional[str],
+) -> pl.DataFrame:
+    """Fetch only the series of the currency when a single one is needed, it is
+    a fraction of the whole table payload"""
+    if currency_code:
+        return client.get_currency_rates_frame(currency_code, start_date, end_date)
+    return client.get_exchange_rates_frame(start_date, end_date)
+
+
+async def _fetch_frame_async(
+    client: AsyncExchangeRateClient,
+    start_date: date,
+    end_date: date,
+    currency_code: Optional[str],
+) -> pl.DataFrame:
+    if currency_code:
+        return await client.get_currency_rates_frame(
+            currency_code, start_date, end_date
+        )
+    return await client.get_exchange_rates_frame(start_date, end_date)
+
+
+def run_with_clients(
+    coroutine: Coroutine[Any, Any, T],
+    clients: Iterable[Union[ExchangeRateClient, AsyncExchangeRateClient]],
+) -> T:
+    """Run the coroutine in a new event loop, like `asyncio.run`, closing the
+    connections asynchronous clients opened in it before the loop is closed,
+    so the clients can be used again by other loops and threads"""
+
+    async def run() -> T:
+        try:
+            return await coroutine
+        finally:
+            await asyncio.gather(
+                *(
+                    client.aclose()
+                    for client in clients
+                    if isinstance(client, AsyncExchangeRateClient)
+                )
+            )
+
+    return asyncio.run(run())
+
+
+def fetch_missing_rates(
+    repository: RateStore,
+    client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+    start_date: date,
+    end_date: date,
+    currency_code: Optional[str] = None,
+) -> None:
+    """Fetch and store rates only for the sub-ranges which were not fetched before.
+
+    With `currency_code` only rates of that currency are fetched.
+    """
+    if isinstance(client, AsyncExchangeRateClient):
+        run_with_clients(
+            fetch_missing_rates_async(
+                repository, client, start_date, end_date, currency_code
+            ),
+            [client],
+        )
+        return
+
+    missing_ranges = repository.get_missing_ranges(
+        start_date,
+        end_date,
+        client.source,
+        client.table,
+        **_currency_scope(currency_code),
+    )
+    for range_start, range_end in missing_ranges:
+        api_rates = _fetch_frame(client, range_start, range_end, currency_code)
+        _store_rates(
+            repository, client, range_start, range_end, api_rates, currency_code
+        )
+
+
+async def fetch_missing_rates_async(
+    repository: RateStore,
+    client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+    start_date: date,
+    end_date: date,
+    currency_code: Optional[str] = None,
+) -> None:
+    """Fetch all missing sub-ranges concurrently and store them.
+
+    Synchronous clients are run in worker threads, so they can be used from an
+    event loop as well.
+    """
+    missing_ranges = repository.get_missing_ranges(
+        start_date,
+        end_date,
+        client.source,
+        client.table,
+        **_currency_scope(currency_code),
+    )
+    if isinstance(client, AsyncExchangeRateClient):
+        fetches = [
+            _fetch_frame_async(client, range_start, range_end, currency_code)
+            for range_start, range_end in missing_ranges
+        ]
+    else:
+        fetches = [
+            asyncio.to_thread(
+                _fetch_frame, client, range_start, range_end, currency_code
+            )
+            for range_start, range_end in missing_ranges
+        ]
+
+    results = await asyncio.gather(*fetches)
+    for (range_start, range_end), api_rates in zip(missing_ranges, results):
+        _store_rates(
+            repository, client, range_start, range_end, api_rates, currency_code
+        )
+
+
+def fetch_missing_rates_for_tables(
+    repository: RateStore,
+    clients: Sequence[Union[ExchangeRateClient, AsyncExchangeRateClient]],
+    start_date: date,
+    end_date: date,
+    currency_code: Optional[str] = None,
+) -> None:
+    """Fetch missing rates of several source tables at once.
+
+    Tables are fetched concurrently, so refreshing all of them takes about as
+    long as the slowest one.
+    """
+    run_with_clients(
+        fetch_missing_rates_for_tables_async(
+            repository, clients, start_date, end_date, currency_code
+        ),
+        clients,
+    )
+
+
+async def fetch_missing_rates_for_tables_async(
+    repository: RateStore,
+    clients: Sequence[Union[ExchangeRateClient, AsyncExchangeRateClient]],
+    start_date: date,
+    end_date: date,
+    currency_code: Optional[str] = None,
+) -> None:
+    await asyncio.gather(
+        *(
+            fetch_missing_rates_async(
+                repository, client, start_date, end_date, currency_code
+            )
+            for client in clients
+        )
+    )
+
 
 class DataPreparationStrategy(Protocol):
-    """Protocol for data preparation strategies"""
+    """Protocol for data preparation strategies.
+
+    Exporters consume frames from `prepare_frame`, which by default converts
+    the rows of `prepare_data`, so strategies producing only rows keep working.
+    """
 
     def prepare_data(
         self,
-        repository: RateRepository,
-        client: ExchangeRateClient,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        pass
+
+    async def prepare_data_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
         start_date: date,
         end_date: date,
         currency_code: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
         pass
 
+    def prepare_frame(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        return pl.DataFrame(
+            self.prepare_data(repository, client, start_date, end_date, currency_code)
+        )
+
+    async def prepare_frame_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        return pl.DataFrame(
+            await self.prepare_data_async(
+                repository, client, start_date, end_date, currency_code
+            )
+        )
+
+    def query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        """Frame of the report computed from the rates stored before, without
+        fetching the missing ones, like batches fetching the rates of all their
+        reports at once need. Strategies without it fetch them anyway."""
+        return self.prepare_frame(
+            repository, client, start_date, end_date, currency_code
+        )
+
+    def fetch_range(self, start_date: date, end_date: date) -> Tuple[date, date]:
+        """Range of the rates the report of the range is computed from"""
+        return start_date, end_date
+
+
+class QueryDataStrategy(DataPreparationStrategy):
+    """Strategy fetching the missing rates its report is computed from, then
+    computing the report from the stored rates.
+
+    Subclasses implement `_query` and override `fetch_range` when the report
+    needs rates before its range.
+    """
+
+    # name of reports computed from average rates, in errors of clients of
+    # tables publishing only bid and ask rates
+    average_rates_report: Optional[str] = None
 
-class RateChangesDataStrategy(DataPreparationStrategy):
     def prepare_data(
         self,
-        repository: RateRepository,
-        client: ExchangeRateClient,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
         start_date: date,
         end_date: date,
         currency_code: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        api_rates = client.get_exchange_rates(start_date, end_date)
-        repository.insert_exchange_rates(api_rates)
+        return self.prepare_frame(
+            repository, client, start_date, end_date, currency_code
+        ).to_dicts()
+
+    async def prepare_data_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        frame = await self.prepare_frame_async(
+            repository, client, start_date, end_date, currency_code
+        )
+        return frame.to_dicts()
+
+    def prepare_frame(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        self._fetch(repository, client, start_date, end_date, currency_code)
+
+        return self._query(repository, client, start_date, end_date, currency_code)
+
+    async def prepare_frame_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        await self._fetch_async(repository, client, start_date, end_date, currency_code)
+
+        return self._query(repository, client, start_date, end_date, currency_code)
+
+    def query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        self._validate_client(client)
+        return self._query(repository, client, start_date, end_date, currency_code)
+
+    def _fetch(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> None:
+        self._validate_client(client)
+        fetch_missing_rates(
+            repository, client, *self._fetch_args(start_date, end_date, currency_code)
+        )
+
+    async def _fetch_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> None:
+        self._validate_client(client)
+        await fetch_missing_rates_async(
+            repository, client, *self._fetch_args(start_date, end_date, currency_code)
+        )
+
+    def _fetch_args(
+        self, start_date: date, end_date: date, currency_code: Optional[str]
+    ) -> Tuple[date, date, Optional[str]]:
+        """Range and currency of the rates the report is computed from"""
+        return (*self.fetch_range(start_date, end_date), currency_code)
+
+    def _validate_client(
+        self, client: Union[ExchangeRateClient, AsyncExchangeRateClient]
+    ) -> None:
+        if self.average_rates_report and client.has_bid_ask:
+            raise ValueError(
+                f"{self.average_rates_report} require average rates, which table "
+                f"{client.table} does not publish"
+            )
+
+    @abstractmethod
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> pl.DataFrame:
+        """Frame of the report computed from the stored rates"""
+        pass
+
+
+class StreamingDataStrategy(QueryDataStrategy):
+    """Strategy producing its report as a sequence of frames, so exporters
+    write them one by one instead of holding the whole report in memory.
+
+    Subclasses implement `_query` returning the frames lazily, after the rates
+    are fetched.
+    """
+
+    def prepare_frame(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        return self._concat(
+            self.prepare_frames(repository, client, start_date, end_date, currency_code)
+        )
+
+    async def prepare_frame_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        return self._concat(
+            await self.prepare_frames_async(
+                repository, client, start_date, end_date, currency_code
+            )
+        )
+
+    def query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> pl.DataFrame:
+        self._validate_client(client)
+        return self._concat(
+            self._query(repository, client, start_date, end_date, currency_code)
+        )
+
+    def prepare_frames(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> Iterator[pl.DataFrame]:
+        """Fetch missing rates, then return an iterator of the report frames,
+        which are computed only as they are consumed"""
+        self._fetch(repository, client, start_date, end_date, currency_code)
+
+        return self._query(repository, client, start_date, end_date, currency_code)
+
+    async def prepare_frames_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> Iterator[pl.DataFrame]:
+        await self._fetch_async(repository, client, start_date, end_date, currency_code)
+
+        return self._query(repository, client, start_date, end_date, currency_code)
+
+    @abstractmethod
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> Iterator[pl.DataFrame]:
+        """Frames of the report computed from the stored rates"""
+        pass
+
+    def _concat(self, frames: Iterator[pl.DataFrame]) -> pl.DataFrame:
+        frames = list(frames)
+        return pl.concat(frames) if frames else pl.DataFrame()
+
 
-        rate_changes: List[ExchangeRateChange] = repository.get_exchange_rate_changes(
+class RateChangesDataStrategy(QueryDataStrategy):
+    average_rates_report = "Rate changes"
+
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> pl.DataFrame:
+        return repository.get_exchange_rate_changes_frame(
             start_date=start_date,
             end_date=end_date,
             currency_code=currency_code,
             source=client.source,
+            table=client.table,
         )
 
-        return [asdict(item) for item in rate_changes]
-
     def __str__(self):
         return "changes"
 
 
-class RawRatesDataStrategy(DataPreparationStrategy):
+class LazyRateChangesDataStrategy(RateChangesDataStrategy):
+    """Rate changes computed by a polars lazy pipeline over the stored rates
+    instead of the SQL of the repository.
+
+    The pipeline runs on all cores, but reads every rate of the range, while
+    the SQL of `RateRepository` aggregates materialized changes and monthly
+    rollups, see `benchmarks/bench_changes_engines.py` for the trade-off.
+    """
+
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> pl.DataFrame:
+        return rate_changes(
+            repository.scan_rates(
+                start_date, end_date, currency_code, client.source, client.table
+            ),
+            start_date,
+            end_date,
+            client.source,
+        )
+
+
+def daily_returns(rates: pl.DataFrame) -> pl.LazyFrame:
+    """Percentage changes of rates between consecutive publication days, with
+    `date`, `currency_code` and `daily_return` columns.
+
+    `rates` are gap-filled, like from `RateStore.get_exchange_rates_frame`,
+    with a row of every currency for every day. Days without any published
+    rate are skipped, a rate missing on a publication day leaves returns of
+    that day and the next one missing.
+    """
+    rate = pl.col("rate")
+    return (
+        rates.lazy()
+        .filter(rate.is_not_null().any().over("date"))
+        .sort("currency_code", "date")
+        .with_columns(
+            daily_return=((rate - rate.shift(1)) / rate.shift(1) * 100).over(
+                "currency_code"
+            )
+        )
+        .select("date", "currency_code", "daily_return")
+    )
+
+
+def _return_pairs(returns: pl.LazyFrame, currency_code: Optional[str]) -> pl.LazyFrame:
+    """Returns of both currencies of pairs on days both of them have one, of
+    the currency with every currency or of every pair, each pair once"""
+    returns = returns.drop_nulls("daily_return")
+    left = returns.select("date", "currency_code", x="daily_return")
+    right = returns.select("date", other_currency="currency_code", y="daily_return")
+    if currency_code:
+        return left.filter(pl.col("currency_code") == currency_code).join(
+            right, on="date"
+        )
+    return left.join(right, on="date").filter(
+        pl.col("currency_code") <= pl.col("other_currency")
+    )
+
+
+def _with_mirrored_pairs(
+    pairs: pl.DataFrame, currency_code: Optional[str]
+) -> pl.DataFrame:
+    """Pairs computed once in both orders, covariance and correlation are
+    symmetric"""
+    if currency_code:
+        return pairs
+    mirrored = pairs.filter(pl.col("currency_code") != pl.col("other_currency")).rename(
+        {"currency_code": "other_currency", "other_currency": "currency_code"}
+    )
+    return pl.concat([pairs, mirrored.select(pairs.columns)])
+
+
+def return_correlations(
+    rates: pl.DataFrame,
+    start_date: date,
+    end_date: date,
+    source: str,
+    currency_code: Optional[str] = None,
+) -> pl.DataFrame:
+    """Covariance and correlation of daily returns, see `daily_returns`, of
+    all pairs of currencies of the gap-filled rates, or of the currency with
+    every currency, the same currency included.
+
+    Each pair is computed from the days both currencies have returns on.
+    Returns are laid out in a column of every currency, and the statistics of
+    all pairs are computed by a single `select` over them, which polars runs
+    in parallel.
+    """
+    returns = (
+        daily_returns(rates)
+        .collect()
+        .pivot(on="currency_code", index="date", values="daily_return")
+        .drop("date")
+    )
+    currencies = sorted(returns.columns)
+    if currency_code:
+        codes = [(currency_code, other) for other in currencies]
+        codes = codes if currency_code in currencies else []
+    else:
+        codes = [
+            (code, other)
+            for i, code in enumerate(currencies)
+            for other in currencies[i:]
+        ]
+
+    def pair_statistics(i: int, code: str, other: str) -> List[pl.Expr]:
+        both = pl.col(code).is_not_null() & pl.col(other).is_not_null()
+        x, y = pl.col(code).filter(both), pl.col(other).filter(both)
+        return [
+            x.len().alias(f"observations_{i}"),
+            pl.cov(x, y).alias(f"covariance_{i}"),
+            pl.corr(x, y).alias(f"correlation_{i}"),
+        ]
+
+    values = (
+        returns.select(
+            expr for i, pair in enumerate(codes) for expr in pair_statistics(i, *pair)
+        ).row(0, named=True)
+        if codes
+        else {}
+    )
+
+    def column(name: str) -> List[Any]:
+        return [values[f"{name}_{i}"] for i in range(len(codes))]
+
+    observations = pl.col("observations")
+    pairs = pl.DataFrame(
+        {
+            "currency_code": [code for code, _ in codes],
+            "other_currency": [other for _, other in codes],
+            "observations": column("observations"),
+            "covariance": column("covariance"),
+            "correlation": column("correlation"),
+        },
+        schema=CORRELATIONS_SCHEMA,
+    ).with_columns(
+        # undefined for a single day, polars gives 0 and NaN
+        covariance=pl.when(observations > 1).then(
+            pl.col("covariance").round(6, mode="half_away_from_zero")
+        ),
+        correlation=pl.when(observations > 1).then(
+            pl.col("correlation").round(4, mode="half_away_from_zero")
+        ),
+    )
+    return (
+        _with_mirrored_pairs(pairs, currency_code)
+        .with_columns(
+            source=pl.lit(source),
+            start_date=pl.lit(start_date),
+            end_date=pl.lit(end_date),
+        )
+        .select(
+            "currency_code",
+            "other_currency",
+            "source",
+            "start_date",
+            "end_date",
+            "observations",
+            "covariance",
+            "correlation",
+        )
+        .sort("currency_code", "other_currency")
+    )
+
+
+def rolling_correlations(
+    rates: pl.DataFrame,
+    start_date: date,
+    end_date: date,
+    window: int,
+    source: str,
+    currency_code: Optional[str] = None,
+) -> pl.DataFrame:
+    """Covariance and correlation of the last `window` daily returns both
+    currencies of pairs have, for every day of the range with returns of both,
+    see `return_correlations`.
+
+    `rates` should start early enough for the first windows of the range to be
+    full, the windows slide in O(n) like those of `rolling_statistics`.
+    """
+    x, y = pl.col("x"), pl.col("y")
+    pair = ["currency_code", "other_currency"]
+    pairs = (
+        _return_pairs(daily_returns(rates), currency_code)
+        .sort(*pair, "date")
+        .with_columns(
+            covariance=pl.rolling_cov(x, y, window_size=window).over(pair),
+            correlation=pl.rolling_corr(x, y, window_size=window).over(pair),
+        )
+        .filter(pl.col("date").is_between(start_date, end_date))
+        .select(
+            "date",
+            *pair,
+            pl.col("covariance").round(6, mode="half_away_from_zero"),
+            pl.col("correlation").round(4, mode="half_away_from_zero"),
+        )
+        .collect()
+    )
+    return (
+        _with_mirrored_pairs(pairs, currency_code)
+        .with_columns(source=pl.lit(source))
+        .sort("date", *pair)
+    )
+
+
+class CorrelationDataStrategy(QueryDataStrategy):
+    """Covariance and correlation of daily returns of currencies over the whole
+    range, see `return_correlations`, or over windows of the last `window`
+    returns of every day, see `rolling_correlations`.
+
+    The currency of a report limits it to pairs with that currency.
+    """
+
+    average_rates_report = "Correlations"
+
+    def __init__(self, window: Optional[int] = None):
+        if window is not None and window < 2:
+            raise ValueError("Rolling window must span at least 2 rates")
+        self.window = window
+
+    def fetch_range(self, start_date: date, end_date: date) -> Tuple[date, date]:
+        return self._history_start(start_date), end_date
+
+    def _fetch_args(
+        self, start_date: date, end_date: date, currency_code: Optional[str]
+    ) -> Tuple[date, date, Optional[str]]:
+        # returns of the other currencies are needed for the pairs
+        return (*self.fetch_range(start_date, end_date), None)
+
+    def _history_start(self, start_date: date) -> date:
+        if self.window is None:
+            return start_date
+        # a return more, the first one is relative to a rate before it
+        return _history_start(start_date, self.window + 1)
+
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> pl.DataFrame:
+        rates = repository.get_exchange_rates_frame(
+            self._history_start(start_date),
+            end_date,
+            None,
+            client.source,
+            client.table,
+        )
+        if self.window is None:
+            return return_correlations(
+                rates, start_date, end_date, client.source, currency_code
+            )
+        return rolling_correlations(
+            rates, start_date, end_date, self.window, client.source, currency_code
+        )
+
+    def __str__(self):
+        return "correlation"
+
+
+def _history_start(start_date: date, window: int) -> date:
+    """Start of the rates filling windows of `window` published rates of the
+    first days of the range, with room for weekends and holidays without
+    published rates"""
+    return start_date - timedelta(days=2 * window + 14)
+
+
+def rolling_statistics(
+    rates: pl.LazyFrame, start_date: date, end_date: date, window: int, source: str
+) -> pl.DataFrame:
+    """Rolling statistics of the last `window` published rates of every day of
+    the range, for all currencies at once.
+
+    `rates` should start early enough for the first windows of the range to be
+    full, days with fewer rates before them have no statistics. Polars slides
+    the windows in O(n), updating running sums for mean and deviation and
+    monotonic queues for min and max. `volatility` is the standard deviation
+    of daily percentage changes.
+    """
+    rate = pl.col("rate")
+    daily_change = (rate - rate.shift(1)) / rate.shift(1) * 100
+    return (
+        rates.sort("currency_code", "date")
+        .with_columns(
+            moving_average=rate.rolling_mean(window).over("currency_code"),
+            moving_std=rate.rolling_std(window).over("currency_code"),
+            volatility=daily_change.rolling_std(window).over("currency_code"),
+            moving_min=rate.rolling_min(window).over("currency_code"),
+            moving_max=rate.rolling_max(window).over("currency_code"),
+        )
+        .filter(pl.col("date").is_between(start_date, end_date))
+        .select(
+            "currency_code",
+            "date",
+            "rate",
+            pl.col("moving_average").round(4, mode="half_away_from_zero"),
+            pl.col("moving_std").round(4, mode="half_away_from_zero"),
+            pl.col("volatility").round(4, mode="half_away_from_zero"),
+            "moving_min",
+            "moving_max",
+            source=pl.lit(source),
+        )
+        .collect()
+    )
+
+
+class RollingStatsDataStrategy(QueryDataStrategy):
+    """Rolling statistics of the rates of every currency, over windows of the
+    last `window` published rates, see `rolling_statistics`"""
+
+    average_rates_report = "Rolling statistics"
+
+    def __init__(self, window: int = DEFAULT_ROLLING_WINDOW):
+        if window < 2:
+            raise ValueError("Rolling window must span at least 2 rates")
+        self.window = window
+
+    def fetch_range(self, start_date: date, end_date: date) -> Tuple[date, date]:
+        return self._history_start(start_date), end_date
+
+    def _history_start(self, start_date: date) -> date:
+        return _history_start(start_date, self.window)
+
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> pl.DataFrame:
+        return rolling_statistics(
+            repository.scan_rates(
+                self._history_start(start_date),
+                end_date,
+                currency_code,
+                client.source,
+                client.table,
+            ),
+            start_date,
+            end_date,
+            self.window,
+            client.source,
+        )
+
+    def __str__(self):
+        return "rolling"
+
+
+def cross_rates(
+    rates: pl.DataFrame,
+    source: str,
+    base_currency: Optional[str] = None,
+    pairs: Optional[Sequence[Tuple[str, str]]] = None,
+) -> pl.DataFrame:
+    """Cross rates between the currencies of `rates`, as units of the quote
+    currency per unit of the base currency, for every day of the rates.
+
+    All ordered pairs of distinct currencies are computed, or only those of
+    `base_currency` and in `pairs`. Rates of a day are joined with themselves
+    on the date, so a whole matrix is a single division of two columns.
+    """
+    rate = pl.col("rate")
+    bases = rates.select("date", base_currency="currency_code", base_rate=rate)
+    quotes = rates.select("date", quote_currency="currency_code", quote_rate=rate)
+    if base_currency:
+        bases = bases.filter(pl.col("base_currency") == base_currency)
+
+    if pairs:
+        matrix = bases.join(
+            pl.DataFrame(
+                list(pairs),
+                schema={"base_currency": pl.Utf8, "quote_currency": pl.Utf8},
+                orient="row",
+            ),
+            on="base_currency",
+        ).join(quotes, on=["date", "quote_currency"])
+    else:
+        matrix = bases.join(quotes, on="date").filter(
+            pl.col("base_currency") != pl.col("quote_currency")
+        )
+
+    return matrix.select(
+        "date",
+        "base_currency",
+        "quote_currency",
+        rate=(pl.col("base_rate") / pl.col("quote_rate")).round(
+            6, mode="half_away_from_zero"
+        ),
+        source=pl.lit(source),
+    ).sort("date", "base_currency", "quote_currency")
+
+
+class CrossRatesDataStrategy(StreamingDataStrategy):
+    """Cross rates of pairs of currencies, see `cross_rates`, produced a few
+    days at a time, as matrices of all currencies of long ranges are much
+    larger than the rates they are computed from.
+
+    The currency of a report is the base currency of its pairs, `pairs`
+    limits the report to `(base, quote)` pairs. The currency all rates are
+    quoted in, PLN for NBP, is one of the currencies as well. Frames hold
+    whole days, `days_per_frame` at most, a single day's matrix is too small
+    to amortize the overhead of computing and writing a frame.
+    """
+
+    average_rates_report = "Cross rates"
+
+    def __init__(
+        self,
+        pairs: Optional[Sequence[Tuple[str, str]]] = None,
+        days_per_frame: int = 31,
+    ):
+        if days_per_frame < 1:
+            raise ValueError("Frames of cross rates must hold at least 1 day")
+        self.pairs = pairs
+        self.days_per_frame = days_per_frame
+
+    def _fetch_args(
+        self, start_date: date, end_date: date, currency_code: Optional[str]
+    ) -> Tuple[date, date, Optional[str]]:
+        # quotes of the base currency are rates of all the other currencies
+        return start_date, end_date, None
+
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> Iterator[pl.DataFrame]:
+        rates = repository.scan_rates(
+            start_date, end_date, None, client.source, client.table
+        ).filter(pl.col("rate").is_not_null())
+        if self.pairs:
+            currencies = {code for pair in self.pairs for code in pair}
+            rates = rates.filter(pl.col("currency_code").is_in(sorted(currencies)))
+        rates = rates.sort("date").collect()
+
+        if client.quote_currency:
+            rates = pl.concat(
+                [
+                    rates,
+                    rates.select(
+                        currency_code=pl.lit(client.quote_currency),
+                        rate=pl.lit(1.0),
+                        date=pl.col("date").unique(maintain_order=True),
+                    ),
+                ]
+            ).sort("date")
+
+        batches = rates.with_columns(
+            batch=(pl.col("date").rank("dense") - 1) // self.days_per_frame
+        ).partition_by("batch", maintain_order=True, include_key=False)
+        for days in batches:
+            matrix = cross_rates(days, client.source, currency_code, self.pairs)
+            if not matrix.is_empty():
+                yield matrix
+
+    def __str__(self):
+        return "cross"
+
+
+class RawRatesDataStrategy(QueryDataStrategy):
     def prepare_data(
         self,
-        repository: RateRepository,
-        client: ExchangeRateClient,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        return self._to_dicts(
+            self.prepare_frame(repository, client, start_date, end_date, currency_code)
+        )
+
+    async def prepare_data_async(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
         start_date: date,
         end_date: date,
         currency_code: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        api_rates = client.get_exchange_rates(start_date, end_date)
-        repository.insert_exchange_rates(api_rates)
+        return self._to_dicts(
+            await self.prepare_frame_async(
+                repository, client, start_date, end_date, currency_code
+            )
+        )
 
-        rates: List[ExchangeRate] = repository.get_exchange_rates(
-            start_date, end_date, currency_code, client.source
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> pl.DataFrame:
+        if client.has_bid_ask:
+            return repository.get_exchange_rate_quotes_frame(
+                start_date, end_date, currency_code, client.source, client.table
+            )
+        return repository.get_exchange_rates_frame(
+            start_date, end_date, currency_code, client.source, client.table
         )
 
-        return [asdict(item) for item in rates]
+    def _to_dicts(self, rates: pl.DataFrame) -> List[Dict[str, Any]]:
+        """Rows like `ExchangeRate` and `ExchangeRateQuote` fields, dated by ISO strings"""
+        return rates.with_columns(pl.col("date").dt.to_string("%Y-%m-%d")).to_dicts()
 
     def __str__(self):
         return "raw"
+
+
+class StreamingRawRatesDataStrategy(StreamingDataStrategy, RawRatesDataStrategy):
+    """Raw rates read from the repository `batch_size` rows at a time and
+    written by exporters as they are read, so memory of exports of long
+    ranges of all currencies stays flat. Results are not served from the
+    result cache of the repository."""
+
+    def __init__(self, batch_size: Optional[int] = None):
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("Batches of rates must hold at least 1 row")
+        self.batch_size = batch_size
+
+    def _query(
+        self,
+        repository: RateStore,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
+        start_date: date,
+        end_date: date,
+        currency_code: Optional[str],
+    ) -> Iterator[pl.DataFrame]:
+        if client.has_bid_ask:
+            return repository.iter_exchange_rate_quotes_frames(
+                start_date,
+                end_date,
+                currency_code,
+                client.source,
+                client.table,
+                self.batch_size,
+            )
+        return repository.iter_exchange_rates_frames(
+            start_date,
+            end_date,
+            currency_code,
+            client.source,
+            client.table,
+            self.batch_size,
+        )
@@ -0,0 +1,237 @@
+"""Batches of reports sharing the fetch of their rates and their queries.
+
+Reports of a batch are planned together, the union of their date ranges is
+fetched once for every table, every distinct query runs once and its frame is
+written to all outputs of the reports asking for it, by a pool of workers.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import polars as pl
+
+from currency_analyzer.api.client import AsyncExchangeRateClient, ExchangeRateClient
+from currency_analyzer.logger import get_logger
+from currency_analyzer.reporting.analysis import (
+    DataPreparationStrategy,
+    fetch_missing_rates_async,
+    run_with_clients,
+)
+from currency_analyzer.reporting.export import CSVRateExporter, JSONRateExporter
+
+from ..core.exceptions import ExportError
+from ..core.storage import RateStore
+
+logger = get_logger(__name__)
+
+Client = Union[ExchangeRateClient, AsyncExchangeRateClient]
+
+EXPORTERS = {"csv": CSVRateExporter, "json": JSONRateExporter}
+
+
+@dataclass
+class ReportSpec:
+    """Report of a batch, with the parameters of `analyzer export`"""
+
+    output: Path
+    start_date: date
+    end_date: date
+    export_type: str = "changes"
+    format: str = "json"
+    currency: Optional[str] = None
+    table: str = "A"
+    engine: str = "sql"
+    window: Optional[int] = None
+    pairs: Optional[List[Tuple[str, str]]] = None
+
+    @property
+    def query(self) -> Tuple:
+        """Parameters of the frame of the report, reports differing only in
+        their output and format share it"""
+        return (
+            self.export_type,
+            self.engine,
+            self.window,
+            tuple(self.pairs or ()),
+            self.table,
+            self.start_date,
+            self.end_date,
+            self.currency,
+        )
+
+
+@dataclass
+class ReportResult:
+    spec: ReportSpec
+    # time of the query of the report, shared by `shared_by` reports
+    query_seconds: float = 0.0
+    shared_by: int = 1
+    write_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    reports: List[ReportResult] = field(default_factory=list)
+    fetch_seconds: float = 0.0
+    query_seconds: float = 0.0
+    write_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @property
+    def failed(self) -> List[ReportResult]:
+        return [report for report in self.reports if report.error]
+
+
+def merge_ranges(ranges: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+    """Union of date ranges as disjoint ranges, adjacent ones are merged"""
+    merged: List[Tuple[date, date]] = []
+    for start_date, end_date in sorted(ranges):
+        if merged and start_date <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_date))
+        else:
+            merged.append((start_date, end_date))
+    return merged
+
+
+def plan_fetches(
+    specs: List[ReportSpec],
+    strategies: Dict[Tuple, DataPreparationStrategy],
+) -> Dict[str, List[Tuple[date, date]]]:
+    """Ranges of every table to fetch for the reports, all currencies of the
+    table are fetched, a single table payload serves reports of any currency"""
+    ranges: Dict[str, List[Tuple[date, date]]] = {}
+    for spec in specs:
+        ranges.setdefault(spec.table, []).append(
+            strategies[spec.query].fetch_range(spec.start_date, spec.end_date)
+        )
+    return {table: merge_ranges(table_ranges) for table, table_ranges in ranges.items()}
+
+
+async def _fetch(
+    repository: RateStore,
+    clients: Dict[str, Client],
+    plan: Dict[str, List[Tuple[date, date]]],
+) -> None:
+    await asyncio.gather(
+        *(
+            fetch_missing_rates_async(repository, clients[table], start_date, end_date)
+            for table, ranges in plan.items()
+            for start_date, end_date in ranges
+        )
+    )
+
+
+def _timed(run: Callable, *args) -> Tuple[float, object]:
+    started = time.perf_counter()
+    result = run(*args)
+    return time.perf_counter() - started, result
+
+
+def run_batch(
+    repository: RateStore,
+    clients: Dict[str, Client],
+    specs: List[ReportSpec],
+    strategy_for: Callable[[ReportSpec], DataPreparationStrategy],
+    workers: int = 4,
+) -> BatchResult:
+    """Fetch the rates of all reports, run every distinct query once over the
+    fetched rates and write the outputs of the reports concurrently.
+
+    `clients` are clients of the tables of the reports, `strategy_for` gives
+    the data preparation strategy of a report. Failures of single reports are
+    recorded in their results, the other reports are still written.
+    """
+    started = time.perf_counter()
+    result = BatchResult(reports=[ReportResult(spec) for spec in specs])
+    strategies: Dict[Tuple, DataPreparationStrategy] = {}
+    for spec in specs:
+        if spec.query not in strategies:
+            strategies[spec.query] = strategy_for(spec)
+
+    plan = plan_fetches(specs, strategies)
+    logger.info(
+        "Fetching %s ranges of %s tables for %s reports",
+        sum(len(ranges) for ranges in plan.values()),
+        len(plan),
+        len(specs),
+    )
+    result.fetch_seconds, _ = _timed(
+        run_with_clients, _fetch(repository, clients, plan), clients.values()
+    )
+
+    queries = {spec.query: spec for spec in specs}
+    frames: Dict[Tuple, pl.DataFrame] = {}
+    query_times: Dict[Tuple, float] = {}
+    query_errors: Dict[Tuple, str] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        phase_started = time.perf_counter()
+        futures = {
+            query: executor.submit(
+                _timed,
+                strategies[query].query,
+                repository,
+                clients[spec.table],
+                spec.start_date,
+                spec.end_date,
+                spec.currency,
+            )
+            for query, spec in queries.items()
+        }
+        for query, future in futures.items():
+            try:
+                query_times[query], frames[query] = future.result()
+            except Exception as e:
+                logger.error("Failed to prepare report data: %s", e)
+                query_errors[query] = str(e)
+        result.query_seconds = time.perf_counter() - phase_started
+
+        phase_started = time.perf_counter()
+        shared_by = Counter(spec.query for spec in specs)
+        writes = {}
+        for i, report in enumerate(result.reports):
+            query = report.spec.query
+            report.query_seconds = query_times.get(query, 0.0)
+            report.shared_by = shared_by[query]
+            if query in query_errors:
+                report.error = query_errors[query]
+                continue
+            writes[i] = executor.submit(
+                _timed,
+                _write,
+                repository,
+                strategies[query],
+                clients[report.spec.table],
+                frames[query],
+                report.spec,
+            )
+        for i, future in writes.items():
+            try:
+                result.reports[i].write_seconds, _ = future.result()
+            except Exception as e:
+                result.reports[i].error = str(e)
+        result.write_seconds = time.perf_counter() - phase_started
+
+    result.total_seconds = time.perf_counter() - started
+    return result
+
+
+def _write(
+    repository: RateStore,
+    strategy: DataPreparationStrategy,
+    client: Client,
+    frame: pl.DataFrame,
+    spec: ReportSpec,
+) -> Path:
+    exporter_cls = EXPORTERS.get(spec.format.lower())
+    if not exporter_cls:
+        raise ExportError(f"Unsupported format: {spec.format}")
+    exporter = exporter_cls(repository, strategy, client)
+    exporter.validate_path_suffix(spec.output)
+    return exporter.export(frame, spec.output)
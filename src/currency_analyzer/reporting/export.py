@@ -1,37 +1,51 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union
 from datetime import date
 from abc import ABC, abstractmethod
 import json
-import csv
 from pathlib import Path
 
-from currency_analyzer.api.client import ExchangeRateClient
-from currency_analyzer.reporting.analysis import DataPreparationStrategy
+import polars as pl
+
+from currency_analyzer.api.client import AsyncExchangeRateClient, ExchangeRateClient
+from currency_analyzer.reporting.analysis import (
+    DataPreparationStrategy,
+    StreamingDataStrategy,
+)
 from currency_analyzer.logger import get_logger
 
-from ..core.database import RateRepository
+from ..core.storage import RateStore
 from ..core.exceptions import ExportError
 
 logger = get_logger(__name__)
 
+# exporters take frames, rows are accepted for compatibility
+ReportData = Union[pl.DataFrame, List[Dict[str, Any]]]
+
 
 class RateExporter(ABC):
     """Abstract base class for rate exporters"""
 
     def __init__(
         self,
-        repository: RateRepository,
+        repository: RateStore,
         data_strategy: DataPreparationStrategy,
-        client: ExchangeRateClient,
+        client: Union[ExchangeRateClient, AsyncExchangeRateClient],
     ):
         self.repository = repository
         self.data_strategy = data_strategy
         self.client = client
 
-    def _prepare_data(
+    def _prepare_frame(
+        self, start_date: date, end_date: date, currency_code: Optional[str] = None
+    ) -> pl.DataFrame:
+        return self.data_strategy.prepare_frame(
+            self.repository, self.client, start_date, end_date, currency_code
+        )
+
+    async def _prepare_frame_async(
         self, start_date: date, end_date: date, currency_code: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
-        return self.data_strategy.prepare_data(
+    ) -> pl.DataFrame:
+        return await self.data_strategy.prepare_frame_async(
             self.repository, self.client, start_date, end_date, currency_code
         )
 
@@ -42,10 +56,20 @@ class RateExporter(ABC):
         pass
 
     @abstractmethod
-    def export(self, data: List[Dict[str, Any]], output_path: Path) -> Path:
+    def export(self, data: ReportData, output_path: Path) -> Path:
         """Export data to file"""
         pass
 
+    def export_frames(self, frames: Iterable[pl.DataFrame], output_path: Path) -> Path:
+        """Export frames of a report as a single file, exporters override it to
+        write them as they come"""
+        frames = list(frames)
+        return self.export(pl.concat(frames) if frames else pl.DataFrame(), output_path)
+
+    def _as_frame(self, data: ReportData) -> pl.DataFrame:
+        """Frame of the data, which might also be given as rows"""
+        return data if isinstance(data, pl.DataFrame) else pl.DataFrame(data)
+
     def validate_path_suffix(self, output_path: Path):
         """Validate the file extension of the output path"""
         if self.file_extension != output_path.suffix[1:]:
@@ -63,7 +87,35 @@ class RateExporter(ABC):
         """Generate report in the specified format"""
         try:
             self.validate_path_suffix(output_file)
-            data = self._prepare_data(start_date, end_date, currency_code)
+            if isinstance(self.data_strategy, StreamingDataStrategy):
+                frames = self.data_strategy.prepare_frames(
+                    self.repository, self.client, start_date, end_date, currency_code
+                )
+                return self.export_frames(frames, output_file)
+
+            data = self._prepare_frame(start_date, end_date, currency_code)
+            return self.export(data, output_file)
+        except Exception as e:
+            logger.error(f"Failed to generate report: {str(e)}")
+            raise ExportError(f"Failed to generate report: {str(e)}")
+
+    async def generate_report_async(
+        self,
+        start_date: date,
+        end_date: date,
+        output_file: Path,
+        currency_code: Optional[str] = None,
+    ) -> Path:
+        """Generate report in the specified format from within an event loop"""
+        try:
+            self.validate_path_suffix(output_file)
+            if isinstance(self.data_strategy, StreamingDataStrategy):
+                frames = await self.data_strategy.prepare_frames_async(
+                    self.repository, self.client, start_date, end_date, currency_code
+                )
+                return self.export_frames(frames, output_file)
+
+            data = await self._prepare_frame_async(start_date, end_date, currency_code)
             return self.export(data, output_file)
         except Exception as e:
             logger.error(f"Failed to generate report: {str(e)}")
@@ -76,50 +128,154 @@ class CSVRateExporter(RateExporter):
     def file_extension(self) -> str:
         return "csv"
 
-    def export(self, data: List[Dict[str, Any]], output_path: Path) -> Path:
+    def export(self, data: ReportData, output_path: Path) -> Path:
         try:
+            frame = self._as_frame(data)
+            if frame.is_empty():
+                raise ExportError("No data to export")
+
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_path, "w", newline="") as csvfile:
-                if not data:
-                    raise ExportError("No data to export")
+            # line terminator of the `csv` module, which wrote the reports before
+            _repr_floats(frame).write_csv(output_path, line_terminator="\r\n")
 
-                fieldnames = data[0].keys()
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            logger.info(f"Successfully exported data to CSV: {output_path}")
+            return output_path
+
+        except Exception as e:
+            logger.error(f"Failed to export to CSV: {str(e)}")
+            raise ExportError(f"Failed to export to CSV: {str(e)}")
 
-                writer.writeheader()
-                writer.writerows(data)
+    def export_frames(self, frames: Iterable[pl.DataFrame], output_path: Path) -> Path:
+        partial_path = _partial_path(output_path)
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            written = False
+            with open(partial_path, "wb") as csvfile:
+                for frame in frames:
+                    if frame.is_empty():
+                        continue
+                    _repr_floats(frame).write_csv(
+                        csvfile, include_header=not written, line_terminator="\r\n"
+                    )
+                    written = True
+            if not written:
+                raise ExportError("No data to export")
 
+            partial_path.replace(output_path)
             logger.info(f"Successfully exported data to CSV: {output_path}")
             return output_path
 
         except Exception as e:
+            partial_path.unlink(missing_ok=True)
             logger.error(f"Failed to export to CSV: {str(e)}")
             raise ExportError(f"Failed to export to CSV: {str(e)}")
 
 
 class JSONRateExporter(RateExporter):
 
-    class DateEncoder(json.JSONEncoder):
-        def default(self, obj):
-            if isinstance(obj, date):
-                return obj.isoformat()
-            return super().default(obj)
-
     @property
     def file_extension(self) -> str:
         return "json"
 
-    def export(self, data: List[Dict[str, Any]], output_path: Path) -> Path:
+    def export(self, data: ReportData, output_path: Path) -> Path:
         try:
+            document = self._json_document(self._as_frame(data))
             output_path.parent.mkdir(parents=True, exist_ok=True)
             with open(output_path, "w") as jsonfile:
-                json.dump(
-                    data, jsonfile, cls=self.DateEncoder, indent=2, ensure_ascii=False
-                )
+                jsonfile.write(document)
+
+            logger.info(f"Successfully exported data to JSON: {output_path}")
+            return output_path
+
+        except Exception as e:
+            logger.error(f"Failed to export to JSON: {str(e)}")
+            raise ExportError(f"Failed to export to JSON: {str(e)}")
+
+    def export_frames(self, frames: Iterable[pl.DataFrame], output_path: Path) -> Path:
+        partial_path = _partial_path(output_path)
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(partial_path, "w") as jsonfile:
+                written = False
+                for frame in frames:
+                    if frame.is_empty():
+                        continue
+                    jsonfile.write(",\n" if written else "[\n")
+                    jsonfile.write(self._json_objects(frame))
+                    written = True
+                jsonfile.write("\n]" if written else "[]")
 
+            partial_path.replace(output_path)
             logger.info(f"Successfully exported data to JSON: {output_path}")
             return output_path
 
         except Exception as e:
+            partial_path.unlink(missing_ok=True)
             logger.error(f"Failed to export to JSON: {str(e)}")
             raise ExportError(f"Failed to export to JSON: {str(e)}")
+
+    def _json_document(self, frame: pl.DataFrame) -> str:
+        """Array of row objects laid out like `json.dump(rows, indent=2)`, built
+        by polars instead of encoding every value in Python"""
+        if frame.is_empty():
+            return "[]"
+        return "[\n" + self._json_objects(frame) + "\n]"
+
+    def _json_objects(self, frame: pl.DataFrame) -> str:
+        """Row objects of the document, separated by commas"""
+
+        def field(name: str) -> pl.Expr:
+            key = json.dumps(name, ensure_ascii=False)
+            if frame.schema[name].is_float():
+                # NaN and infinities are encoded as null by polars
+                value = _float_text(frame.get_column(name), json.dumps).fill_null(
+                    "null"
+                )
+            else:
+                # value of the encoded `{"name":value}` object
+                value = (
+                    pl.struct(name)
+                    .struct.json_encode()
+                    .str.slice(len(key) + 2)
+                    .str.head(-1)
+                )
+            return pl.concat_str(pl.lit(f"    {key}: "), value)
+
+        rows = frame.select(
+            pl.concat_str(
+                pl.lit("  {\n"),
+                pl.concat_str([field(name) for name in frame.columns], separator=",\n"),
+                pl.lit("\n  }"),
+            )
+        ).to_series()
+        return rows.str.join(",\n").item()
+
+
+def _float_text(series: pl.Series, format_float: Callable[[float], str]) -> pl.Series:
+    """Floats of the series as text of `format_float`, `repr` or `json.dumps`.
+    Polars writes the same shortest digits as Python, except for non-finite
+    values and values below 1e-4, which Python writes in scientific notation,
+    so only those are formatted in Python"""
+    series = series.cast(pl.Float64)
+    text = series.cast(pl.String)
+    odd = series.is_nan() | series.is_infinite() | (series.abs() < 1e-4)
+    odd = odd & (series != 0)
+    if odd.any():
+        text = text.scatter(
+            odd.arg_true(), [format_float(value) for value in series.filter(odd)]
+        )
+    return text
+
+
+def _repr_floats(frame: pl.DataFrame) -> pl.DataFrame:
+    """Frame with floats as text written by the `csv` module"""
+    return frame.with_columns(
+        _float_text(frame.get_column(name), repr)
+        for name, dtype in frame.schema.items()
+        if dtype.is_float()
+    )
+
+
+def _partial_path(output_path: Path) -> Path:
+    """Path the report is written to before it is complete"""
+    return output_path.with_name(output_path.name + ".part")
@@ -1,16 +1,35 @@
+import asyncio
+import random
+import statistics
+import time
+import polars as pl
 import pytest
-from datetime import date
-from unittest.mock import MagicMock
-from currency_analyzer.api.client import ExchangeRateClient
+from dataclasses import asdict
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from currency_analyzer.api.client import AsyncExchangeRateClient, ExchangeRateClient
+from currency_analyzer.api.nbp import AsyncNBPClient
+from currency_analyzer.api.ratelimit import TokenBucket
+from currency_analyzer.devtools.fake_nbp import FakeNBPConfig, FakeNBPServer
 from currency_analyzer.reporting.analysis import (
+    CorrelationDataStrategy,
+    CrossRatesDataStrategy,
+    DataPreparationStrategy,
+    LazyRateChangesDataStrategy,
     RateChangesDataStrategy,
     RawRatesDataStrategy,
+    RollingStatsDataStrategy,
+    StreamingRawRatesDataStrategy,
+    fetch_missing_rates,
+    fetch_missing_rates_for_tables,
 )
 from currency_analyzer.core.database import (
     RateRepository,
     ExchangeRate,
     ExchangeRateChange,
 )
+from currency_analyzer.core.storage import rate_changes
+from currency_analyzer.core.types import rates_to_frame
 
 
 @pytest.fixture
@@ -22,6 +41,8 @@ def mock_repository():
 def mock_client(monkeypatch):
     client = MagicMock(spec=ExchangeRateClient)
     client.source = "NBP"
+    client.table = "A"
+    client.has_bid_ask = False
     monkeypatch.setattr(
         "currency_analyzer.reporting.analysis.ExchangeRateClient", lambda: client
     )
@@ -32,59 +53,651 @@ def test_rate_changes_data_strategy_prepare_data(mock_repository, mock_client):
     strategy = RateChangesDataStrategy()
     start_date = date(2023, 1, 1)
     end_date = date(2023, 1, 31)
-    mock_client.get_exchange_rates.return_value = [
-        ExchangeRate(currency_code="USD", rate=1.0, date="2023-01-01", source="NBP"),
-        ExchangeRate(currency_code="USD", rate=1.1, date="2023-01-02", source="NBP"),
-    ]
-    mock_repository.get_exchange_rate_changes.return_value = [
-        ExchangeRateChange(
-            currency_code="USD",
-            source="NBP",
-            start_date=start_date,
-            end_date=end_date,
-            min_rate=1.0,
-            max_rate=1.1,
-            avg_rate=1.05,
-            total_change_percent=10.0,
-            avg_daily_change=0.05,
-            start_rate=1.0,
-            end_rate=1.1,
-            start_to_end_change_percent=10.0,
-        )
-    ]
+    mock_client.get_exchange_rates_frame.return_value = rates_to_frame(
+        [
+            ExchangeRate(
+                currency_code="USD", rate=1.0, date=date(2023, 1, 1), source="NBP"
+            ),
+            ExchangeRate(
+                currency_code="USD", rate=1.1, date=date(2023, 1, 2), source="NBP"
+            ),
+        ]
+    )
+    mock_repository.get_missing_ranges.return_value = [(start_date, end_date)]
+    change = ExchangeRateChange(
+        currency_code="USD",
+        source="NBP",
+        start_date=start_date,
+        end_date=end_date,
+        min_rate=1.0,
+        max_rate=1.1,
+        avg_rate=1.05,
+        total_change_percent=10.0,
+        avg_daily_change=0.05,
+        start_rate=1.0,
+        end_rate=1.1,
+        start_to_end_change_percent=10.0,
+    )
+    mock_repository.get_exchange_rate_changes_frame.return_value = pl.DataFrame(
+        [asdict(change)]
+    )
 
     data = strategy.prepare_data(
         mock_repository, mock_client, start_date, end_date, None
     )
 
-    mock_client.get_exchange_rates.assert_called_once_with(start_date, end_date)
-    mock_repository.insert_exchange_rates.assert_called_once()
-    mock_repository.get_exchange_rate_changes.assert_called_once_with(
-        start_date=start_date, end_date=end_date, currency_code=None, source="NBP"
+    mock_client.get_exchange_rates_frame.assert_called_once_with(start_date, end_date)
+    mock_repository.insert_exchange_rates_frame.assert_called_once()
+    mock_repository.get_exchange_rate_changes_frame.assert_called_once_with(
+        start_date=start_date,
+        end_date=end_date,
+        currency_code=None,
+        source="NBP",
+        table="A",
     )
-    assert len(data) == 1
-    assert data[0]["currency_code"] == "USD"
+    assert data == [asdict(change)]
 
 
 def test_raw_rates_data_strategy_prepare_data(mock_repository, mock_client):
     strategy = RawRatesDataStrategy()
     start_date = date(2023, 1, 1)
     end_date = date(2023, 1, 31)
-    mock_client.get_exchange_rates.return_value = [
-        ExchangeRate(currency_code="USD", rate=1.0, date="2023-01-01", source="NBP"),
-        ExchangeRate(currency_code="USD", rate=1.1, date="2023-01-02", source="NBP"),
-    ]
-    mock_repository.get_exchange_rates.return_value = [
-        ExchangeRate(currency_code="USD", rate=1.0, date="2023-01-01", source="NBP"),
-        ExchangeRate(currency_code="USD", rate=1.1, date="2023-01-02", source="NBP"),
-    ]
+    mock_client.get_exchange_rates_frame.return_value = rates_to_frame(
+        [
+            ExchangeRate(
+                currency_code="USD", rate=1.0, date=date(2023, 1, 1), source="NBP"
+            ),
+            ExchangeRate(
+                currency_code="USD", rate=1.1, date=date(2023, 1, 2), source="NBP"
+            ),
+        ]
+    )
+    mock_repository.get_missing_ranges.return_value = [(start_date, end_date)]
+    mock_repository.get_exchange_rates_frame.return_value = (
+        mock_client.get_exchange_rates_frame.return_value.drop("bid", "ask")
+    )
 
     data = strategy.prepare_data(
         mock_repository, mock_client, start_date, end_date, currency_code=None
     )
 
-    mock_client.get_exchange_rates.assert_called_once_with(start_date, end_date)
-    mock_repository.insert_exchange_rates.assert_called_once()
-    assert len(data) == 2
-    assert data[0]["currency_code"] == "USD"
-    assert data[1]["currency_code"] == "USD"
+    mock_client.get_exchange_rates_frame.assert_called_once_with(start_date, end_date)
+    mock_repository.insert_exchange_rates_frame.assert_called_once()
+    # rows of the compatibility path are dated by ISO strings, like before
+    assert data == [
+        {"currency_code": "USD", "rate": 1.0, "date": "2023-01-01", "source": "NBP"},
+        {"currency_code": "USD", "rate": 1.1, "date": "2023-01-02", "source": "NBP"},
+    ]
+
+
+def test_raw_rates_data_strategy_fetches_only_missing_ranges(
+    mock_repository, mock_client
+):
+    strategy = RawRatesDataStrategy()
+    start_date = date(2023, 1, 1)
+    end_date = date(2023, 1, 31)
+    missing_ranges = [
+        (date(2023, 1, 10), date(2023, 1, 12)),
+        (date(2023, 1, 30), date(2023, 1, 31)),
+    ]
+    mock_client.get_exchange_rates_frame.return_value = rates_to_frame([])
+    mock_repository.get_missing_ranges.return_value = missing_ranges
+    mock_repository.get_exchange_rates_frame.return_value = rates_to_frame([])
+
+    strategy.prepare_data(mock_repository, mock_client, start_date, end_date)
+
+    mock_repository.get_missing_ranges.assert_called_once_with(
+        start_date, end_date, "NBP", "A"
+    )
+    assert [c.args for c in mock_client.get_exchange_rates_frame.call_args_list] == (
+        missing_ranges
+    )
+    assert mock_repository.record_coverage.call_count == 2
+
+
+def test_raw_rates_data_strategy_single_currency_fetches_series(
+    mock_repository, mock_client
+):
+    strategy = RawRatesDataStrategy()
+    start_date = date(2023, 1, 1)
+    end_date = date(2023, 1, 31)
+    mock_client.get_currency_rates_frame.return_value = rates_to_frame([])
+    mock_repository.get_missing_ranges.return_value = [(start_date, end_date)]
+    mock_repository.get_exchange_rates_frame.return_value = rates_to_frame([])
+
+    strategy.prepare_data(mock_repository, mock_client, start_date, end_date, "USD")
+
+    mock_repository.get_missing_ranges.assert_called_once_with(
+        start_date, end_date, "NBP", "A", currency_code="USD"
+    )
+    mock_client.get_currency_rates_frame.assert_called_once_with(
+        "USD", start_date, end_date
+    )
+    mock_client.get_exchange_rates_frame.assert_not_called()
+    assert mock_repository.record_coverage.call_args.kwargs == {"currency_code": "USD"}
+
+
+def test_rate_changes_data_strategy_fully_cached_range(mock_repository, mock_client):
+    strategy = RateChangesDataStrategy()
+    mock_repository.get_missing_ranges.return_value = []
+    mock_repository.get_exchange_rate_changes_frame.return_value = pl.DataFrame()
+
+    strategy.prepare_data(
+        mock_repository, mock_client, date(2023, 1, 1), date(2023, 1, 31)
+    )
+
+    mock_client.get_exchange_rates_frame.assert_not_called()
+    mock_repository.insert_exchange_rates_frame.assert_not_called()
+
+
+@pytest.fixture
+def mock_async_client():
+    client = MagicMock(spec=AsyncExchangeRateClient)
+    client.source = "NBP"
+    client.table = "A"
+    client.has_bid_ask = False
+    client.get_exchange_rates_frame = AsyncMock(
+        return_value=rates_to_frame(
+            [
+                ExchangeRate(
+                    currency_code="USD", rate=1.0, date=date(2023, 1, 2), source="NBP"
+                )
+            ]
+        )
+    )
+    return client
+
+
+def test_raw_rates_data_strategy_async_client(mock_repository, mock_async_client):
+    strategy = RawRatesDataStrategy()
+    missing_ranges = [
+        (date(2023, 1, 1), date(2023, 1, 3)),
+        (date(2023, 1, 10), date(2023, 1, 12)),
+    ]
+    mock_repository.get_missing_ranges.return_value = missing_ranges
+    mock_repository.get_exchange_rates_frame.return_value = rates_to_frame([])
+
+    asyncio.run(
+        strategy.prepare_data_async(
+            mock_repository, mock_async_client, date(2023, 1, 1), date(2023, 1, 12)
+        )
+    )
+
+    assert [
+        c.args for c in mock_async_client.get_exchange_rates_frame.await_args_list
+    ] == (missing_ranges)
+    assert mock_repository.insert_exchange_rates_frame.call_count == 2
+
+
+def test_rate_changes_data_strategy_sync_entrypoint_with_async_client(
+    mock_repository, mock_async_client
+):
+    strategy = RateChangesDataStrategy()
+    mock_repository.get_missing_ranges.return_value = [
+        (date(2023, 1, 1), date(2023, 1, 3))
+    ]
+    mock_repository.get_exchange_rate_changes_frame.return_value = pl.DataFrame()
+
+    strategy.prepare_data(
+        mock_repository, mock_async_client, date(2023, 1, 1), date(2023, 1, 3)
+    )
+
+    mock_async_client.get_exchange_rates_frame.assert_awaited_once()
+    mock_repository.record_coverage.assert_called_once()
+
+
+def test_rate_changes_data_strategy_async_with_sync_client(
+    mock_repository, mock_client
+):
+    strategy = RateChangesDataStrategy()
+    mock_repository.get_missing_ranges.return_value = [
+        (date(2023, 1, 1), date(2023, 1, 3))
+    ]
+    mock_client.get_exchange_rates_frame.return_value = rates_to_frame([])
+    mock_repository.get_exchange_rate_changes_frame.return_value = pl.DataFrame()
+
+    asyncio.run(
+        strategy.prepare_data_async(
+            mock_repository, mock_client, date(2023, 1, 1), date(2023, 1, 3)
+        )
+    )
+
+    mock_client.get_exchange_rates_frame.assert_called_once_with(
+        date(2023, 1, 1), date(2023, 1, 3)
+    )
+
+
+def test_fetch_missing_rates_for_tables_fetches_concurrently(mock_repository):
+    def slow_frame(start_date, end_date):
+        time.sleep(0.2)
+        return rates_to_frame([])
+
+    clients = []
+    for table in ("A", "B", "C"):
+        client = MagicMock(spec=ExchangeRateClient)
+        client.source = "NBP"
+        client.table = table
+        client.get_exchange_rates_frame.side_effect = slow_frame
+        clients.append(client)
+    mock_repository.get_missing_ranges.return_value = [
+        (date(2023, 1, 1), date(2023, 1, 31))
+    ]
+
+    started = time.perf_counter()
+    fetch_missing_rates_for_tables(
+        mock_repository, clients, date(2023, 1, 1), date(2023, 1, 31)
+    )
+
+    assert time.perf_counter() - started < 0.5
+    assert sorted(
+        c.args[1] for c in mock_repository.insert_exchange_rates_frame.call_args_list
+    ) == ["A", "B", "C"]
+    assert sorted(
+        c.args[3] for c in mock_repository.record_coverage.call_args_list
+    ) == ["A", "B", "C"]
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 4])
+def test_async_client_reused_by_sync_entry_points(tmp_path, max_concurrency):
+    with FakeNBPServer(FakeNBPConfig(currencies=["USD", "EUR"])) as server:
+        client = AsyncNBPClient(
+            base_url=server.base_url,
+            max_concurrency=max_concurrency,
+            rate_limiter=TokenBucket(rate=100, capacity=10),
+        )
+        with RateRepository(tmp_path / "rates.db") as repository:
+            # every call runs in an event loop of its own
+            for month in (1, 2, 3):
+                frame = RawRatesDataStrategy().prepare_frame(
+                    repository, client, date(2024, month, 1), date(2024, month, 28)
+                )
+                assert frame.height == 2 * 28
+            fetch_missing_rates_for_tables(
+                repository,
+                [client, client.for_table("B")],
+                date(2024, 4, 1),
+                date(2024, 4, 5),
+            )
+            fetch_missing_rates(
+                repository, client, date(2024, 5, 1), date(2024, 5, 5), "USD"
+            )
+
+        assert server.stats.status_codes[200] == 6
+        assert not client._sessions
+
+
+def test_rate_changes_data_strategy_rejects_bid_ask_table(mock_repository, mock_client):
+    mock_client.table = "C"
+    mock_client.has_bid_ask = True
+
+    with pytest.raises(ValueError):
+        RateChangesDataStrategy().prepare_data(
+            mock_repository, mock_client, date(2023, 1, 1), date(2023, 1, 31)
+        )
+
+    mock_client.get_exchange_rates_frame.assert_not_called()
+
+
+def test_strategy_preparing_rows_provides_frame(mock_repository, mock_client):
+    class RowsStrategy(DataPreparationStrategy):
+        def prepare_data(self, *args, **kwargs):
+            return [{"currency_code": "USD", "rate": 1.0}]
+
+    frame = RowsStrategy().prepare_frame(
+        mock_repository, mock_client, date(2023, 1, 1), date(2023, 1, 31)
+    )
+
+    assert frame.to_dicts() == [{"currency_code": "USD", "rate": 1.0}]
+
+
+@pytest.fixture
+def stored_rates_client(mock_client):
+    """Client of weekday rates of several currencies, one of which misses a
+    rate and two of which change alike"""
+    days = [
+        day
+        for day in (date(2023, 1, 1) + timedelta(days=i) for i in range(120))
+        if day.weekday() < 5
+    ]
+    rates = pl.DataFrame(
+        {
+            "currency_code": [code for _ in days for code in ("EUR", "USD", "CHF")],
+            "rate": [
+                None if (code, day) == ("CHF", date(2023, 2, 1)) else rate
+                for day in days
+                for code, rate in (
+                    ("EUR", 4.5 + (day.toordinal() % 13) / 100),
+                    ("USD", 4.0 + (day.toordinal() % 13) / 100),
+                    ("CHF", 4.0 + (day.toordinal() % 7) / 50),
+                )
+            ],
+            "date": [day for day in days for _ in range(3)],
+            "source": "NBP",
+        }
+    ).with_columns(bid=pl.lit(None, pl.Float64), ask=pl.lit(None, pl.Float64))
+    mock_client.get_exchange_rates_frame.side_effect = (
+        lambda start_date, end_date: rates.filter(
+            pl.col("date").is_between(start_date, end_date)
+        )
+    )
+    mock_client.get_currency_rates_frame.side_effect = (
+        lambda currency_code, start_date, end_date: rates.filter(
+            pl.col("date").is_between(start_date, end_date),
+            pl.col("currency_code") == currency_code,
+        )
+    )
+    return mock_client
+
+
+def test_streaming_raw_rates_match_raw_rates(tmp_path, stored_rates_client):
+    start_date, end_date = date(2023, 1, 20), date(2023, 3, 10)
+    strategy = StreamingRawRatesDataStrategy(batch_size=25)
+    with RateRepository(tmp_path / "rates.db") as repository:
+        frames = list(
+            strategy.prepare_frames(
+                repository, stored_rates_client, start_date, end_date
+            )
+        )
+        expected = RawRatesDataStrategy().prepare_frame(
+            repository, stored_rates_client, start_date, end_date
+        )
+        data = strategy.prepare_data(
+            repository, stored_rates_client, start_date, end_date, "CHF"
+        )
+
+    assert len(frames) > 1
+    assert pl.concat(frames).equals(expected)
+    assert data[0] == {
+        "currency_code": "CHF",
+        "rate": expected.filter(pl.col("currency_code") == "CHF")["rate"][0],
+        "date": "2023-01-20",
+        "source": "NBP",
+    }
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date, currency_code",
+    [
+        (date(2023, 1, 1), date(2023, 4, 30), None),
+        (date(2023, 1, 18), date(2023, 3, 9), None),
+        (date(2023, 1, 31), date(2023, 2, 2), None),
+        (date(2023, 2, 1), date(2023, 2, 28), "CHF"),
+        (date(2023, 1, 6), date(2023, 1, 9), "EUR"),
+        (date(2023, 1, 7), date(2023, 1, 8), None),
+    ],
+)
+def test_lazy_rate_changes_match_sql(
+    tmp_path, stored_rates_client, start_date, end_date, currency_code
+):
+    with RateRepository(tmp_path / "rates.db") as repository:
+        # rates stored by earlier, wider reports
+        RawRatesDataStrategy().prepare_frame(
+            repository, stored_rates_client, date(2023, 1, 1), date(2023, 4, 30)
+        )
+
+        expected = RateChangesDataStrategy().prepare_frame(
+            repository, stored_rates_client, start_date, end_date, currency_code
+        )
+        changes = LazyRateChangesDataStrategy().prepare_frame(
+            repository, stored_rates_client, start_date, end_date, currency_code
+        )
+
+    # ties of the ordering come in any order from SQLite
+    assert changes.sort("currency_code").equals(expected.sort("currency_code"))
+    assert changes.get_column("start_to_end_change_percent").is_sorted(
+        descending=True, nulls_last=True
+    )
+
+
+def test_lazy_rate_changes_match_sql_over_random_ranges(tmp_path):
+    rng = random.Random(7)
+    days = [
+        day
+        for day in (date(2019, 1, 1) + timedelta(days=i) for i in range(730))
+        if day.weekday() < 5
+    ]
+    rates = [
+        ExchangeRate(code, round(3.5 + rng.random(), 4), day, "NBP")
+        for day in days
+        for code in ("EUR", "USD", "CHF", "GBP")
+    ]
+    # backfilled out of order, so monthly rollups add rates in another order
+    batches = [rates[i : i + 20] for i in range(0, len(rates), 20)]
+    rng.shuffle(batches)
+
+    with RateRepository(tmp_path / "rates.db") as repository:
+        for batch in batches:
+            repository.insert_exchange_rates(batch)
+        for _ in range(400):
+            start_date = rng.choice(days)
+            end_date = start_date + timedelta(days=rng.randint(0, 200))
+            expected = repository.get_exchange_rate_changes_frame(
+                start_date, end_date, None, "NBP"
+            )
+            changes = rate_changes(
+                repository.scan_rates(start_date, end_date, None, "NBP"),
+                start_date,
+                end_date,
+                "NBP",
+            )
+            assert changes.equals(expected), (start_date, end_date)
+
+
+def test_rolling_stats_match_windows_of_stored_rates(tmp_path, stored_rates_client):
+    start_date, end_date = date(2023, 2, 6), date(2023, 3, 10)
+    with RateRepository(tmp_path / "rates.db") as repository:
+        stats = RollingStatsDataStrategy(window=3).prepare_frame(
+            repository, stored_rates_client, start_date, end_date
+        )
+        # the windows of the first days are filled by rates before the range
+        rates = repository.get_exchange_rates_frame(
+            date(2023, 1, 1), end_date, None, "NBP"
+        ).drop_nulls("rate")
+
+    assert stats.height == rates.filter(pl.col("date") >= start_date).height
+    for code in ("EUR", "USD"):
+        history = rates.filter(pl.col("currency_code") == code).rows(named=True)
+        expected = []
+        for i, row in enumerate(history):
+            if row["date"] < start_date:
+                continue
+            window = [rate["rate"] for rate in history[i - 2 : i + 1]]
+            changes = [
+                (history[j]["rate"] - history[j - 1]["rate"])
+                / history[j - 1]["rate"]
+                * 100
+                for j in range(i - 2, i + 1)
+            ]
+            expected.append(
+                (
+                    row["date"],
+                    round(statistics.mean(window), 4),
+                    round(statistics.stdev(window), 4),
+                    round(statistics.stdev(changes), 4),
+                    min(window),
+                    max(window),
+                )
+            )
+
+        actual = stats.filter(pl.col("currency_code") == code).select(
+            "date",
+            "moving_average",
+            "moving_std",
+            "volatility",
+            "moving_min",
+            "moving_max",
+        )
+        assert actual.rows() == pytest.approx(expected)
+
+
+def test_rolling_stats_without_full_windows_are_null(tmp_path, stored_rates_client):
+    with RateRepository(tmp_path / "rates.db") as repository:
+        stats = RollingStatsDataStrategy(window=3).prepare_frame(
+            repository, stored_rates_client, date(2023, 1, 2), date(2023, 1, 6), "USD"
+        )
+
+    assert stats.get_column("date").to_list()[:3] == [
+        date(2023, 1, 2),
+        date(2023, 1, 3),
+        date(2023, 1, 4),
+    ]
+    assert stats.get_column("moving_average").null_count() == 2
+    assert stats.get_column("volatility").null_count() == 3
+
+
+def test_cross_rates_of_all_pairs(tmp_path, stored_rates_client):
+    stored_rates_client.quote_currency = "PLN"
+    start_date, end_date = date(2023, 1, 30), date(2023, 2, 3)
+    with RateRepository(tmp_path / "rates.db") as repository:
+        cross = CrossRatesDataStrategy().prepare_frame(
+            repository, stored_rates_client, start_date, end_date
+        )
+        rates = {
+            (row["currency_code"], row["date"]): row["rate"]
+            for row in repository.get_exchange_rates_frame(
+                start_date, end_date, None, "NBP"
+            ).iter_rows(named=True)
+        }
+
+    assert cross.columns == [
+        "date",
+        "base_currency",
+        "quote_currency",
+        "rate",
+        "source",
+    ]
+    # 4 currencies with PLN, but no CHF rate on 2023-02-01
+    assert cross.group_by("date").len().sort("date").get_column("len").to_list() == [
+        12,
+        12,
+        6,
+        12,
+        12,
+    ]
+    for row in cross.iter_rows(named=True):
+        base = rates.get((row["base_currency"], row["date"]), 1.0)
+        quote = rates.get((row["quote_currency"], row["date"]), 1.0)
+        assert row["rate"] == round(base / quote, 6)
+        assert row["source"] == "NBP"
+
+
+def test_cross_rates_of_base_currency_and_pairs(tmp_path, stored_rates_client):
+    stored_rates_client.quote_currency = "PLN"
+    strategy = CrossRatesDataStrategy([("USD", "CHF"), ("EUR", "PLN")], 2)
+    with RateRepository(tmp_path / "rates.db") as repository:
+        frames = list(
+            strategy.prepare_frames(
+                repository,
+                stored_rates_client,
+                date(2023, 1, 30),
+                date(2023, 2, 3),
+                "USD",
+            )
+        )
+        pairs = strategy.prepare_frame(
+            repository, stored_rates_client, date(2023, 1, 30), date(2023, 2, 3)
+        )
+
+    # frames of 2 days with rates, no day is split between frames
+    assert [frame.get_column("date").to_list() for frame in frames] == [
+        [date(2023, 1, 30), date(2023, 1, 31)],
+        [date(2023, 2, 2)],
+        [date(2023, 2, 3)],
+    ]
+    assert {frame.row(0)[1:3] for frame in frames} == {("USD", "CHF")}
+    assert pairs.select("base_currency", "quote_currency").unique().sort(
+        "base_currency"
+    ).rows() == [("EUR", "PLN"), ("USD", "CHF")]
+    assert pairs.height == 9
+
+
+def test_cross_rates_reject_bid_ask_table(mock_repository, mock_client):
+    mock_client.has_bid_ask = True
+    mock_client.table = "C"
+
+    with pytest.raises(ValueError, match="table C"):
+        CrossRatesDataStrategy().prepare_frames(
+            mock_repository, mock_client, date(2023, 1, 1), date(2023, 1, 31)
+        )
+
+
+def returns_of_stored_rates(repository, start_date, end_date):
+    """Returns of every currency by date, computed from one publication day to
+    the next one, missing around missing rates"""
+    rates = repository.get_exchange_rates_frame(start_date, end_date, None, "NBP")
+    published = sorted(set(rates.drop_nulls("rate").get_column("date").to_list()))
+    by_day = {
+        (row["currency_code"], row["date"]): row["rate"]
+        for row in rates.rows(named=True)
+    }
+    returns = {}
+    for code in ("CHF", "EUR", "USD"):
+        for previous, day in zip(published, published[1:]):
+            before, rate = by_day[(code, previous)], by_day[(code, day)]
+            if before is not None and rate is not None:
+                returns[(code, day)] = (rate - before) / before * 100
+    return returns
+
+
+def test_correlations_match_statistics_of_returns(tmp_path, stored_rates_client):
+    start_date, end_date = date(2023, 1, 16), date(2023, 3, 17)
+    with RateRepository(tmp_path / "rates.db") as repository:
+        correlations = CorrelationDataStrategy().prepare_frame(
+            repository, stored_rates_client, start_date, end_date
+        )
+        returns = returns_of_stored_rates(repository, start_date, end_date)
+
+    assert correlations.height == 9
+    for row in correlations.iter_rows(named=True):
+        days = sorted(
+            day
+            for code, day in returns
+            if code == row["currency_code"] and (row["other_currency"], day) in returns
+        )
+        x = [returns[(row["currency_code"], day)] for day in days]
+        y = [returns[(row["other_currency"], day)] for day in days]
+        assert row["observations"] == len(days)
+        assert row["covariance"] == pytest.approx(statistics.covariance(x, y), abs=1e-6)
+        assert row["correlation"] == pytest.approx(
+            statistics.correlation(x, y), abs=1e-4
+        )
+    # returns around the missing CHF rate are skipped
+    observations = dict(
+        correlations.select(
+            pl.concat_str("currency_code", "other_currency"), "observations"
+        ).rows()
+    )
+    assert observations["EURUSD"] == observations["CHFEUR"] + 2
+
+
+def test_rolling_correlations_of_currency(tmp_path, stored_rates_client):
+    start_date, end_date = date(2023, 2, 6), date(2023, 2, 17)
+    with RateRepository(tmp_path / "rates.db") as repository:
+        correlations = CorrelationDataStrategy(window=5).prepare_frame(
+            repository, stored_rates_client, start_date, end_date, "EUR"
+        )
+        returns = returns_of_stored_rates(repository, date(2023, 1, 1), end_date)
+
+    assert correlations.columns == [
+        "date",
+        "currency_code",
+        "other_currency",
+        "covariance",
+        "correlation",
+        "source",
+    ]
+    assert correlations.height == 10 * 3
+    for row in correlations.iter_rows(named=True):
+        assert row["currency_code"] == "EUR"
+        # the last returns of days both currencies have them on
+        days = sorted(
+            day
+            for code, day in returns
+            if code == "EUR" and (row["other_currency"], day) in returns
+        )
+        window = days[: days.index(row["date"]) + 1][-5:]
+        x = [returns[("EUR", day)] for day in window]
+        y = [returns[(row["other_currency"], day)] for day in window]
+        assert row["correlation"] == pytest.approx(
+            statistics.correlation(x, y), abs=1e-4
+        )
@@ -0,0 +1,212 @@
+from datetime import date
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import polars as pl
+import pytest
+
+from currency_analyzer.api.client import ExchangeRateClient
+from currency_analyzer.api.nbp import AsyncNBPClient
+from currency_analyzer.api.ratelimit import TokenBucket
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.types import ExchangeRate, rates_to_frame
+from currency_analyzer.devtools.fake_nbp import FakeNBPConfig, FakeNBPServer
+from currency_analyzer.reporting.analysis import (
+    RateChangesDataStrategy,
+    RawRatesDataStrategy,
+    RollingStatsDataStrategy,
+)
+from currency_analyzer.reporting.batch import (
+    ReportSpec,
+    merge_ranges,
+    plan_fetches,
+    run_batch,
+)
+
+
+@pytest.fixture
+def mock_client():
+    client = MagicMock(spec=ExchangeRateClient)
+    client.source = "NBP"
+    client.table = "A"
+    client.has_bid_ask = False
+    client.get_exchange_rates_frame.side_effect = lambda start_date, end_date: (
+        rates_to_frame(
+            ExchangeRate(currency_code=code, rate=rate, date=day, source="NBP")
+            for code, rate in (("USD", 4.0), ("EUR", 4.5))
+            for day in (date(2024, 1, 2), date(2024, 1, 3), date(2024, 1, 4))
+            if start_date <= day <= end_date
+        )
+    )
+    return client
+
+
+def strategy_for(spec: ReportSpec):
+    return {
+        "raw": RawRatesDataStrategy,
+        "changes": RateChangesDataStrategy,
+        "rolling": RollingStatsDataStrategy,
+    }[spec.export_type]()
+
+
+def test_merge_ranges():
+    assert merge_ranges(
+        [
+            (date(2024, 1, 10), date(2024, 1, 20)),
+            (date(2024, 1, 1), date(2024, 1, 5)),
+            (date(2024, 1, 6), date(2024, 1, 8)),
+            (date(2024, 1, 15), date(2024, 1, 25)),
+        ]
+    ) == [
+        (date(2024, 1, 1), date(2024, 1, 8)),
+        (date(2024, 1, 10), date(2024, 1, 25)),
+    ]
+
+
+def test_plan_fetches_covers_history_of_strategies():
+    specs = [
+        ReportSpec(Path("a.json"), date(2024, 3, 1), date(2024, 3, 31), "raw"),
+        ReportSpec(Path("b.json"), date(2024, 3, 10), date(2024, 4, 10), "raw"),
+        ReportSpec(Path("c.json"), date(2024, 3, 1), date(2024, 3, 5), "rolling"),
+        ReportSpec(
+            Path("d.json"), date(2024, 1, 1), date(2024, 1, 5), "raw", table="B"
+        ),
+    ]
+    strategies = {spec.query: strategy_for(spec) for spec in specs}
+
+    assert plan_fetches(specs, strategies) == {
+        # rates filling the rolling windows of the first days of March
+        "A": [(date(2024, 1, 7), date(2024, 4, 10))],
+        "B": [(date(2024, 1, 1), date(2024, 1, 5))],
+    }
+
+
+def test_run_batch_fetches_and_queries_once(tmp_path, mock_client):
+    start_date, end_date = date(2024, 1, 1), date(2024, 1, 5)
+    specs = [
+        ReportSpec(
+            tmp_path / f"{currency}_{export_type}.{format}",
+            start_date,
+            end_date,
+            export_type,
+            format,
+            currency,
+        )
+        for currency in ("USD", "EUR")
+        for export_type in ("raw", "changes")
+        for format in ("csv", "json")
+    ]
+    strategies = {}
+
+    def counted_strategy_for(spec):
+        strategy = strategy_for(spec)
+        strategy.prepare_frame = MagicMock(wraps=strategy.prepare_frame)
+        strategy.query = MagicMock(wraps=strategy.query)
+        strategies[spec.query] = strategy
+        return strategy
+
+    with RateRepository(tmp_path / "rates.db") as repository:
+        result = run_batch(repository, {"A": mock_client}, specs, counted_strategy_for)
+
+    assert not result.failed
+    mock_client.get_exchange_rates_frame.assert_called_once_with(start_date, end_date)
+    assert len(strategies) == 4
+    mock_client.get_currency_rates_frame.assert_not_called()
+    for strategy in strategies.values():
+        strategy.query.assert_called_once()
+        strategy.prepare_frame.assert_not_called()
+    assert {report.shared_by for report in result.reports} == {2}
+    assert result.total_seconds >= result.fetch_seconds + result.write_seconds
+    usd_rates = pl.read_csv(tmp_path / "USD_raw.csv")
+    assert usd_rates.drop_nulls("rate").get_column("rate").to_list() == [4.0] * 3
+    assert pl.read_json(tmp_path / "USD_raw.json").equals(usd_rates)
+    assert pl.read_json(tmp_path / "EUR_changes.json").get_column(
+        "currency_code"
+    ).to_list() == ["EUR"]
+
+
+def test_run_batch_fetches_range_without_published_rates_once(tmp_path, mock_client):
+    # rates of today might still be published, so they stay missing
+    today = date.today()
+    mock_client.get_exchange_rates_frame.side_effect = None
+    mock_client.get_exchange_rates_frame.return_value = rates_to_frame([])
+    specs = [
+        ReportSpec(
+            tmp_path / f"{currency or 'all'}_{export_type}.{format}",
+            today,
+            today,
+            export_type,
+            format,
+            currency,
+        )
+        for currency in ("USD", "EUR", None)
+        for export_type in ("raw", "changes")
+        for format in ("csv", "json")
+    ]
+
+    with RateRepository(tmp_path / "rates.db") as repository:
+        run_batch(repository, {"A": mock_client}, specs, strategy_for)
+
+    mock_client.get_exchange_rates_frame.assert_called_once_with(today, today)
+    mock_client.get_currency_rates_frame.assert_not_called()
+
+
+def test_run_batch_writes_reports_besides_failed_ones(tmp_path, mock_client):
+    specs = [
+        ReportSpec(
+            tmp_path / "raw.csv", date(2024, 1, 1), date(2024, 1, 5), "raw", "csv"
+        ),
+        # output not matching the format
+        ReportSpec(
+            tmp_path / "raw.txt", date(2024, 1, 1), date(2024, 1, 5), "raw", "csv"
+        ),
+    ]
+
+    with RateRepository(tmp_path / "rates.db") as repository:
+        result = run_batch(repository, {"A": mock_client}, specs, strategy_for)
+
+    assert [report.spec.output.name for report in result.failed] == ["raw.txt"]
+    assert "Invalid file extension" in result.failed[0].error
+    assert (tmp_path / "raw.csv").exists()
+
+
+def test_run_batch_reuses_async_client(tmp_path):
+    with FakeNBPServer(FakeNBPConfig(currencies=["USD", "EUR"])) as server:
+        client = AsyncNBPClient(
+            base_url=server.base_url,
+            max_concurrency=1,
+            rate_limiter=TokenBucket(rate=100, capacity=10),
+        )
+        with RateRepository(tmp_path / "rates.db") as repository:
+            # fetched by the loop of the batch of every month
+            for month in (1, 2):
+                specs = [
+                    ReportSpec(
+                        tmp_path / f"{month}_{currency}.csv",
+                        date(2024, month, 1),
+                        date(2024, month, 28),
+                        "raw",
+                        "csv",
+                        currency,
+                    )
+                    for currency in ("USD", "EUR")
+                ]
+                result = run_batch(repository, {"A": client}, specs, strategy_for)
+                assert not result.failed
+
+    assert server.stats.status_codes[200] == 2
+    assert not client._sessions
+
+
+def test_for_table_of_single_table_client():
+    class SingleTableClient(ExchangeRateClient):
+        source, table = "ECB", "EUR"
+
+        def get_exchange_rates(self, start_date, end_date):
+            return []
+
+    client = SingleTableClient()
+
+    assert client.for_table("EUR") is client
+    with pytest.raises(ValueError, match="Unsupported ECB table: A"):
+        client.for_table("A")
@@ -0,0 +1,76 @@
+import os
+import time
+
+from currency_analyzer.api.cache import ResponseCache
+
+
+def test_store_and_get(tmp_path):
+    cache = ResponseCache(tmp_path)
+
+    cache.store(
+        "http://nbp/tables/A/2024-01-01/2024-01-05/",
+        200,
+        b"[]",
+        {"ETag": '"v1"', "Last-Modified": "Tue, 02 Jan 2024 12:00:00 GMT"},
+        ttl=None,
+    )
+    entry = cache.get("http://nbp/tables/A/2024-01-01/2024-01-05/")
+
+    assert entry.content == b"[]"
+    assert entry.is_fresh()
+    assert entry.validators() == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Tue, 02 Jan 2024 12:00:00 GMT",
+    }
+    assert entry.to_response().json() == []
+    assert cache.get("http://nbp/other/") is None
+
+
+def test_expired_entry_and_refresh(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.store("http://nbp/today/", 200, b"[]", {}, ttl=-1)
+
+    entry = cache.get("http://nbp/today/")
+    assert not entry.is_fresh()
+
+    cache.refresh(entry, ttl=60)
+    assert cache.get("http://nbp/today/").is_fresh()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=2500)
+    body = b"x" * 1000
+
+    cache.store("http://nbp/1/", 200, body, {}, ttl=None)
+    cache.store("http://nbp/2/", 200, body, {}, ttl=None)
+    # make the first entry the most recently used one
+    past = time.time() - 10
+    os.utime(cache._paths("http://nbp/2/")[0], (past, past))
+    cache.get("http://nbp/1/")
+    cache.store("http://nbp/3/", 200, body, {}, ttl=None)
+
+    assert cache.get("http://nbp/1/") is not None
+    assert cache.get("http://nbp/2/") is None
+    assert cache.get("http://nbp/3/") is not None
+    assert cache.size() <= 2500
+
+
+def test_store_reads_directory_only_past_the_limit(tmp_path, monkeypatch):
+    ResponseCache(tmp_path).store("http://nbp/0/", 200, b"x" * 1000, {}, ttl=None)
+    cache = ResponseCache(tmp_path, max_bytes=5000)
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or scan())
+
+    for n in range(3):
+        cache.store(f"http://nbp/{n}/", 200, b"x" * 1000, {}, ttl=None)
+    cache.refresh(cache.get("http://nbp/1/"), ttl=60)
+
+    assert len(scans) == 1
+    assert cache._total == cache.size()
+
+    cache.store("http://nbp/3/", 200, b"x" * 1000, {}, ttl=None)
+    cache.store("http://nbp/4/", 200, b"x" * 1000, {}, ttl=None)
+
+    assert len(scans) == 2
+    assert cache._total == cache.size() <= 5000
@@ -1,8 +1,17 @@
+import dataclasses
+import sqlite3
 import pytest
-from datetime import date
-from currency_analyzer.core.database import RateRepository
-from currency_analyzer.core.types import ExchangeRate
-from currency_analyzer.core.exceptions import DatabaseError
+from datetime import date, timedelta
+from currency_analyzer.core.database import RateRepository, SQLiteSettings
+from currency_analyzer.core.result_cache import ResultCache
+from currency_analyzer.core.types import (
+    ExchangeRate,
+    ExchangeRateChange,
+    ExchangeRateQuote,
+    rates_to_frame,
+)
+import polars as pl
+from currency_analyzer.core.exceptions import DatabaseError, MissingDataError
 
 
 @pytest.fixture
@@ -65,6 +74,24 @@ def test_get_exchange_rates_no_currency(rate_repository, sample_rates):
     assert len(rates) == 4
 
 
+def test_get_exchange_rates_frame(rate_repository, sample_rates):
+    rate_repository.insert_exchange_rates(sample_rates)
+
+    frame = rate_repository.get_exchange_rates_frame(
+        date(2023, 1, 1), date(2023, 1, 3), None, "NBP"
+    )
+
+    assert frame.schema == {
+        "currency_code": pl.Utf8,
+        "rate": pl.Float64,
+        "date": pl.Date,
+        "source": pl.Utf8,
+    }
+    assert frame.filter(pl.col("currency_code") == "EUR").get_column(
+        "rate"
+    ).to_list() == [0.9, 0.95, None]
+
+
 def test_get_exchange_rates_missing_data_for_dates(rate_repository, sample_rates):
     rate_repository.insert_exchange_rates(sample_rates)
     rates = rate_repository.get_exchange_rates(
@@ -83,6 +110,22 @@ def test_get_exchange_rate_changes(rate_repository, sample_rates):
     assert changes[1].currency_code == "EUR"
 
 
+def test_get_exchange_rate_changes_frame(rate_repository, sample_rates):
+    rate_repository.insert_exchange_rates(sample_rates)
+
+    frame = rate_repository.get_exchange_rate_changes_frame(
+        date(2023, 1, 1), date(2023, 1, 2), None, "NBP"
+    )
+
+    assert frame.columns == [
+        field.name for field in dataclasses.fields(ExchangeRateChange)
+    ]
+    assert frame.get_column("start_date").to_list() == [date(2023, 1, 1)] * 2
+    assert rate_repository.get_exchange_rate_changes(
+        date(2023, 1, 1), date(2023, 1, 2), None, "NBP"
+    ) == [ExchangeRateChange(**row) for row in frame.iter_rows(named=True)]
+
+
 def test_get_exchange_rate_changes_for_single_currency(rate_repository, sample_rates):
     rate_repository.insert_exchange_rates(sample_rates)
     changes = rate_repository.get_exchange_rate_changes(
@@ -90,3 +133,645 @@ def test_get_exchange_rate_changes_for_single_currency(rate_repository, sample_r
     )
     assert len(changes) == 1
     assert changes[0].currency_code == "USD"
+
+
+def test_get_missing_ranges_empty_database(rate_repository):
+    missing = rate_repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 10), "NBP", "A"
+    )
+    assert missing == [(date(2023, 1, 1), date(2023, 1, 10))]
+
+
+def test_get_missing_ranges_after_recording_coverage(rate_repository, sample_rates):
+    rate_repository.insert_exchange_rates(sample_rates)
+    rate_repository.record_coverage(
+        date(2023, 1, 1), date(2023, 1, 3), "NBP", "A", {date(2023, 1, 1)}
+    )
+    rate_repository.record_coverage(
+        date(2023, 1, 6), date(2023, 1, 7), "NBP", "A", set()
+    )
+
+    missing = rate_repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 10), "NBP", "A"
+    )
+    assert missing == [
+        (date(2023, 1, 4), date(2023, 1, 5)),
+        (date(2023, 1, 8), date(2023, 1, 10)),
+    ]
+    assert (
+        rate_repository.get_missing_ranges(
+            date(2023, 1, 1), date(2023, 1, 3), "NBP", "A"
+        )
+        == []
+    )
+    # coverage is tracked per table
+    assert rate_repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 3), "NBP", "B"
+    ) == [(date(2023, 1, 1), date(2023, 1, 3))]
+
+
+def test_record_coverage_skips_unpublished_today(rate_repository):
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    rate_repository.record_coverage(yesterday, today, "NBP", "A", set())
+
+    missing = rate_repository.get_missing_ranges(yesterday, today, "NBP", "A")
+    assert missing == [(today, today)]
+
+
+def test_get_missing_ranges_per_currency(rate_repository):
+    rate_repository.record_coverage(
+        date(2023, 1, 1), date(2023, 1, 5), "NBP", "A", set(), currency_code="USD"
+    )
+    rate_repository.record_coverage(
+        date(2023, 1, 6), date(2023, 1, 10), "NBP", "A", set()
+    )
+
+    # whole table coverage applies to every currency
+    assert (
+        rate_repository.get_missing_ranges(
+            date(2023, 1, 1), date(2023, 1, 10), "NBP", "A", currency_code="USD"
+        )
+        == []
+    )
+    assert rate_repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 10), "NBP", "A", currency_code="EUR"
+    ) == [(date(2023, 1, 1), date(2023, 1, 5))]
+    # while a single currency does not cover the table
+    assert rate_repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 10), "NBP", "A"
+    ) == [(date(2023, 1, 1), date(2023, 1, 5))]
+
+
+def test_apply_migrations_adds_currency_to_coverage(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE coverage (
+                source TEXT,
+                table_name TEXT,
+                date TEXT,
+                published INTEGER,
+                PRIMARY KEY (source, table_name, date)
+            )
+            """
+        )
+        conn.execute("INSERT INTO coverage VALUES ('NBP', 'A', '2023-01-02', 1)")
+
+    repository = RateRepository(db_path)
+
+    assert repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 3), "NBP", "A", currency_code="USD"
+    ) == [(date(2023, 1, 1), date(2023, 1, 1)), (date(2023, 1, 3), date(2023, 1, 3))]
+
+
+def test_rates_are_stored_per_table(rate_repository, sample_rates):
+    rate_repository.insert_exchange_rates(sample_rates)
+    rate_repository.insert_exchange_rates_frame(
+        pl.DataFrame(
+            {
+                "currency_code": ["USD", "USD"],
+                "rate": [None, None],
+                "date": [date(2023, 1, 1), date(2023, 1, 2)],
+                "source": ["NBP", "NBP"],
+                "bid": [3.9, 3.95],
+                "ask": [4.0, 4.05],
+            },
+            schema_overrides={"rate": pl.Float64},
+        ),
+        table="C",
+    )
+
+    quotes = rate_repository.get_exchange_rate_quotes(
+        date(2023, 1, 1), date(2023, 1, 2), "USD", "NBP", "C"
+    )
+    assert quotes == [
+        ExchangeRateQuote("USD", 3.9, 4.0, date(2023, 1, 1).isoformat(), "NBP"),
+        ExchangeRateQuote("USD", 3.95, 4.05, date(2023, 1, 2).isoformat(), "NBP"),
+    ]
+    # average rates of table A are not mixed with the quotes of table C
+    rates = rate_repository.get_exchange_rates(
+        date(2023, 1, 1), date(2023, 1, 2), "USD", "NBP"
+    )
+    assert [rate.rate for rate in rates] == [1.0, 1.1]
+    changes = rate_repository.get_exchange_rate_changes(
+        date(2023, 1, 1), date(2023, 1, 2), "USD", "NBP", table="C"
+    )
+    assert [change.min_rate for change in changes] == [None]
+
+
+@pytest.mark.parametrize(
+    "create_table, insert_row",
+    [
+        (
+            """
+            CREATE TABLE rates (
+                currency_code TEXT,
+                rate REAL,
+                date TEXT,
+                source TEXT,
+                PRIMARY KEY (currency_code, date, source)
+            )
+            """,
+            "INSERT INTO rates VALUES ('USD', 4.0, '2023-01-02', 'NBP')",
+        ),
+        (
+            """
+            CREATE TABLE rates (
+                currency_code TEXT,
+                rate REAL,
+                date TEXT,
+                source TEXT,
+                table_name TEXT NOT NULL DEFAULT 'A',
+                bid REAL,
+                ask REAL,
+                PRIMARY KEY (currency_code, date, source, table_name)
+            )
+            """,
+            "INSERT INTO rates VALUES ('USD', 4.0, '2023-01-02', 'NBP', 'A', NULL, NULL)",
+        ),
+    ],
+)
+def test_apply_migrations_migrates_rates_layout(db_path, create_table, insert_row):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(create_table)
+        conn.execute(insert_row)
+
+    repository = RateRepository(db_path)
+
+    rates = repository.get_exchange_rates(
+        date(2023, 1, 1), date(2023, 1, 3), "USD", "NBP", "A"
+    )
+    assert [rate.rate for rate in rates] == [None, 4.0, None]
+
+
+def test_repository_reuses_tuned_connection(db_path, sample_rates):
+    settings = SQLiteSettings(cache_size=-2_000, busy_timeout=1_000)
+
+    with RateRepository(db_path, settings) as repository:
+        repository.insert_exchange_rates(sample_rates)
+        conn = repository._conn
+        repository.get_exchange_rates(date(2023, 1, 1), date(2023, 1, 2), None, "NBP")
+
+        assert repository._conn is conn
+        with repository._transaction() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+            assert conn.execute("PRAGMA cache_size").fetchone() == (-2_000,)
+            assert conn.execute("PRAGMA busy_timeout").fetchone() == (1_000,)
+
+    assert repository._conn is None
+
+
+def test_repository_rolls_back_failed_transaction(rate_repository):
+    row = "('NBP', 'A', 'USD', 19358, 1.0, NULL, NULL)"
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with rate_repository._transaction() as conn:
+            conn.execute(f"INSERT INTO rates VALUES {row}")
+            conn.execute(f"INSERT INTO rates VALUES {row}")
+
+    with pytest.raises(MissingDataError):
+        rate_repository.get_exchange_rates(
+            date(2023, 1, 1), date(2023, 1, 1), None, "NBP"
+        )
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 1000])
+def test_iter_exchange_rates_frames_match_frame(rate_repository, batch_size):
+    rate_repository.insert_exchange_rates(
+        [
+            ExchangeRate("CHF", 4.3, date(2023, 1, 3), "NBP"),
+            ExchangeRate("EUR", 4.6, date(2023, 1, 1), "NBP"),
+            ExchangeRate("EUR", 4.7, date(2023, 1, 4), "NBP"),
+            ExchangeRate("EUR", 4.65, date(2023, 1, 5), "NBP"),
+            ExchangeRate("USD", 4.1, date(2023, 1, 2), "NBP"),
+            ExchangeRate("USD", 4.2, date(2023, 1, 6), "NBP"),
+        ]
+    )
+    start_date, end_date = date(2022, 12, 31), date(2023, 1, 6)
+
+    frames = list(
+        rate_repository.iter_exchange_rates_frames(
+            start_date, end_date, None, "NBP", batch_size=batch_size
+        )
+    )
+
+    expected = rate_repository.get_exchange_rates_frame(
+        start_date, end_date, None, "NBP"
+    )
+    assert pl.concat(frames).equals(expected)
+    # 6 stored rates, read a batch at a time
+    assert len(frames) > 1 or batch_size >= 6
+
+
+def test_iter_exchange_rate_quotes_frames_match_frame(rate_repository):
+    days = [date(2023, 1, 2), date(2023, 1, 3), date(2023, 1, 5)]
+    rate_repository.insert_exchange_rates_frame(
+        pl.DataFrame(
+            {
+                "currency_code": ["EUR", "EUR", "USD"],
+                "rate": [None, None, None],
+                "date": days,
+                "source": "NBP",
+                "bid": [4.6, 4.65, 4.0],
+                "ask": [4.7, 4.75, 4.1],
+            },
+            schema_overrides={"rate": pl.Float64},
+        ),
+        table="C",
+    )
+    start_date, end_date = date(2023, 1, 1), date(2023, 1, 5)
+
+    frames = rate_repository.iter_exchange_rate_quotes_frames(
+        start_date, end_date, None, "NBP", "C", batch_size=1
+    )
+
+    assert pl.concat(frames).equals(
+        rate_repository.get_exchange_rate_quotes_frame(
+            start_date, end_date, None, "NBP", "C"
+        )
+    )
+
+
+def test_iter_exchange_rates_frames_missing_data(rate_repository, sample_rates):
+    rate_repository.insert_exchange_rates(sample_rates)
+
+    with pytest.raises(MissingDataError):
+        list(
+            rate_repository.iter_exchange_rates_frames(
+                date(2023, 2, 1), date(2023, 2, 5), None, "NBP"
+            )
+        )
+
+
+@pytest.fixture(scope="module")
+def twenty_years_repository(tmp_path_factory):
+    dates = pl.date_range(date(2005, 1, 1), date(2024, 12, 31), "1d", eager=True)
+    codes = [f"C{i:02d}" for i in range(10)]
+    repository = RateRepository(tmp_path_factory.mktemp("plans") / "rates.db")
+    repository.insert_exchange_rates_frame(
+        pl.DataFrame(
+            {
+                "currency_code": [code for code in codes for _ in dates],
+                "rate": 1.0,
+                "date": [day for _ in codes for day in dates],
+                "source": "NBP",
+                "bid": None,
+                "ask": None,
+            },
+            schema_overrides={"bid": pl.Float64, "ask": pl.Float64},
+        )
+    )
+    yield repository
+    repository.close()
+
+
+def range_access_plan(repository, query, parameters, table):
+    """Steps of the query plan reading the date range from the table"""
+    with repository._transaction() as conn:
+        plan = [
+            row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", parameters)
+        ]
+    return [
+        step
+        for step in plan
+        if step.split()[:2] in (["SCAN", table], ["SEARCH", table])
+    ]
+
+
+@pytest.mark.parametrize(
+    "currency_code, expected_step",
+    [
+        (
+            None,
+            "SEARCH {table} USING COVERING INDEX {index} "
+            "(source=? AND table_name=? AND {key}>? AND {key}<?)",
+        ),
+        (
+            "C03",
+            "SEARCH {table} USING PRIMARY KEY "
+            "(source=? AND table_name=? AND currency_code=? AND {key}>? AND {key}<?)",
+        ),
+    ],
+)
+@pytest.mark.parametrize(
+    "report, table, index, key, steps",
+    [
+        ("raw", "rates", "rates_by_day", "day", 1),
+        # full months of the range
+        ("changes", "monthly_changes", "monthly_changes_by_month", "month", 1),
+        # days before and after the full months
+        ("changes", "daily_changes", "daily_changes_by_day", "day", 2),
+    ],
+)
+def test_report_queries_are_index_driven(
+    twenty_years_repository,
+    currency_code,
+    expected_step,
+    report,
+    table,
+    index,
+    key,
+    steps,
+):
+    repository = twenty_years_repository
+    arguments = (date(2024, 1, 15), date(2024, 3, 20), currency_code, "NBP", "A")
+    if report == "raw":
+        query = repository._rates_query(["rate"], currency_code)
+        parameters = repository._rates_query_parameters(*arguments)
+    else:
+        query = repository._rate_changes_query(currency_code)
+        parameters = repository._rate_changes_query_parameters(*arguments)
+
+    assert (
+        range_access_plan(repository, query, parameters, table)
+        == [expected_step.format(table=table, index=index, key=key)] * steps
+    )
+
+
+def test_ingest_rates_commits_batches_of_generator(rate_repository, sample_rates):
+    rate_repository.insert_exchange_rates(sample_rates[:1])
+
+    def rates():
+        for day in range(10):
+            yield ExchangeRate(
+                currency_code="USD",
+                rate=1.0 + day / 10,
+                date=date(2023, 1, 1) + timedelta(days=day),
+                source="NBP",
+            )
+
+    stats = rate_repository.ingest_rates(rates(), batch_size=3)
+
+    assert (stats.rows, stats.inserted) == (10, 9)
+    assert stats.rows_per_second > 0
+    rates = rate_repository.get_exchange_rates(
+        date(2023, 1, 1), date(2023, 1, 10), "USD", "NBP"
+    )
+    # the stored rate is kept
+    assert [rate.rate for rate in rates[:2]] == [1.0, 1.1]
+    assert len(rates) == 10
+
+
+def test_ingest_rate_frames_per_table(rate_repository):
+    frames = [
+        pl.DataFrame(
+            {
+                "currency_code": ["USD", "EUR"] * 5,
+                "rate": [None] * 10,
+                "date": [date(year, 1, 2 + i // 2) for i in range(10)],
+                "source": "NBP",
+                "bid": [3.9] * 10,
+                "ask": [4.0] * 10,
+            },
+            schema_overrides={"rate": pl.Float64},
+        )
+        for year in (2022, 2023)
+    ]
+
+    stats = rate_repository.ingest_rate_frames(frames, table="C", batch_size=4)
+
+    assert (stats.rows, stats.inserted) == (20, 20)
+    quotes = rate_repository.get_exchange_rate_quotes(
+        date(2022, 1, 1), date(2023, 12, 31), None, "NBP", "C"
+    )
+    assert sum(quote.bid is not None for quote in quotes) == 20
+
+
+def test_rate_changes_follow_backfilled_gaps(rate_repository):
+    days = [date(2023, 1, 1) + timedelta(days=i) for i in range(30)]
+    rates = {day: 4.0 + (i % 7) / 10 + i / 100 for i, day in enumerate(days)}
+    # every third day first, the gaps in between later and out of order
+    inserted = days[::3] + days[2::3][::-1] + days[1::3]
+    for day in inserted:
+        rate_repository.insert_exchange_rates(
+            [ExchangeRate("USD", rates[day], day, "NBP")]
+        )
+
+    start_date, end_date = date(2023, 1, 5), date(2023, 1, 20)
+    ranged = [rates[day] for day in days if start_date <= day <= end_date]
+    daily_changes = [
+        (rate - prev) / prev * 100 for prev, rate in zip(ranged, ranged[1:])
+    ]
+
+    [change] = rate_repository.get_exchange_rate_changes(
+        start_date, end_date, "USD", "NBP"
+    )
+    assert change.min_rate == min(ranged)
+    assert change.max_rate == max(ranged)
+    assert (change.start_rate, change.end_rate) == (ranged[0], ranged[-1])
+    assert change.avg_daily_change == round(sum(daily_changes) / len(daily_changes), 2)
+    assert change.start_to_end_change_percent == round(
+        (ranged[-1] - ranged[0]) / ranged[0] * 100, 2
+    )
+
+
+BACKFILLED_DAYS = [
+    day
+    for day in (date(2023, 1, 1) + timedelta(days=i) for i in range(100))
+    if day.weekday() < 5
+]
+
+
+def backfilled_rate(code, day):
+    return 4.0 + ["EUR", "USD"].index(code) + (day.toordinal() % 11) / 10
+
+
+@pytest.fixture
+def backfilled_repository(rate_repository):
+    """Rates of three months with weekends missing, where every other week
+    was inserted after the following one, so gaps are backfilled across months"""
+    weeks = [BACKFILLED_DAYS[i : i + 5] for i in range(0, len(BACKFILLED_DAYS), 5)]
+    for week in weeks[1::2] + weeks[::2]:
+        rate_repository.insert_exchange_rates(
+            [
+                ExchangeRate(code, backfilled_rate(code, day), day, "NBP")
+                for day in week
+                for code in ("EUR", "USD")
+            ]
+        )
+    return rate_repository
+
+
+def expected_change(code, start_date, end_date):
+    ranged = [
+        backfilled_rate(code, day)
+        for day in BACKFILLED_DAYS
+        if start_date <= day <= end_date
+    ]
+    daily_changes = [
+        (rate - prev) / prev * 100 for prev, rate in zip(ranged, ranged[1:])
+    ]
+    return {
+        "min_rate": min(ranged),
+        "max_rate": max(ranged),
+        "avg_rate": round(sum(ranged) / len(ranged), 4),
+        "avg_daily_change": (
+            round(sum(daily_changes) / len(daily_changes), 2) if daily_changes else None
+        ),
+        "start_rate": ranged[0],
+        "end_rate": ranged[-1],
+    }
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date",
+    [
+        # within a month
+        (date(2023, 1, 3), date(2023, 1, 20)),
+        # full months only
+        (date(2023, 1, 1), date(2023, 2, 28)),
+        # full month with edges
+        (date(2023, 1, 18), date(2023, 3, 9)),
+        # edge of a single day
+        (date(2023, 1, 31), date(2023, 3, 31)),
+        # two days across months
+        (date(2023, 1, 31), date(2023, 2, 1)),
+    ],
+)
+def test_rate_changes_combine_monthly_rollups_with_edge_days(
+    backfilled_repository, start_date, end_date
+):
+    changes = backfilled_repository.get_exchange_rate_changes(
+        start_date, end_date, None, "NBP"
+    )
+
+    assert {change.currency_code for change in changes} == {"EUR", "USD"}
+    for change in changes:
+        expected = expected_change(change.currency_code, start_date, end_date)
+        assert {field: getattr(change, field) for field in expected} == expected
+
+
+def test_monthly_rollups_maintained_on_insert_match_recomputed(backfilled_repository):
+    from currency_analyzer.core.migrations import FILL_MONTHLY_CHANGES
+
+    query = "SELECT * FROM monthly_changes ORDER BY currency_code, month"
+    with backfilled_repository._transaction() as conn:
+        maintained = conn.execute(query).fetchall()
+        conn.execute("DELETE FROM monthly_changes")
+        for code in ("EUR", "USD"):
+            conn.execute(FILL_MONTHLY_CHANGES, ("NBP", "A", code))
+        recomputed = conn.execute(query).fetchall()
+        conn.rollback()
+
+    assert len(maintained) == 8
+    assert maintained == [
+        tuple(pytest.approx(value) for value in row) for row in recomputed
+    ]
+
+
+def stored_changes(repository):
+    with repository._transaction() as conn:
+        return [
+            conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3, 4").fetchall()
+            for table in ("daily_changes", "monthly_changes")
+        ]
+
+
+@pytest.mark.parametrize(
+    "ingest",
+    [
+        RateRepository.ingest_rates,
+        lambda repository, rates, batch_size: repository.ingest_rate_frames(
+            [rates_to_frame(rates)], batch_size=batch_size
+        ),
+    ],
+)
+def test_ingested_batches_maintain_changes_like_inserts(
+    backfilled_repository, tmp_path, ingest
+):
+    weeks = [BACKFILLED_DAYS[i : i + 5] for i in range(0, len(BACKFILLED_DAYS), 5)]
+    rates = [
+        ExchangeRate(code, backfilled_rate(code, day), day, "NBP")
+        for week in weeks[1::2] + weeks[::2]
+        for day in week
+        for code in ("EUR", "USD")
+    ]
+    ingested = RateRepository(tmp_path / "ingested.sqlite")
+
+    # batches across weeks, the last ones stored already
+    stats = ingest(ingested, rates + rates[:20], batch_size=15)
+
+    assert stats.inserted == len(rates)
+    [daily, monthly] = stored_changes(ingested)
+    [inserted_daily, inserted_monthly] = stored_changes(backfilled_repository)
+    assert len(daily) == len(rates)
+    assert daily == [
+        tuple(pytest.approx(value) for value in row) for row in inserted_daily
+    ]
+    assert monthly == [
+        tuple(pytest.approx(value) for value in row) for row in inserted_monthly
+    ]
+
+
+@pytest.fixture
+def cached_repository(db_path, tmp_path):
+    return RateRepository(db_path, result_cache=ResultCache(tmp_path / "results"))
+
+
+def test_repeated_reads_are_served_from_result_cache(cached_repository, sample_rates):
+    cached_repository.insert_exchange_rates(sample_rates)
+    reads = [
+        lambda: cached_repository.get_exchange_rates_frame(
+            date(2023, 1, 1), date(2023, 1, 2), None, "NBP"
+        ),
+        lambda: cached_repository.get_exchange_rate_changes_frame(
+            date(2023, 1, 1), date(2023, 1, 2), "USD", "NBP"
+        ),
+    ]
+    first = [read() for read in reads]
+
+    statements = []
+    cached_repository._connection().set_trace_callback(statements.append)
+    second = [read() for read in reads]
+
+    assert all(a.equals(b) for a, b in zip(first, second))
+    assert statements
+    assert not [s for s in statements if "rates" in s or "changes" in s]
+
+
+def test_result_cache_invalidated_only_by_new_rates(
+    cached_repository, db_path, sample_rates
+):
+    cached_repository.insert_exchange_rates(sample_rates)
+    version = cached_repository.data_version()
+    cached_repository.get_exchange_rates(
+        date(2023, 1, 1), date(2023, 1, 3), "USD", "NBP"
+    )
+
+    cached_repository.insert_exchange_rates(sample_rates)
+    assert cached_repository.data_version() == version
+
+    # written by another repository of the database
+    with RateRepository(db_path) as other:
+        other.insert_exchange_rates([ExchangeRate("USD", 1.2, date(2023, 1, 3), "NBP")])
+    assert cached_repository.data_version() == (version[0], version[1] + 1)
+    rates = cached_repository.get_exchange_rates(
+        date(2023, 1, 1), date(2023, 1, 3), "USD", "NBP"
+    )
+    assert [rate.rate for rate in rates] == [1.0, 1.1, 1.2]
+
+
+def test_result_cache_on_disk_is_shared_across_repositories(
+    db_path, tmp_path, sample_rates
+):
+    with RateRepository(db_path) as repository:
+        repository.insert_exchange_rates(sample_rates)
+    read = (date(2023, 1, 1), date(2023, 1, 2), None, "NBP")
+
+    with RateRepository(
+        db_path, result_cache=ResultCache(tmp_path / "results")
+    ) as repository:
+        expected = repository.get_exchange_rate_changes_frame(*read)
+
+    result_cache = ResultCache(tmp_path / "results")
+    with RateRepository(db_path, result_cache=result_cache) as repository:
+        statements = []
+        repository._connection().set_trace_callback(statements.append)
+        assert repository.get_exchange_rate_changes_frame(*read).equals(expected)
+        assert not [s for s in statements if "changes" in s]
+
+    # a database created again at the same path has a new identifier
+    db_path.unlink()
+    with RateRepository(db_path, result_cache=result_cache) as repository:
+        assert repository.get_exchange_rate_changes_frame(*read).is_empty()
@@ -1,3 +1,6 @@
+import csv
+import json
+import polars as pl
 import pytest
 from datetime import date
 from unittest.mock import MagicMock
@@ -71,9 +74,9 @@ def test_generate_report(csv_exporter, tmp_path):
     start_date = date(2023, 1, 1)
     end_date = date(2023, 1, 31)
     output_path = tmp_path / "test_report.csv"
-    csv_exporter.data_strategy.prepare_data.return_value = [
-        {"currency_code": "USD", "rate": 1.0, "date": "2023-01-01", "source": "NBP"}
-    ]
+    csv_exporter.data_strategy.prepare_frame.return_value = pl.DataFrame(
+        [{"currency_code": "USD", "rate": 1.0, "date": "2023-01-01", "source": "NBP"}]
+    )
     output_path = csv_exporter.generate_report(start_date, end_date, output_path, "USD")
     assert Path(output_path).exists()
 
@@ -81,8 +84,132 @@ def test_generate_report(csv_exporter, tmp_path):
 def test_generate_report_error(csv_exporter):
     start_date = date(2023, 1, 1)
     end_date = date(2023, 1, 31)
-    csv_exporter.data_strategy.prepare_data.side_effect = Exception(
+    csv_exporter.data_strategy.prepare_frame.side_effect = Exception(
         "Data preparation failed"
     )
     with pytest.raises(ExportError):
         csv_exporter.generate_report(start_date, end_date, "USD", "test_report")
+
+
+@pytest.fixture
+def rows():
+    return [
+        {
+            "currency_code": "USD",
+            "rate": 4.0512,
+            "date": date(2023, 1, 2),
+            "source": "NBP",
+        },
+        {"currency_code": 'ZŁ,"X"', "rate": None, "date": None, "source": "NBP"},
+    ]
+
+
+def test_json_export_of_frame_matches_json_module(json_exporter, rows, tmp_path):
+    output_path = tmp_path / "test_report.json"
+
+    json_exporter.export(pl.DataFrame(rows), output_path)
+
+    assert output_path.read_text() == json.dumps(
+        rows, indent=2, ensure_ascii=False, default=date.isoformat
+    )
+
+
+def test_json_export_of_empty_frame(json_exporter, tmp_path):
+    output_path = tmp_path / "test_report.json"
+
+    json_exporter.export(pl.DataFrame(), output_path)
+
+    assert json.loads(output_path.read_text()) == []
+
+
+def test_csv_export_of_frame_matches_csv_module(csv_exporter, rows, tmp_path):
+    output_path = tmp_path / "test_report.csv"
+    expected_path = tmp_path / "expected.csv"
+    with open(expected_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+
+    csv_exporter.export(pl.DataFrame(rows), output_path)
+
+    assert output_path.read_bytes() == expected_path.read_bytes()
+
+
+def test_csv_export_of_frames_matches_export_of_whole_frame(csv_exporter, tmp_path):
+    frames = [
+        pl.DataFrame({"currency_code": ["USD", "EUR"], "rate": [4.0, 4.5]}),
+        pl.DataFrame(schema={"currency_code": pl.Utf8, "rate": pl.Float64}),
+        pl.DataFrame({"currency_code": ["CHF"], "rate": [4.2]}),
+    ]
+
+    csv_exporter.export_frames(iter(frames), tmp_path / "frames.csv")
+    csv_exporter.export(pl.concat(frames), tmp_path / "frame.csv")
+
+    assert (tmp_path / "frames.csv").read_bytes() == (
+        tmp_path / "frame.csv"
+    ).read_bytes()
+    assert not (tmp_path / "frames.csv.part").exists()
+
+
+def test_json_export_of_frames_matches_json_module(json_exporter, rows, tmp_path):
+    output_path = tmp_path / "test_report.json"
+
+    json_exporter.export_frames(
+        (pl.DataFrame([row]) for row in rows[:1] * 3), output_path
+    )
+
+    assert output_path.read_text() == json.dumps(
+        rows[:1] * 3, indent=2, ensure_ascii=False, default=date.isoformat
+    )
+
+
+def test_export_of_no_frames(csv_exporter, json_exporter, tmp_path):
+    with pytest.raises(ExportError):
+        csv_exporter.export_frames(iter([]), tmp_path / "test_report.csv")
+    assert not (tmp_path / "test_report.csv").exists()
+    assert not (tmp_path / "test_report.csv.part").exists()
+
+    json_exporter.export_frames(iter([]), tmp_path / "test_report.json")
+    assert json.loads((tmp_path / "test_report.json").read_text()) == []
+
+
+@pytest.fixture
+def odd_float_rows():
+    return [
+        {"currency_code": "XAU", "rate": 0.0000123},
+        {"currency_code": "XXX", "rate": float("nan")},
+        {"currency_code": "XPT", "rate": float("-inf")},
+        {"currency_code": "USD", "rate": 1e16},
+        {"currency_code": "EUR", "rate": -0.0},
+    ]
+
+
+def test_csv_export_of_odd_floats_matches_csv_module(
+    csv_exporter, odd_float_rows, tmp_path
+):
+    expected_path = tmp_path / "expected.csv"
+    with open(expected_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=odd_float_rows[0].keys())
+        writer.writeheader()
+        writer.writerows(odd_float_rows)
+
+    csv_exporter.export(pl.DataFrame(odd_float_rows), tmp_path / "frame.csv")
+    csv_exporter.export_frames(
+        (pl.DataFrame([row]) for row in odd_float_rows), tmp_path / "frames.csv"
+    )
+
+    assert (tmp_path / "frame.csv").read_bytes() == expected_path.read_bytes()
+    assert (tmp_path / "frames.csv").read_bytes() == expected_path.read_bytes()
+
+
+def test_json_export_of_odd_floats_matches_json_module(
+    json_exporter, odd_float_rows, tmp_path
+):
+    json_exporter.export(pl.DataFrame(odd_float_rows), tmp_path / "frame.json")
+    json_exporter.export_frames(
+        (pl.DataFrame([row]) for row in odd_float_rows), tmp_path / "frames.json"
+    )
+
+    expected = json.dumps(odd_float_rows, indent=2, ensure_ascii=False)
+    assert (tmp_path / "frame.json").read_text() == expected
+    assert (tmp_path / "frames.json").read_text() == expected
@@ -0,0 +1,143 @@
+import logging
+import sqlite3
+import pytest
+from datetime import date, timedelta
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.migrations import (
+    LATEST_VERSION,
+    MigrationProgress,
+    migrate,
+    schema_version,
+)
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "test_db.sqlite"
+
+
+@pytest.fixture
+def legacy_db_path(db_path):
+    """Database of rates keyed by ISO dates, created before schema versions"""
+    days = [date(2023, 1, 1) + timedelta(days=i) for i in range(50)]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE rates (
+                currency_code TEXT,
+                rate REAL,
+                date TEXT,
+                source TEXT,
+                PRIMARY KEY (currency_code, date, source)
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO rates VALUES (?, ?, ?, 'NBP')",
+            [
+                (code, 4.0 + i / 100, day.isoformat())
+                for code in ("EUR", "USD")
+                for i, day in enumerate(days)
+            ],
+        )
+    return db_path
+
+
+def test_new_database_is_created_at_latest_version(db_path):
+    with RateRepository(db_path) as repository:
+        with repository._transaction() as conn:
+            assert schema_version(conn) == LATEST_VERSION
+
+
+def test_new_database_logs_no_migrations(db_path, caplog):
+    with caplog.at_level(logging.INFO, logger="currency_analyzer.core.migrations"):
+        RateRepository(db_path).close()
+
+    assert not caplog.records
+
+
+def test_current_database_skips_ddl(db_path):
+    RateRepository(db_path).close()
+
+    statements = []
+    with sqlite3.connect(db_path) as conn:
+        conn.set_trace_callback(statements.append)
+        assert migrate(conn) == LATEST_VERSION
+
+    assert statements == ["PRAGMA user_version"]
+
+
+def test_rewrite_reports_progress_in_batches(legacy_db_path):
+    progress = []
+    with sqlite3.connect(legacy_db_path) as conn:
+        migrate(conn, batch_size=30, progress=progress.append)
+
+    assert [p for p in progress if p.version == 2] == [
+        MigrationProgress(2, "rates keyed by day numbers", copied, 100)
+        for copied in (30, 60, 90, 100)
+    ]
+
+
+def test_interrupted_rewrite_resumes(legacy_db_path):
+    def interrupt_after_two_batches(progress: MigrationProgress) -> None:
+        if progress.copied >= 20:
+            raise Interrupted()
+
+    with sqlite3.connect(legacy_db_path) as conn:
+        with pytest.raises(Interrupted):
+            migrate(conn, batch_size=10, progress=interrupt_after_two_batches)
+
+        assert schema_version(conn) == 1
+        assert conn.execute("SELECT * FROM migration_progress").fetchall() == [(2, 20)]
+        assert conn.execute("SELECT COUNT(*) FROM rates_v2").fetchone() == (20,)
+
+        progress = []
+        assert migrate(conn, batch_size=40, progress=progress.append) == LATEST_VERSION
+        assert [p.copied for p in progress if p.version == 2] == [60, 100]
+        assert conn.execute("SELECT * FROM migration_progress").fetchall() == []
+
+    repository = RateRepository(legacy_db_path)
+    rates = repository.get_exchange_rates(
+        date(2023, 1, 1), date(2023, 2, 19), None, "NBP", "A"
+    )
+    assert len(rates) == 100
+    assert {rate.currency_code for rate in rates} == {"EUR", "USD"}
+    assert rates[-1].rate == pytest.approx(4.49)
+
+
+def test_rewrite_copies_rows_written_during_migration(legacy_db_path):
+    def write_during_migration(progress: MigrationProgress) -> None:
+        if progress.copied == 50:
+            with sqlite3.connect(legacy_db_path) as other:
+                other.execute(
+                    "INSERT INTO rates VALUES ('CHF', 4.5, '2023-01-01', 'NBP')"
+                )
+
+    with sqlite3.connect(legacy_db_path) as conn:
+        migrate(conn, batch_size=50, progress=write_during_migration)
+
+        assert conn.execute("SELECT COUNT(*) FROM rates").fetchone() == (101,)
+
+
+def test_daily_changes_are_filled_for_stored_rates(legacy_db_path):
+    with sqlite3.connect(legacy_db_path) as conn:
+        migrate(conn)
+
+        rows = conn.execute(
+            """
+            SELECT currency_code, day, prev_day, ROUND(daily_change, 6)
+            FROM daily_changes ORDER BY currency_code, day
+            """
+        ).fetchall()
+
+    first_day = (date(2023, 1, 1) - date(1970, 1, 1)).days
+    assert len(rows) == 100
+    assert rows[:2] == [
+        ("EUR", first_day, None, None),
+        ("EUR", first_day + 1, first_day, round(0.01 / 4.0 * 100, 6)),
+    ]
@@ -0,0 +1,363 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import polars as pl
+import pytest
+
+from currency_analyzer.api.cache import ResponseCache
+from currency_analyzer.api.nbp import AsyncNBPClient, NBPClient, NBPTableResponse
+from currency_analyzer.api.ratelimit import RetryPolicy, TokenBucket
+from currency_analyzer.core.exceptions import APIError, RateLimitError
+from currency_analyzer.core.types import ExchangeRate, rates_to_frame
+from currency_analyzer.devtools.fake_nbp import FakeNBPConfig, FakeNBPServer
+
+
+def fake_make_request(delay: float = 0.0):
+    lock = threading.Lock()
+    state = {"running": 0, "max_running": 0}
+
+    def make_request(start_date: date, end_date: date):
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        # later chunks finish first to make sure the output order is not
+        # determined by completion order
+        time.sleep(delay / (start_date.toordinal() % 7 + 1))
+        with lock:
+            state["running"] -= 1
+        return [
+            ExchangeRate(currency_code="USD", rate=1.0, date=day, source="NBP")
+            for day in (start_date, end_date)
+        ]
+
+    return make_request, state
+
+
+def test_date_chunks_cover_range_without_overlap():
+    client = NBPClient()
+    start_date = date(2023, 1, 1)
+    end_date = date(2023, 12, 31)
+
+    chunks = client._date_chunks(start_date, end_date)
+
+    assert chunks[0][0] == start_date
+    assert chunks[-1][1] == end_date
+    for (_, prev_end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert next_start == prev_end + timedelta(days=1)
+    assert all(
+        (end - start).days <= NBPClient.MAX_DAYS_PER_REQUEST for start, end in chunks
+    )
+
+
+def test_single_chunk_range():
+    client = NBPClient()
+    assert client._date_chunks(date(2023, 1, 1), date(2023, 1, 31)) == [
+        (date(2023, 1, 1), date(2023, 1, 31))
+    ]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2, 8])
+def test_get_exchange_rates_concurrent_chunks_keep_date_order(monkeypatch, max_workers):
+    client = NBPClient(max_workers=max_workers)
+    make_request, state = fake_make_request(delay=0.05)
+    monkeypatch.setattr(client, "_make_request", make_request)
+    start_date = date(2022, 1, 1)
+    end_date = date(2023, 12, 31)
+
+    rates = client.get_exchange_rates(start_date, end_date)
+
+    dates = [rate.date for rate in rates]
+    assert dates == sorted(dates)
+    assert dates[0] == start_date
+    assert dates[-1] == end_date
+    assert len(rates) == 2 * len(client._date_chunks(start_date, end_date))
+    assert state["max_running"] <= max_workers
+    if max_workers > 1:
+        assert state["max_running"] > 1
+
+
+def test_invalid_max_workers():
+    with pytest.raises(ValueError):
+        NBPClient(max_workers=0)
+
+
+class TablesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    requests = 0
+    # statuses returned before responding with the table
+    statuses: list = []
+    etag = '"tables-v1"'
+    body = gzip.compress(
+        json.dumps(
+            [
+                {
+                    "table": "A",
+                    "no": "001/A/NBP/2024",
+                    "effectiveDate": "2024-01-02",
+                    "rates": [{"currency": "dolar", "code": "USD", "mid": 3.9432}],
+                }
+            ]
+        ).encode()
+    )
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+    def do_GET(self):
+        type(self).requests += 1
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.statuses:
+            self.send_response(self.statuses.pop(0))
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def tables_server():
+    TablesHandler.connections = 0
+    TablesHandler.requests = 0
+    TablesHandler.statuses = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TablesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api"
+    server.shutdown()
+    server.server_close()
+
+
+def test_make_request_reuses_connection(tables_server):
+    with NBPClient(base_url=tables_server) as client:
+        for _ in range(3):
+            rates = client._make_request(date(2024, 1, 1), date(2024, 1, 5))
+
+    assert rates == [
+        ExchangeRate(
+            currency_code="USD",
+            rate=3.9432,
+            date=date(2024, 1, 2),
+            source="NBP",
+        )
+    ]
+    assert TablesHandler.connections == 1
+
+
+def test_session_negotiates_compression_and_timeouts():
+    client = NBPClient(connect_timeout=1.5, read_timeout=10)
+
+    assert "gzip" in client.session.headers["Accept-Encoding"]
+    assert client.timeout == (1.5, 10)
+
+
+def test_make_request_retries_throttled_requests(tables_server):
+    TablesHandler.statuses = [429, 503]
+    bucket = TokenBucket(rate=100, capacity=10)
+    client = NBPClient(
+        base_url=tables_server,
+        rate_limiter=bucket,
+        retry_policy=RetryPolicy(base_delay=0.01),
+    )
+
+    rates = client._make_request(date(2024, 1, 1), date(2024, 1, 5))
+
+    assert len(rates) == 1
+    assert client.retry_budget.remaining == 18
+    assert bucket.rate < 100
+
+
+@pytest.mark.parametrize("status,error", [(429, RateLimitError), (500, APIError)])
+def test_make_request_fails_when_retry_budget_is_exhausted(
+    tables_server, status, error
+):
+    TablesHandler.statuses = [status] * 3
+    client = NBPClient(
+        base_url=tables_server,
+        rate_limiter=TokenBucket(rate=100, capacity=10),
+        retry_policy=RetryPolicy(base_delay=0.01),
+        max_retries=2,
+    )
+
+    with pytest.raises(error):
+        client._make_request(date(2024, 1, 1), date(2024, 1, 5))
+    assert client.retry_budget.remaining == 0
+
+
+def test_async_client_fetches_chunks_concurrently(tables_server):
+    async def fetch():
+        async with AsyncNBPClient(
+            base_url=tables_server,
+            max_concurrency=3,
+            rate_limiter=TokenBucket(rate=100, capacity=10),
+        ) as client:
+            return await asyncio.gather(
+                client.get_exchange_rates(date(2023, 1, 1), date(2023, 12, 31)),
+                client.get_exchange_rates(date(2024, 1, 1), date(2024, 1, 5)),
+            )
+
+    long_range, short_range = asyncio.run(fetch())
+
+    # the stand-in server returns a single table for every chunk
+    assert len(long_range) == 4
+    assert short_range == [
+        ExchangeRate(
+            currency_code="USD", rate=3.9432, date=date(2024, 1, 2), source="NBP"
+        )
+    ]
+    assert 1 < TablesHandler.connections <= 3
+
+
+def test_async_client_retries_throttled_requests(tables_server):
+    TablesHandler.statuses = [429]
+
+    async def fetch():
+        async with AsyncNBPClient(
+            base_url=tables_server,
+            rate_limiter=TokenBucket(rate=100, capacity=10),
+            retry_policy=RetryPolicy(base_delay=0.01),
+        ) as client:
+            return await client.get_exchange_rates(date(2024, 1, 1), date(2024, 1, 5))
+
+    assert len(asyncio.run(fetch())) == 1
+
+
+def test_frame_from_json_matches_dataclass_parsing():
+    payload = [
+        {
+            "table": "A",
+            "no": f"{day:03d}/A/NBP/2024",
+            "effectiveDate": f"2024-01-{day:02d}",
+            "rates": [
+                {"currency": "dolar", "code": "USD", "mid": 3.9432 + day / 1000},
+                {"currency": "euro", "code": "EUR", "mid": 4.3434 - day / 7},
+                {"currency": "jen", "code": "JPY", "mid": 0.027863},
+            ],
+        }
+        for day in range(2, 12)
+    ]
+
+    frame = NBPTableResponse.frame_from_json(json.dumps(payload).encode())
+    expected = rates_to_frame(
+        rate
+        for table in NBPTableResponse.from_json(payload)
+        for rate in table.to_exchange_rates()
+    )
+
+    assert frame.equals(expected)
+    assert [row for row in frame.iter_rows()] == [
+        (code, rate, date.fromisoformat(day), source, None, None)
+        for code, rate, day, source in (
+            rate.to_tuple()
+            for table in NBPTableResponse.from_json(payload)
+            for rate in table.to_exchange_rates()
+        )
+    ]
+
+
+def test_get_exchange_rates_frame(tables_server):
+    with NBPClient(base_url=tables_server) as client:
+        frame = client.get_exchange_rates_frame(date(2023, 1, 1), date(2023, 12, 31))
+
+    # the stand-in server returns a single table for every chunk
+    assert frame.shape == (4, 6)
+    assert frame.row(0) == ("USD", 3.9432, date(2024, 1, 2), "NBP", None, None)
+
+
+def test_currency_series_matches_filtered_tables():
+    start_date, end_date = date(2023, 1, 1), date(2023, 12, 31)
+    config = FakeNBPConfig(currencies=["USD", "EUR", "CHF"])
+
+    with FakeNBPServer(config) as server, NBPClient(base_url=server.base_url) as client:
+        series = client.get_currency_rates_frame("EUR", start_date, end_date)
+        series_requests = server.stats.requests
+        tables = client.get_exchange_rates_frame(start_date, end_date)
+
+    # a year of a single currency fits into one series request, while
+    # tables need a request for every 93 days
+    assert series_requests == 1
+    assert len(client._date_chunks(start_date, end_date)) == 4
+    assert series.equals(tables.filter(currency_code="EUR"))
+
+
+def test_currency_series_chunks_follow_series_limit():
+    start_date, end_date = date(2022, 1, 1), date(2023, 12, 31)
+    config = FakeNBPConfig(currencies=["USD"])
+
+    with FakeNBPServer(config) as server:
+
+        async def fetch():
+            async with AsyncNBPClient(base_url=server.base_url) as client:
+                return await client.get_currency_rates_frame(
+                    "USD", start_date, end_date
+                )
+
+        frame = asyncio.run(fetch())
+
+    assert server.stats.status_codes == {200: 2}
+    assert frame.get_column("date").is_sorted()
+    assert frame.height == sum(
+        (start_date + timedelta(days=i)).weekday() < 5
+        for i in range((end_date - start_date).days + 1)
+    )
+
+
+def test_for_table_shares_connections():
+    config = FakeNBPConfig(table_c_currencies=["USD"])
+
+    with FakeNBPServer(config) as server, NBPClient(base_url=server.base_url) as client:
+        table_c = client.for_table("C")
+        frame = table_c.get_exchange_rates_frame(date(2024, 1, 1), date(2024, 1, 5))
+
+    assert table_c.session is client.session
+    assert (client.table, table_c.table) == ("A", "C")
+    assert table_c.has_bid_ask and not client.has_bid_ask
+    assert frame.get_column("rate").is_null().all()
+    assert frame.select(pl.col("bid") < pl.col("ask")).to_series().all()
+    with pytest.raises(ValueError):
+        client.for_table("D")
+
+
+def test_cached_historical_tables_skip_network(tables_server, tmp_path):
+    for _ in range(2):
+        with NBPClient(
+            base_url=tables_server, cache=ResponseCache(tmp_path / "cache")
+        ) as client:
+            rates = client.get_exchange_rates(date(2023, 1, 1), date(2023, 1, 31))
+            frame = client.get_exchange_rates_frame(date(2023, 1, 1), date(2023, 1, 31))
+
+    assert TablesHandler.requests == 1
+    assert len(rates) == frame.height == 1
+
+
+def test_cached_recent_tables_are_revalidated(tables_server, tmp_path):
+    cache = ResponseCache(tmp_path / "cache")
+    today = date.today()
+    client = NBPClient(base_url=tables_server, cache=cache, recent_ttl=0)
+
+    first = client.get_exchange_rates(today, today)
+    second = client.get_exchange_rates(today, today)
+
+    # the second request is conditional and answered with 304 Not Modified
+    assert TablesHandler.requests == 2
+    assert first == second
+    assert cache.get(client._tables_url(today, today)).etag == TablesHandler.etag
@@ -0,0 +1,147 @@
+import pytest
+from datetime import date, timedelta
+
+import polars as pl
+
+from currency_analyzer.core.database import RateRepository
+from currency_analyzer.core.exceptions import MissingDataError
+from currency_analyzer.core.parquet import ParquetRateRepository
+from currency_analyzer.core.types import ExchangeRate, rates_to_frame
+
+DAYS = [
+    day
+    for day in (date(2023, 1, 1) + timedelta(days=i) for i in range(120))
+    if day.weekday() < 5
+]
+
+
+def weekday_rates(days):
+    return [
+        ExchangeRate(code, 4.0 + n + (day.toordinal() % 13) / 10, day, "NBP")
+        for day in days
+        for n, code in enumerate(["EUR", "USD", "CHF"])
+    ]
+
+
+@pytest.fixture
+def parquet_repository(tmp_path):
+    return ParquetRateRepository(tmp_path / "parquet", compact_after=3)
+
+
+@pytest.fixture
+def stores(tmp_path, parquet_repository):
+    """Both backends with the same rates, inserted in overlapping weekly batches"""
+    sqlite_repository = RateRepository(tmp_path / "rates.db")
+    for store in (sqlite_repository, parquet_repository):
+        for week in range(0, len(DAYS), 5):
+            store.insert_exchange_rates(weekday_rates(DAYS[week : week + 7]))
+    yield sqlite_repository, parquet_repository
+    sqlite_repository.close()
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date, currency_code",
+    [
+        (date(2023, 1, 1), date(2023, 4, 30), None),
+        (date(2023, 1, 18), date(2023, 3, 9), None),
+        (date(2023, 2, 1), date(2023, 2, 28), "USD"),
+        (date(2023, 1, 6), date(2023, 1, 9), "EUR"),
+    ],
+)
+def test_reads_match_sqlite(stores, start_date, end_date, currency_code):
+    sqlite_repository, parquet_repository = stores
+
+    for read in ("get_exchange_rates_frame", "get_exchange_rate_changes_frame"):
+        expected = getattr(sqlite_repository, read)(
+            start_date, end_date, currency_code, "NBP"
+        )
+        actual = getattr(parquet_repository, read)(
+            start_date, end_date, currency_code, "NBP"
+        )
+        assert actual.equals(expected), read
+
+    streamed = parquet_repository.iter_exchange_rates_frames(
+        start_date, end_date, currency_code, "NBP"
+    )
+    assert pl.concat(streamed).equals(
+        sqlite_repository.get_exchange_rates_frame(
+            start_date, end_date, currency_code, "NBP"
+        )
+    )
+
+
+def test_quotes_of_bid_ask_table(parquet_repository):
+    quotes = rates_to_frame(weekday_rates(DAYS[:5])).with_columns(
+        rate=None, bid=pl.col("rate") - 0.1, ask=pl.col("rate") + 0.1
+    )
+    parquet_repository.insert_exchange_rates_frame(quotes, table="C")
+
+    stored = parquet_repository.get_exchange_rate_quotes(
+        DAYS[0], DAYS[4], "EUR", "NBP", "C"
+    )
+
+    assert len(stored) == 5
+    assert stored[0].bid == pytest.approx(stored[0].ask - 0.2)
+    with pytest.raises(MissingDataError):
+        parquet_repository.get_exchange_rates(DAYS[0], DAYS[4], "EUR", "NBP", "A")
+
+
+def test_stored_rates_are_ignored(parquet_repository):
+    rates = weekday_rates(DAYS[:5])
+    parquet_repository.insert_exchange_rates(rates)
+    parquet_repository.insert_exchange_rates(
+        [ExchangeRate(rate.currency_code, 1.0, rate.date, "NBP") for rate in rates]
+    )
+
+    stored = parquet_repository.get_exchange_rates_frame(DAYS[0], DAYS[4], None, "NBP")
+    assert stored.height == 15
+    assert stored.get_column("rate").min() >= 4.0
+
+
+def test_partitions_are_compacted(stores):
+    _, parquet_repository = stores
+    january = parquet_repository.root / "rates/source=NBP/year=2023/month=01"
+    before = parquet_repository.get_exchange_rates_frame(
+        date(2023, 1, 1), date(2023, 1, 31), None, "NBP"
+    )
+
+    assert 1 <= len(list(january.glob("*.parquet"))) < 3
+    parquet_repository.compact()
+
+    assert len(list(january.glob("*.parquet"))) == 1
+    assert not list(january.glob(".*"))
+    assert parquet_repository.get_exchange_rates_frame(
+        date(2023, 1, 1), date(2023, 1, 31), None, "NBP"
+    ).equals(before)
+
+
+def test_scan_reads_only_partitions_of_the_range(stores):
+    _, parquet_repository = stores
+
+    files = parquet_repository._rate_files(date(2023, 2, 10), date(2023, 3, 5), "NBP")
+
+    assert files
+    assert {file.parent.name for file in files} == {"month=02", "month=03"}
+
+
+def test_missing_ranges_follow_recorded_coverage(parquet_repository):
+    parquet_repository.record_coverage(
+        date(2023, 1, 2), date(2023, 1, 8), "NBP", "A", DAYS[:5]
+    )
+    parquet_repository.record_coverage(
+        date(2023, 1, 12), date(2023, 1, 13), "NBP", "A", [], currency_code="USD"
+    )
+
+    assert parquet_repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 15), "NBP", "A"
+    ) == [(date(2023, 1, 1), date(2023, 1, 1)), (date(2023, 1, 9), date(2023, 1, 15))]
+    assert parquet_repository.get_missing_ranges(
+        date(2023, 1, 1), date(2023, 1, 15), "NBP", "A", currency_code="USD"
+    ) == [
+        (date(2023, 1, 1), date(2023, 1, 1)),
+        (date(2023, 1, 9), date(2023, 1, 11)),
+        (date(2023, 1, 14), date(2023, 1, 15)),
+    ]
+    assert parquet_repository.get_missing_ranges(
+        date(2023, 1, 2), date(2023, 1, 8), "NBP", "B"
+    ) == [(date(2023, 1, 2), date(2023, 1, 8))]
@@ -1,3 +1,4 @@
+import json
 import polars as pl
 from typing import List
 import pytest
@@ -7,7 +8,9 @@ from unittest.mock import MagicMock, Mock
 from currency_analyzer.cli.main import ExportFormat, app_with_logger
 from currency_analyzer.core.database import ExchangeRate
 from currency_analyzer.api.nbp import NBPClient
-from currency_analyzer.core.types import ExchangeRateChange
+from currency_analyzer.core.types import ExchangeRateChange, rates_to_frame
+from currency_analyzer.devtools.fake_nbp import FakeNBPConfig, FakeNBPServer
+from currency_analyzer.devtools.loadtest import run_load_test
 from pathlib import Path
 
 runner = CliRunner()
@@ -17,23 +20,31 @@ runner = CliRunner()
 def mock_nbp_client(monkeypatch):
     client = MagicMock(spec=NBPClient)
     client.source = "NBP"
-    client.get_exchange_rates.return_value = [
-        ExchangeRate(
-            currency_code="USD", rate=1.0, date=date(2024, 1, 1), source="NBP"
-        ),
-        ExchangeRate(
-            currency_code="USD", rate=1.1, date=date(2024, 1, 2), source="NBP"
-        ),
-        ExchangeRate(
-            currency_code="USD", rate=1.2, date=date(2024, 1, 4), source="NBP"
-        ),
-        ExchangeRate(
-            currency_code="EUR", rate=1.0, date=date(2024, 1, 2), source="NBP"
-        ),
-        ExchangeRate(
-            currency_code="EUR", rate=2.0, date=date(2024, 1, 4), source="NBP"
-        ),
-    ]
+    client.table = "A"
+    client.has_bid_ask = False
+    client.quote_currency = "PLN"
+    client.get_exchange_rates_frame.return_value = rates_to_frame(
+        [
+            ExchangeRate(
+                currency_code="USD", rate=1.0, date=date(2024, 1, 1), source="NBP"
+            ),
+            ExchangeRate(
+                currency_code="USD", rate=1.1, date=date(2024, 1, 2), source="NBP"
+            ),
+            ExchangeRate(
+                currency_code="USD", rate=1.2, date=date(2024, 1, 4), source="NBP"
+            ),
+            ExchangeRate(
+                currency_code="EUR", rate=1.0, date=date(2024, 1, 2), source="NBP"
+            ),
+            ExchangeRate(
+                currency_code="EUR", rate=2.0, date=date(2024, 1, 4), source="NBP"
+            ),
+        ]
+    )
+    client.get_currency_rates_frame.side_effect = lambda currency_code, start_date, end_date: client.get_exchange_rates_frame.return_value.filter(
+        pl.col("currency_code") == currency_code
+    )
     monkeypatch.setattr(
         "currency_analyzer.cli.main.NBPClient", Mock(return_value=client)
     )
@@ -76,7 +87,8 @@ def test_export_changes_single_currency_valid(
     )
 
     assert result.exit_code == 0
-    mock_nbp_client.get_exchange_rates.assert_called_once()
+    mock_nbp_client.get_currency_rates_frame.assert_called_once()
+    mock_nbp_client.get_exchange_rates_frame.assert_not_called()
     assert output_path.exists()
 
     exchange_rate_changes = read_exchange_rate_changes(output_path, export_format)
@@ -124,7 +136,7 @@ def test_export_changes_all_currencies_valid(
     )
 
     assert result.exit_code == 0
-    mock_nbp_client.get_exchange_rates.assert_called_once()
+    mock_nbp_client.get_exchange_rates_frame.assert_called_once()
     assert output_path.exists()
 
     exchange_rate_changes = read_exchange_rate_changes(output_path, export_format)
@@ -188,7 +200,8 @@ def test_export_raw_single_currency_valid(
     )
 
     assert result.exit_code == 0
-    mock_nbp_client.get_exchange_rates.assert_called_once()
+    mock_nbp_client.get_currency_rates_frame.assert_called_once()
+    mock_nbp_client.get_exchange_rates_frame.assert_not_called()
     assert output_path.exists()
 
     exchange_rates = read_exchange_rates(output_path, export_format)
@@ -237,7 +250,7 @@ def test_export_raw_all_currencies_valid(
     )
 
     assert result.exit_code == 0
-    mock_nbp_client.get_exchange_rates.assert_called_once()
+    mock_nbp_client.get_exchange_rates_frame.assert_called_once()
     assert output_path.exists()
 
     exchange_rates = read_exchange_rates(output_path, export_format)
@@ -277,6 +290,527 @@ def test_export_raw_all_currencies_valid(
     assert expected_rates == exchange_rates
 
 
+@pytest.mark.parametrize("export_format", [ExportFormat.CSV, ExportFormat.JSON])
+def test_export_raw_streamed_matches_export(
+    tmp_path, start_date, end_date, mock_nbp_client, export_format
+):
+    outputs = []
+    for options in ([], ["--stream-batch-size", "2"]):
+        outputs.append(tmp_path / f"report_{len(outputs)}.{export_format.value}")
+        result = runner.invoke(
+            app_with_logger(),
+            [
+                "--start-date",
+                start_date,
+                "--end-date",
+                end_date,
+                "--format",
+                export_format,
+                "--db-path",
+                str(tmp_path / "test_db.sqlite"),
+                "--export-type",
+                "raw",
+                "--output",
+                str(outputs[-1]),
+                *options,
+            ],
+        )
+        assert result.exit_code == 0
+
+    assert outputs[1].read_bytes() == outputs[0].read_bytes()
+
+
+def test_export_streamed_changes_fails(tmp_path, start_date, end_date):
+    result = runner.invoke(
+        app_with_logger(),
+        [
+            "--start-date",
+            start_date,
+            "--end-date",
+            end_date,
+            "--db-path",
+            str(tmp_path / "test_db.sqlite"),
+            "--stream-batch-size",
+            "100",
+            "--output",
+            str(tmp_path / "test_report.json"),
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "Only raw exports can be streamed" in result.output
+    assert not (tmp_path / "test_db.sqlite").exists()
+
+
+def test_export_rolling_stats(tmp_path, start_date, end_date, mock_nbp_client):
+    output_path = tmp_path / "test_report.csv"
+    result = runner.invoke(
+        app_with_logger(),
+        [
+            "--start-date",
+            start_date,
+            "--end-date",
+            end_date,
+            "--currency",
+            "USD",
+            "--format",
+            "csv",
+            "--db-path",
+            str(tmp_path / "test_db.sqlite"),
+            "--export-type",
+            "rolling",
+            "--window",
+            "2",
+            "--output",
+            str(output_path),
+        ],
+    )
+
+    assert result.exit_code == 0
+    stats = pl.read_csv(output_path)
+    assert stats.columns == [
+        "currency_code",
+        "date",
+        "rate",
+        "moving_average",
+        "moving_std",
+        "volatility",
+        "moving_min",
+        "moving_max",
+        "source",
+    ]
+    assert stats.select("date", "moving_average", "moving_max").rows() == [
+        ("2024-01-01", None, None),
+        ("2024-01-02", 1.05, 1.1),
+        ("2024-01-04", 1.15, 1.2),
+    ]
+
+
+def test_export_cross_rates(tmp_path, start_date, end_date, mock_nbp_client):
+    output_path = tmp_path / "test_report.json"
+    result = runner.invoke(
+        app_with_logger(),
+        [
+            "--start-date",
+            start_date,
+            "--end-date",
+            end_date,
+            "--db-path",
+            str(tmp_path / "test_db.sqlite"),
+            "--export-type",
+            "cross",
+            "--pairs",
+            "eur/usd, USD/PLN",
+            "--output",
+            str(output_path),
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert pl.read_json(output_path).select(
+        "date", "base_currency", "quote_currency", "rate"
+    ).rows() == [
+        ("2024-01-01", "USD", "PLN", 1.0),
+        ("2024-01-02", "EUR", "USD", 0.909091),
+        ("2024-01-02", "USD", "PLN", 1.1),
+        ("2024-01-04", "EUR", "USD", 1.666667),
+        ("2024-01-04", "USD", "PLN", 1.2),
+    ]
+
+
+def test_export_cross_rates_rejects_invalid_pairs(tmp_path, start_date, end_date):
+    result = runner.invoke(
+        app_with_logger(),
+        [
+            "--start-date",
+            start_date,
+            "--end-date",
+            end_date,
+            "--export-type",
+            "cross",
+            "--pairs",
+            "EURUSD",
+            "--output",
+            str(tmp_path / "test_report.json"),
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "Invalid currency pair: EURUSD" in result.output
+
+
+def test_export_correlations(tmp_path, start_date, end_date, mock_nbp_client):
+    output_path = tmp_path / "test_report.csv"
+    result = runner.invoke(
+        app_with_logger(),
+        [
+            "--start-date",
+            start_date,
+            "--end-date",
+            end_date,
+            "--currency",
+            "USD",
+            "--format",
+            "csv",
+            "--db-path",
+            str(tmp_path / "test_db.sqlite"),
+            "--export-type",
+            "correlation",
+            "--output",
+            str(output_path),
+        ],
+    )
+
+    assert result.exit_code == 0
+    correlations = pl.read_csv(output_path)
+    assert correlations.select(
+        "currency_code", "other_currency", "observations", "covariance"
+    ).rows() == [
+        # a single day with returns of both
+        ("USD", "EUR", 1, None),
+        ("USD", "USD", 2, 0.413223),
+    ]
+
+
+def test_batch_exports_manifest_reports(
+    tmp_path, start_date, end_date, mock_nbp_client
+):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "defaults": {"start_date": start_date, "end_date": end_date},
+                "reports": [
+                    {
+                        "output": str(tmp_path / f"{currency}_{export_type}.{format}"),
+                        "currency": currency,
+                        "export_type": export_type,
+                    }
+                    for currency in ("USD", "EUR")
+                    for export_type in ("raw", "changes")
+                    for format in ("csv", "json")
+                ],
+            }
+        )
+    )
+
+    result = runner.invoke(
+        app_with_logger(),
+        ["batch", str(manifest), "--db-path", str(tmp_path / "test_db.sqlite")],
+    )
+
+    assert result.exit_code == 0
+    assert "8 reports, 0 failed" in result.output
+    assert "(shared by 2)" in result.output
+    mock_nbp_client.get_exchange_rates_frame.assert_called_once()
+    mock_nbp_client.get_currency_rates_frame.assert_not_called()
+    assert pl.read_csv(tmp_path / "USD_changes.csv").get_column(
+        "end_rate"
+    ).to_list() == [1.2]
+    assert pl.read_json(tmp_path / "EUR_raw.json").get_column(
+        "currency_code"
+    ).unique().to_list() == ["EUR"]
+
+
+def test_batch_rejects_invalid_manifest(tmp_path, start_date, end_date):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "reports": [
+                    {
+                        "output": str(tmp_path / "report.json"),
+                        "start_date": start_date,
+                        "end_date": end_date,
+                        "export_type": "changes",
+                        "table": "C",
+                    }
+                ]
+            }
+        )
+    )
+
+    result = runner.invoke(app_with_logger(), ["batch", str(manifest)])
+
+    assert result.exit_code == 1
+    assert "Invalid report 0: Changes export requires average rates" in result.output
+
+
+def test_export_reuses_already_fetched_range(
+    tmp_path, start_date, end_date, mock_nbp_client
+):
+    args = [
+        "--start-date",
+        start_date,
+        "--end-date",
+        end_date,
+        "--db-path",
+        str(tmp_path / "test_db.sqlite"),
+        "--export-type",
+        "raw",
+    ]
+    first = runner.invoke(
+        app_with_logger(), [*args, "--output", str(tmp_path / "first.json")]
+    )
+    second = runner.invoke(
+        app_with_logger(), [*args, "--output", str(tmp_path / "second.json")]
+    )
+
+    assert first.exit_code == 0
+    assert second.exit_code == 0
+    mock_nbp_client.get_exchange_rates_frame.assert_called_once()
+    assert (tmp_path / "first.json").read_text() == (
+        tmp_path / "second.json"
+    ).read_text()
+
+
+@pytest.mark.parametrize("export_type", ["raw", "changes"])
+def test_export_from_parquet_storage_matches_sqlite(
+    tmp_path, start_date, end_date, mock_nbp_client, export_type
+):
+    args = [
+        "--start-date",
+        start_date,
+        "--end-date",
+        end_date,
+        "--export-type",
+        export_type,
+    ]
+    sqlite = runner.invoke(
+        app_with_logger(),
+        [
+            *args,
+            "--db-path",
+            str(tmp_path / "test_db.sqlite"),
+            "--output",
+            str(tmp_path / "sqlite.json"),
+        ],
+    )
+    parquet_args = [*args, "--storage", "parquet", "--parquet-dir", str(tmp_path)]
+    first = runner.invoke(
+        app_with_logger(),
+        [*parquet_args, "--output", str(tmp_path / "parquet.json")],
+    )
+    second = runner.invoke(
+        app_with_logger(),
+        [*parquet_args, "--output", str(tmp_path / "parquet_again.json")],
+    )
+
+    assert sqlite.exit_code == 0
+    assert first.exit_code == 0
+    assert second.exit_code == 0
+    # fetched once for each storage
+    assert mock_nbp_client.get_exchange_rates_frame.call_count == 2
+    assert (tmp_path / "sqlite.json").read_text() == (
+        tmp_path / "parquet.json"
+    ).read_text()
+    assert (tmp_path / "parquet.json").read_text() == (
+        tmp_path / "parquet_again.json"
+    ).read_text()
+
+
+def test_export_served_from_result_cache(
+    tmp_path, start_date, end_date, mock_nbp_client
+):
+    args = [
+        "--start-date",
+        start_date,
+        "--end-date",
+        end_date,
+        "--db-path",
+        str(tmp_path / "test_db.sqlite"),
+        "--result-cache-dir",
+        str(tmp_path / "results"),
+    ]
+    first = runner.invoke(
+        app_with_logger(), [*args, "--output", str(tmp_path / "first.json")]
+    )
+    cached = list((tmp_path / "results").iterdir())
+    second = runner.invoke(
+        app_with_logger(), [*args, "--output", str(tmp_path / "second.json")]
+    )
+
+    assert first.exit_code == 0
+    assert second.exit_code == 0
+    assert len(cached) == 1
+    assert list((tmp_path / "results").iterdir()) == cached
+    assert (tmp_path / "first.json").read_text() == (
+        tmp_path / "second.json"
+    ).read_text()
+
+
+def test_export_against_fake_nbp_server(tmp_path):
+    config = FakeNBPConfig(currencies=["USD", "EUR"], error_rate_429=0.2, seed=1)
+    output_path = tmp_path / "report.csv"
+
+    with FakeNBPServer(config) as server:
+        result = runner.invoke(
+            app_with_logger(),
+            [
+                "--start-date",
+                "2024-01-01",
+                "--end-date",
+                "2024-05-31",
+                "--currency",
+                "USD",
+                "--format",
+                "csv",
+                "--db-path",
+                str(tmp_path / "test_db.sqlite"),
+                "--export-type",
+                "raw",
+                "--output",
+                str(output_path),
+                "--api-url",
+                server.base_url,
+            ],
+        )
+
+    assert result.exit_code == 0, result.output
+    rates = read_exchange_rates(output_path, ExportFormat.CSV)
+    # weekdays only, gaps are filled with the previous day
+    assert len(rates) == (date(2024, 5, 31) - date(2024, 1, 1)).days + 1
+    assert {rate.currency_code for rate in rates} == {"USD"}
+    # the whole range fits into a single request of the currency series
+    assert server.stats.status_codes[200] == 1
+
+
+def test_export_multi_year_range_against_fake_nbp_server(tmp_path):
+    config = FakeNBPConfig(currencies=["USD", "EUR"])
+    output_path = tmp_path / "report.csv"
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "defaults": {"start_date": "2020-01-01", "end_date": "2023-12-31"},
+                "reports": [
+                    {"output": str(tmp_path / "changes.json")},
+                    {"output": str(tmp_path / "raw.csv"), "export_type": "raw"},
+                ],
+            }
+        )
+    )
+
+    with FakeNBPServer(config) as server:
+        result = runner.invoke(
+            app_with_logger(),
+            [
+                "--start-date",
+                "2020-01-01",
+                "--end-date",
+                "2023-12-31",
+                "--format",
+                "csv",
+                "--db-path",
+                str(tmp_path / "test_db.sqlite"),
+                "--export-type",
+                "rolling",
+                "--window",
+                "250",
+                "--output",
+                str(output_path),
+                "--api-url",
+                server.base_url,
+            ],
+        )
+        assert result.exit_code == 0, result.output
+
+        batch_result = runner.invoke(
+            app_with_logger(),
+            [
+                "batch",
+                str(manifest),
+                "--db-path",
+                str(tmp_path / "test_db.sqlite"),
+                "--api-url",
+                server.base_url,
+            ],
+        )
+        assert batch_result.exit_code == 0, batch_result.output
+
+    stats = pl.read_csv(output_path, try_parse_dates=True)
+    assert stats.get_column("date").min() >= date(2020, 1, 1)
+    assert stats.get_column("date").max() == date(2023, 12, 29)
+    assert stats.get_column("moving_average").null_count() == 0
+    rates = read_exchange_rates(tmp_path / "raw.csv", ExportFormat.CSV)
+    assert len(rates) == 2 * ((date(2023, 12, 31) - date(2020, 1, 1)).days + 1)
+    assert len(json.loads((tmp_path / "changes.json").read_text())) == 2
+
+
+def test_export_bid_ask_table_against_fake_nbp_server(tmp_path):
+    config = FakeNBPConfig(table_c_currencies=["USD", "EUR"])
+    output_path = tmp_path / "report.json"
+
+    with FakeNBPServer(config) as server:
+        result = runner.invoke(
+            app_with_logger(),
+            [
+                "--start-date",
+                "2024-01-01",
+                "--end-date",
+                "2024-01-07",
+                "--db-path",
+                str(tmp_path / "test_db.sqlite"),
+                "--export-type",
+                "raw",
+                "--table",
+                "C",
+                "--output",
+                str(output_path),
+                "--api-url",
+                server.base_url,
+            ],
+        )
+
+    assert result.exit_code == 0, result.output
+    rates = pl.read_json(output_path)
+    assert rates.columns == ["currency_code", "bid", "ask", "date", "source"]
+    assert rates.height == 2 * 7
+    # weekdays are quoted, weekends are filled with nulls
+    quoted = rates.drop_nulls()
+    assert quoted.height == 2 * 5
+    assert (quoted.get_column("bid") < quoted.get_column("ask")).all()
+
+
+def test_export_changes_of_bid_ask_table_fails(tmp_path):
+    result = runner.invoke(
+        app_with_logger(),
+        [
+            "--start-date",
+            "2024-01-01",
+            "--end-date",
+            "2024-01-07",
+            "--db-path",
+            str(tmp_path / "test_db.sqlite"),
+            "--export-type",
+            "changes",
+            "--table",
+            "C",
+            "--output",
+            str(tmp_path / "report.json"),
+        ],
+    )
+
+    assert result.exit_code != 0
+    assert "requires average rates" in result.output
+
+
+def test_load_test_harness(tmp_path):
+    result = run_load_test(
+        exports=4,
+        concurrency=2,
+        start_date=date(2024, 1, 1),
+        end_date=date(2024, 3, 31),
+        rate_limit=1000,
+        server_config=FakeNBPConfig(currencies=["USD"]),
+        workdir=tmp_path,
+    )
+
+    assert not result.failures
+    assert len(result.export_times) == 4
+    assert len(result.request_latencies) == result.status_codes[200] == 4
+
+
 def test_export_invalid_date_range(tmp_path):
     start_date = (datetime.today() - timedelta(days=30)).strftime("%Y-%m-%d")
     end_date = (datetime.today() - timedelta(days=31)).strftime("%Y-%m-%d")
@@ -320,7 +854,7 @@ def read_exchange_rates(path: Path, format: ExportFormat) -> List[ExchangeRate]:
         case _:
             raise ValueError(f"Unsupported format: {format}")
 
-    df = df.with_columns([pl.col("date").cast(pl.Date)])
+    df = df.with_columns([pl.col("date").str.to_date()])
 
     return [ExchangeRate(**row) for row in df.to_dicts()]
 
@@ -351,6 +885,6 @@ def read_exchange_rate_changes(
             raise ValueError(f"Unsupported format: {format}")
 
     df = df.with_columns(
-        [pl.col("start_date").cast(pl.Date), pl.col("end_date").cast(pl.Date)]
+        [pl.col("start_date").str.to_date(), pl.col("end_date").str.to_date()]
     )
     return [ExchangeRateChange(**row) for row in df.to_dicts()]
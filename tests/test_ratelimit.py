@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from currency_analyzer.api.ratelimit import (
+    RetryBudget,
+    RetryPolicy,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_token_bucket_adapts_rate():
+    bucket = TokenBucket(rate=10, capacity=1, min_rate=1, increase_step=1)
+
+    bucket.on_throttle()
+    assert bucket.rate == 5
+    bucket.on_throttle()
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 1
+
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 10
+
+
+def test_token_bucket_honours_retry_after():
+    bucket = TokenBucket(rate=100, capacity=10)
+
+    bucket.on_throttle(retry_after=2)
+
+    assert bucket.reserve() == pytest.approx(2, abs=0.05)
+
+
+def test_retry_budget():
+    budget = RetryBudget(max_retries=2)
+
+    assert budget.try_consume()
+    assert budget.try_consume()
+    assert not budget.try_consume()
+
+
+def test_retry_policy_backoff():
+    policy = RetryPolicy(base_delay=1, max_delay=4)
+
+    assert all(0 <= policy.backoff(attempt) <= 4 for attempt in range(10))
+    assert 3 <= policy.backoff(0, retry_after=3) <= 4
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [(None, None), ("", None), ("5", 5), ("-1", 0), ("soon", None)],
+)
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == (
+        pytest.approx(30, abs=2)
+    )
@@ -0,0 +1,81 @@
+import os
+import time
+
+import polars as pl
+
+from currency_analyzer.core.result_cache import ResultCache
+
+
+def frame(rows: int) -> pl.DataFrame:
+    return pl.DataFrame({"rate": [float(i) for i in range(rows)]})
+
+
+def test_store_and_get_in_memory():
+    cache = ResultCache()
+
+    cache.store(["rates", "db", 1, "2024-01-01"], frame(3))
+
+    assert cache.get(["rates", "db", 1, "2024-01-01"]).equals(frame(3))
+    assert cache.get(["rates", "db", 2, "2024-01-01"]) is None
+    assert cache.size() == 0
+
+
+def test_evicts_least_recently_used_from_memory():
+    cache = ResultCache(max_memory_bytes=2500)
+
+    cache.store(["1"], frame(125))
+    cache.store(["2"], frame(125))
+    cache.get(["1"])
+    cache.store(["3"], frame(125))
+
+    assert cache.get(["1"]) is not None
+    assert cache.get(["2"]) is None
+    assert cache.get(["3"]) is not None
+
+
+def test_results_on_disk_outlive_the_cache(tmp_path):
+    ResultCache(tmp_path).store(["changes", 1], frame(3))
+
+    assert ResultCache(tmp_path).get(["changes", 1]).equals(frame(3))
+
+
+def test_evicts_least_recently_used_from_disk(tmp_path):
+    cache = ResultCache(tmp_path, max_memory_bytes=0, max_disk_bytes=2500)
+    cache.store(["1"], frame(100))
+    single = cache.size()
+    cache = ResultCache(tmp_path, max_memory_bytes=0, max_disk_bytes=single * 2)
+
+    cache.store(["2"], frame(100))
+    # make the first result the most recently used one
+    past = time.time() - 10
+    os.utime(cache._path(cache._key(["2"])), (past, past))
+    cache.get(["1"])
+    cache.store(["3"], frame(100))
+
+    assert cache.get(["1"]) is not None
+    assert cache.get(["2"]) is None
+    assert cache.get(["3"]) is not None
+    assert cache.size() <= single * 2
+
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_store_reads_disk_only_past_the_limit(tmp_path, monkeypatch):
+    ResultCache(tmp_path, max_memory_bytes=0).store(["0"], frame(100))
+    single = ResultCache(tmp_path).size()
+    cache = ResultCache(tmp_path, max_memory_bytes=0, max_disk_bytes=single * 4)
+    scans = []
+    scan = cache._scan_disk
+    monkeypatch.setattr(cache, "_scan_disk", lambda: scans.append(1) or scan())
+
+    for n in range(4):
+        cache.store([str(n)], frame(100))
+
+    assert len(scans) == 1
+    assert cache._disk_bytes == cache.size() == single * 4
+
+    cache.store(["4"], frame(100))
+
+    assert len(scans) == 2
+    assert cache._disk_bytes == cache.size() == single * 4